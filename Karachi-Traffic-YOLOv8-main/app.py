@@ -1,10 +1,29 @@
 import streamlit as st
-from ultralytics import YOLO
-import cv2
-import tempfile
+import time
 import numpy as np
+import os
+import tempfile
+from datetime import date, datetime, timedelta
 from PIL import Image
 
+from backends import BACKENDS
+from camera import LatestFrameCapture
+from count_store import RESOLUTIONS, CountRecorder, get_count_store
+from counting import TrackCounter, frame_counts
+from detection_cache import (CONF_FLOOR, FLOOR_MAX_DET, ClipDetections, ImageDetections, RecordingDetector,
+                             ReplayDetector, ReplaySchedule, bytes_hash, get_detection_cache, raw_boxes)
+from export import VideoExporter, file_reader
+from metrics import get_metrics
+from crossing import CrossingCounter, parse_regions
+from model_registry import get_registry
+from motion import DEFAULT_REFRESH, DEFAULT_THRESHOLD, MotionGate
+from pipeline import VideoPipeline
+from render import CountsPanel, FrameRenderer, PeriodicPanel
+from roi import RegionOfInterest, RoiDetector, parse_roi
+from spool import get_spool
+from pacing import REALTIME, TARGET_FPS, PacingScheduler
+from tracking import BatchTracker, SequentialTracker
+
 # Setup page config
 st.set_page_config(page_title="Bangalore Traffic AI", page_icon="🛺", layout="wide")
 
@@ -129,16 +148,154 @@ st.sidebar.title("⚙️ Settings")
 confidence = st.sidebar.slider("Confidence Threshold", 0.0, 1.0, 0.25, 0.05)
 model_path = st.sidebar.selectbox("Model Type", ["yolov8n.pt", "yolov8m.pt", "yolov8l.pt", "yolov8x.pt"], index=0)
 st.sidebar.info("Note: Larger models (l/x) are more accurate but require more powerful hardware.")
+backend = st.sidebar.selectbox(
+    "Inference Backend", BACKENDS, index=0,
+    help="ONNX variants run on ONNX Runtime and are exported on first use. INT8 is the fastest on CPU-only servers.")
 
 if st.sidebar.button("Reset Model"):
     model_path = "yolov8n.pt"
 
-# Load Model
+# Load Model (cached per process, so reruns and model switches don't reload weights)
+registry = get_registry()
+model_backend = backend
 try:
-    model = YOLO(model_path)
+    if backend == "pytorch":
+        model = registry.get(model_path)
+    else:
+        with st.spinner(f"Preparing {backend} backend (first use exports and checks it)..."):
+            model = registry.get(model_path, backend)
+            check = registry.check(model_path, backend, candidate=model)
+        if not check["ok"]:
+            st.sidebar.warning(f"{backend} only agrees with the PyTorch model on {check['agreement']:.0%} "
+                               f"of detections, using PyTorch instead.")
+            model_backend = "pytorch"
+            model = registry.get(model_path)
 except Exception as e:
     st.error(f"Error loading model: {e}. using 'yolov8n.pt' as fallback.")
-    model = YOLO('yolov8n.pt')
+    model_path = 'yolov8n.pt'
+    model_backend = "pytorch"
+    model = registry.get(model_path)
+
+with st.sidebar.expander("🧠 Loaded Models"):
+    for info in registry.stats():
+        latency = f", {info['latency_ms']:.0f} ms/img" if info["latency_ms"] is not None else ""
+        agreement = f", {info['agreement']:.0%} match" if info["agreement"] is not None and info["backend"] != "pytorch" else ""
+        st.write(f"**{info['weights']}** [{info['backend']}] ({info['size_mb']:.0f} MB): "
+                 f"load {info['load_s']:.2f}s, warmup {info['warmup_s']:.2f}s, used {info['hits']}x{latency}{agreement}")
+
+# Counting mode for the video and camera tabs
+st.sidebar.markdown("---")
+st.sidebar.subheader("🚦 Counting")
+counting_mode = st.sidebar.radio("Counting Mode", ["Unique Vehicles", "Line / Zone Crossing"],
+                                 help="Unique Vehicles counts every track ID once. Line / Zone Crossing counts "
+                                      "vehicles crossing lines or entering/leaving zones, per direction.")
+regions = []
+if counting_mode == "Line / Zone Crossing":
+    regions_text = st.sidebar.text_area(
+        "Lines / Zones", "0,0.6 1,0.6",
+        help="Points as x,y fractions of the frame, regions separated by ';'. Two points make a line "
+             "(drawn left to right, 'in' means top to bottom), three or more make a zone.")
+    try:
+        regions = parse_regions(regions_text)
+    except ValueError:
+        st.sidebar.error("Could not parse the lines / zones, expected e.g. '0,0.6 1,0.6; 0.2,0.2 0.8,0.2 0.5,0.9'")
+
+# Region of interest / tiling for high-resolution cameras (all tabs)
+with st.sidebar.expander("🔲 Region of Interest"):
+    roi_text = st.text_area(
+        "ROI Polygons", "",
+        help="Only this part of the frame is sent to the model. Points as x,y fractions of the frame, polygons "
+             "separated by ';', two points are the corners of a rectangle. Empty = whole frame.")
+    tiled = st.checkbox("Tiled Inference", value=False,
+                        help="Split the ROI into overlapping tiles detected at full resolution, for small, distant "
+                             "vehicles on 4K cameras. Costs one model input per tile.")
+    tile_size = st.select_slider("Tile Size", [320, 480, 640, 960, 1280], value=640) if tiled else None
+    tile_overlap = st.slider("Tile Overlap", 0.1, 0.5, 0.2, 0.05) if tiled else 0.2
+roi = None
+if roi_text.strip():
+    try:
+        roi = RegionOfInterest(parse_roi(roi_text))
+    except ValueError:
+        st.sidebar.error("Could not parse the ROI, expected e.g. '0,0.4 1,1' or '0.1,0.3 0.9,0.3 1,1 0,1'")
+roi_detector = RoiDetector(model, roi=roi, tile=tile_size, overlap=tile_overlap) if roi or tiled else None
+
+# Raw detections per (content, model, imgsz, ROI settings); below the cache's floor, always run the model
+detection_cache = get_detection_cache()
+with st.sidebar.expander("🗃️ Detection Cache"):
+    cache_stats = detection_cache.stats()
+    st.write(f"{cache_stats['entries']} images/clips, {cache_stats['size_mb']:.1f} MB, "
+             f"{cache_stats['hits']} hits, {cache_stats['evictions']} evicted")
+detector_key = (model_path, model_backend, model.overrides.get("imgsz"),
+                (roi_text.strip(), tile_size, tile_overlap) if roi_detector is not None else None)
+use_detection_cache = confidence >= CONF_FLOOR
+
+
+def new_tracker():
+    # Frame tracker with model.track()'s call signature, ROI / tiles applied when set
+    if roi_detector is not None:
+        return BatchTracker(model, conf=confidence, detector=roi_detector).track
+    return SequentialTracker(model, conf=confidence)
+
+
+def plot_results(results):
+    plotted = results[0].plot()
+    if roi is not None:
+        roi.draw(plotted)
+    return plotted
+
+
+# UI update rate is independent of the processing rate
+with st.sidebar.expander("🖥️ Display"):
+    display_fps = st.slider("Max Display FPS", 1, 30, 10,
+                            help="Frames are still processed at full speed, only the browser updates less often.")
+    display_width = st.select_slider("Display Width", [480, 640, 960, 1280, 1920], value=960)
+
+# Skip the model on frames where nothing moved (video and camera tabs)
+with st.sidebar.expander("💤 Motion Gating"):
+    motion_gating = st.checkbox("Skip Static Frames", value=False,
+                                help="For fixed cameras: frames that barely differ from the last detected one "
+                                     "(empty roads, traffic stopped at a light) reuse its detections and tracks.")
+    gate_threshold = st.slider("Motion Threshold (% of frame)", 0.05, 2.0, DEFAULT_THRESHOLD * 100, 0.05,
+                               disabled=not motion_gating) / 100
+    gate_refresh = st.slider("Detect At Least Every N Frames", 2, 60, DEFAULT_REFRESH, disabled=not motion_gating)
+
+# Per-stage timings of this server process (all sessions), refreshed from the processing loops
+metrics = get_metrics()
+show_performance = st.sidebar.checkbox("📈 Show Performance Panel", value=False,
+                                       help="Per-stage latency, frame and drop counters, model load times.")
+
+
+def new_counter():
+    if counting_mode == "Line / Zone Crossing":
+        return CrossingCounter(lines=[r for r in regions if len(r) == 2],
+                               zones=[r for r in regions if len(r) >= 3],
+                               num_classes=len(model.names))
+    return TrackCounter(len(model.names))
+
+
+def display_performance():
+    snapshot = metrics.snapshot()
+    st.markdown("### 📈 Performance")
+    rows = [{"stage": name, "count": s["count"], "p50 ms": round(s["p50_ms"], 1), "p95 ms": round(s["p95_ms"], 1),
+             "max ms": round(s["max_ms"], 1)} for name, s in sorted(snapshot["stages"].items())]
+    if rows:
+        st.table(rows)
+    for name, value in sorted({**snapshot["counters"], **snapshot["gauges"]}.items()):
+        st.write(f"**{name}**: {value:.3g}" if isinstance(value, float) else f"**{name}**: {value}")
+
+
+performance_panel = None
+if show_performance:
+    performance_panel = PeriodicPanel(st.sidebar.empty(), display_performance, interval=1.0)
+    performance_panel.update(force=True)
+    st.sidebar.download_button("📥 Prometheus Metrics", data=metrics.prometheus(),
+                               file_name="traffic_metrics.prom", mime="text/plain")
+
+
+def refresh_performance(force=False):
+    if performance_panel is not None:
+        performance_panel.update(force)
+
 
 # Helper for sidebar stats
 def display_counts(counts_dict):
@@ -150,19 +307,38 @@ def display_counts(counts_dict):
     st.divider()
     
     # Display individual counts
-    csv_data = "Vehicle Type,Count\n"
     for name, count in counts_dict.items():
         st.write(f"**{name}**: {count} NOS")
-        csv_data += f"{name},{count}\n"
-    
-    # Download Button
-    st.markdown("---")
-    st.download_button(
-        label="📥 Download Report",
-        data=csv_data,
-        file_name="traffic_report.csv",
-        mime="text/csv"
-    )
+
+
+# Video / camera counts are persisted per source; reports come from the store's rollups
+count_store = get_count_store()
+with st.sidebar.expander("🗄️ Count History"):
+    history_range = st.date_input("Date Range", (date.today() - timedelta(days=6), date.today()))
+    history_resolution = st.selectbox("Resolution", RESOLUTIONS[1:], index=1)
+    history_sources = st.multiselect("Sources", count_store.sources(), help="Empty = all sources")
+    if isinstance(history_range, (tuple, list)) and len(history_range) == 2:
+        history_start = datetime.combine(history_range[0], datetime.min.time()).timestamp()
+        history_end = datetime.combine(history_range[1] + timedelta(days=1), datetime.min.time()).timestamp()
+        history_totals = count_store.totals(history_start, history_end, "day", history_sources)
+        st.write(f"**Total**: {sum(history_totals.values())} vehicles")
+        rows = count_store.query(history_start, history_end, history_resolution, history_sources)
+        if rows:
+            # One column per vehicle type, summed over the chosen sources
+            series = {}
+            for ts, _, cls, n in rows:
+                series.setdefault(ts, {}).setdefault(cls, 0)
+                series[ts][cls] += n
+            classes = sorted({cls for _, _, cls, _ in rows})
+            chart = {"Time": [datetime.fromtimestamp(ts) for ts in series]}
+            chart.update({cls: [series[ts].get(cls, 0) for ts in series] for cls in classes})
+            st.bar_chart(chart, x="Time", y=classes)
+        st.download_button(
+            label="📥 Download Report",
+            data=count_store.csv(history_start, history_end, history_resolution, history_sources),
+            file_name=f"traffic_report_{history_range[0]}_{history_range[1]}.csv",
+            mime="text/csv"
+        )
 
 
 # Main Content
@@ -175,156 +351,350 @@ with tab1:
     if uploaded_file is not None:
         col1, col2 = st.columns(2)
         
-        image = Image.open(uploaded_file)
+        # Same upload + model: reuse the decoded image and its raw boxes, only the threshold changes
+        image_key = ("image", bytes_hash(uploaded_file.getvalue())) + detector_key
+        cached = detection_cache.get(image_key) if use_detection_cache else None
+        image_hit = cached is not None
+        if not image_hit:
+            with metrics.time("image", "decode"):
+                image = Image.open(uploaded_file)
+                image.load()
+                frame = np.ascontiguousarray(np.asarray(image.convert("RGB"))[..., ::-1])
+        else:
+            frame = cached.image
+            metrics.inc("image", "detection_cache_hits")
         
-        with col1:
-            st.image(image, caption='Uploaded Image', use_column_width=True)
+        with col1, metrics.time("image", "render"):
+            st.image(frame, caption='Uploaded Image', channels="BGR", use_column_width=True)
             
         with st.spinner('Detecting...'):
-            results = model.predict(image, conf=confidence)
+            t_inference = time.perf_counter()
+            with metrics.time("image", "inference"):
+                detect = roi_detector or model.predict
+                if cached is None and use_detection_cache:
+                    results = detect(frame, conf=CONF_FLOOR, max_det=FLOOR_MAX_DET)
+                    cached = ImageDetections(frame, raw_boxes(results[0]))
+                    detection_cache.put(image_key, cached)
+                if cached is not None and cached.covers(confidence):
+                    results = cached.results(confidence, model.names)
+                else:
+                    # Below the floor, or the floor-level run was cut above this threshold
+                    results = detect(frame, conf=confidence)
+            t_inference = time.perf_counter() - t_inference
             
             # Visualize results
-            res_plotted = results[0].plot()
-            res_image = Image.fromarray(res_plotted[..., ::-1]) # RGB to BGR fix if needed, usually plot returns BGR
-            # Actually plot() returns a numpy array in BGR (OpenCV format)
-            # So we need to convert BGR to RGB for PIL/Streaamlit
-            res_image = Image.fromarray(res_plotted[..., ::-1]) 
+            with metrics.time("image", "plot"):
+                res_plotted = plot_results(results)
+            with metrics.time("image", "convert"):
+                # plot() returns BGR (OpenCV format), PIL/Streamlit want RGB
+                res_image = Image.fromarray(res_plotted[..., ::-1])
 
-        with col2:
+        with col2, metrics.time("image", "render"):
             st.image(res_image, caption='Detected Image', use_column_width=True)
+            if image_hit:
+                st.caption(f"Cached detections re-filtered in {t_inference * 1000:.1f} ms, no inference")
+            elif roi_detector is not None:
+                st.caption(f"Inference: {t_inference * 1000:.0f} ms ({roi_detector.mode}, "
+                           f"{roi_detector.last_crops:.0f} model inputs)")
+        metrics.inc("image", "frames")
+        refresh_performance(force=True)
             
         # Show detections data
         st.write("### 📊 Detection Results")
         
-        # Calculate counts for this image
-        counts = {}
-        for box in results[0].boxes:
-            cls = int(box.cls[0])
-            name = model.names[cls]
-            counts[name] = counts.get(name, 0) + 1
-            
-            # Detailed list (optional, can keep or remove)
-            # conf = float(box.conf[0])
-            # st.write(f"- **{name}**: {conf:.2f} confidence")
+        # Calculate counts for this image (one bincount over all class IDs)
+        counts = frame_counts(results, model.names)
 
         # Use the helper to show the stats box
         with st.sidebar:
              st.empty()
              display_counts(counts)
+             st.download_button("📥 Download Image Report",
+                                data="Vehicle Type,Count\n" + "".join(f"{k},{v}\n" for k, v in counts.items()),
+                                file_name="traffic_report.csv", mime="text/csv")
 
 with tab2:
     st.header("Upload a Video")
     uploaded_video = st.file_uploader("Choose a video...", type=['mp4', 'avi', 'mov'])
 
     if uploaded_video is not None:
-        tfile = tempfile.NamedTemporaryFile(delete=False) 
-        tfile.write(uploaded_video.read())
+        # Spooled to disk in chunks, keyed by content hash so reruns reuse the file
+        spooled_video = get_spool().add(uploaded_video)
         
         # Video Settings
         st.sidebar.markdown("---")
         st.sidebar.subheader("🎥 Video Settings")
-        frame_skip = st.sidebar.slider("Frame Skip (Higher = Faster)", 1, 10, 3)
+        pacing_mode = st.sidebar.selectbox(
+            "Pacing", ["Real-time (match playback)", "Target FPS", "Fixed Frame Skip"],
+            help="Real-time measures inference speed and drops frames evenly so the output keeps up with "
+                 "the video's own clock. Target FPS aims for a fixed processing rate instead.")
+        frame_skip, target_fps = 1, None
+        if pacing_mode == "Fixed Frame Skip":
+            frame_skip = st.sidebar.slider("Frame Skip (Higher = Faster)", 1, 10, 3)
+        elif pacing_mode == "Target FPS":
+            target_fps = st.sidebar.slider("Target Processing FPS", 1, 30, 10)
+        batch_mode = st.sidebar.checkbox("Batch Mode (offline)", value=False,
+                                         help="Detect several frames per model call, then track them in order. "
+                                              "Same counts, higher throughput, a little more latency.")
+        batch_size = st.sidebar.slider("Batch Size", 2, 32, 8) if batch_mode else 1
+        export_mode = st.sidebar.selectbox(
+            "Export Annotated Video", ["Off", "Processed frames only", "Hold annotations (source frame rate)"],
+            help="Writes the annotated frames to an MP4 in the background while processing. Holding repeats "
+                 "each annotation over the frames skipped after it, so the export plays at the video's speed.")
+        if export_mode != "Off":
+            export_width = st.sidebar.select_slider("Export Width", ["Original", 640, 960, 1280, 1920], value=1280)
+            export_overlay = st.sidebar.checkbox("Counts Overlay", value=True)
 
         if st.button("Start Video Processing"):
-            vf = cv2.VideoCapture(tfile.name)
             stframe = st.empty()
             
-            # Counter state
-            unique_ids = set()
-            class_counts = {}
+            # Counter state (unique track IDs or line/zone crossings, bounded memory)
+            track_counter = new_counter()
+            # Keyed by content, holding the latest run only: rerunning a clip replaces its history.
+            # Its buckets are stamped with processing time, not the time the footage was shot.
+            clip_hash = os.path.splitext(os.path.basename(spooled_video.path))[0]
+            video_source = f"video:{uploaded_video.name} [{clip_hash[:8]}]"
+            count_store.replace_source(video_source)
+            count_recorder = CountRecorder(count_store, video_source)
 
             # Create placeholder for stats
             stats_placeholder = st.sidebar.empty()
-
-            frame_count = 0
-            while vf.isOpened():
-                ret, frame = vf.read()
-                if not ret:
-                    break
-                
-                frame_count += 1
-                if frame_count % frame_skip != 0:
-                    continue
-                
-                # Run tracking (not just prediction)
-                results = model.track(frame, conf=confidence, persist=True)
-                res_plotted = results[0].plot()
+            pacing_placeholder = st.sidebar.empty()
+            renderer = FrameRenderer(stframe, max_fps=display_fps, width=display_width)
+            counts_panel = CountsPanel(stats_placeholder, display_counts)
+
+            # Pick frames to keep up with playback instead of a fixed skip
+            scheduler = None
+            if pacing_mode != "Fixed Frame Skip":
+                scheduler = PacingScheduler(source_fps=0, mode=TARGET_FPS if target_fps else REALTIME,
+                                            target_fps=target_fps)
+
+            # A clip already processed with this model and these settings is replayed from its
+            # cached raw detections: same frames, fresh tracker, new threshold, no inference
+            clip_key = ("clip", os.path.basename(spooled_video.path), pacing_mode, frame_skip,
+                        target_fps) + detector_key
+            clip = detection_cache.get(clip_key) if use_detection_cache else None
+            if clip is not None and not clip.covers(confidence):
+                clip = None  # some frame was cut at FLOOR_MAX_DET above this threshold
+            recorder = None
+            frame_schedule = scheduler
+            if clip is not None:
+                st.info("▶️ Replaying cached detections for this clip at the new threshold (no inference).")
+                detector = ReplayDetector(clip, model.names)
+                frame_schedule, scheduler = ReplaySchedule(clip), None
+                metrics.inc("video", "detection_cache_hits")
+            elif use_detection_cache:
+                detector = recorder = RecordingDetector(roi_detector or model.predict, model.names)
+            else:
+                detector = roi_detector
+
+            # Decode, tracking and plotting run on their own threads;
+            # this loop only updates the counts and pushes frames to the UI
+            if batch_mode:
+                infer_fn = BatchTracker(model, conf=confidence, detector=detector)
+            elif detector is not None:
+                infer_fn = BatchTracker(model, conf=confidence, detector=detector).track
+            else:
+                infer_fn = new_tracker()
+            # A replay already has every frame's boxes, gating would only misalign them
+            gate = None
+            if motion_gating and clip is None:
+                gate = infer_fn = MotionGate(infer_fn, gate_threshold, gate_refresh, batch=batch_mode)
+            pipe = VideoPipeline(spooled_video.wait_ready(), infer_fn, annotate_fn=plot_results,
+                                 frame_skip=frame_skip, batch_size=batch_size, scheduler=frame_schedule,
+                                 queue_size=1 if scheduler else 4, metrics=metrics, flow="video")
+            exporter = None
+            export_hold = export_mode.startswith("Hold")
+            export_path = os.path.join(tempfile.gettempdir(),
+                                       f"annotated_{os.path.splitext(os.path.basename(spooled_video.path))[0]}.mp4")
+            processed_frames = []
+            for packet in pipe:
+                processed_frames.append((packet.index, packet.skipped))
+                results = packet.results
+                res_plotted = packet.annotated
                 
                 # Count logic
-                if results[0].boxes.id is not None:
-                    boxes = results[0].boxes
-                    track_ids = boxes.id.int().cpu().tolist()
-                    cls_ids = boxes.cls.int().cpu().tolist()
-                    
-                    for track_id, cls_id in zip(track_ids, cls_ids):
-                        unique_ids.add(track_id)
-                        name = model.names[cls_id]
-                        if name not in class_counts:
-                            class_counts[name] = set()
-                        class_counts[name].add(track_id)
-
-                # Display stats in sidebar (real-time)
-                # Convert sets to lengths for display
-                display_data = {k: len(v) for k, v in class_counts.items()}
+                with metrics.time("video", "count"):
+                    track_counter.update_from_results(results, skipped=packet.skipped)
+                    if isinstance(track_counter, CrossingCounter):
+                        track_counter.draw(res_plotted)
+
+                    # Display stats in sidebar (real-time)
+                    display_data = track_counter.counts(model.names)
+                    count_recorder.update(display_data)
+
+                # Export (resize, overlay and encoding happen on the exporter's thread)
+                if export_mode != "Off":
+                    if exporter is None:
+                        # Known once decoding started; processed-only exports play at the processing rate
+                        export_fps = pipe.source_fps or 25.0
+                        if not export_hold and pacing_mode == "Fixed Frame Skip":
+                            export_fps /= frame_skip
+                        elif not export_hold and target_fps:
+                            export_fps = min(export_fps, target_fps)
+                        exporter = VideoExporter(export_path, export_fps, hold=export_hold,
+                                                 width=None if export_width == "Original" else export_width,
+                                                 overlay=export_overlay)
+                    with metrics.time("video", "export"):
+                        exporter.write(res_plotted, index=packet.index, counts=display_data)
                 
-                # Display frame
-                stframe.image(res_plotted, channels="BGR", use_column_width=True)
-
-                # Overlay counts on sidebar using the helper (clears previous)
-                with stats_placeholder.container():
-                    display_counts(display_data)
-                
-            vf.release()
+                # Display frame (throttled, downscaled JPEG)
+                pushed = renderer.push(res_plotted)
+                if pushed:
+                    metrics.observe("video", "render", renderer.last_push_s)
+
+                # Overlay counts on sidebar using the helper, only when they changed
+                counts_panel.update(display_data)
+
+                refresh_performance()
+
+                if scheduler is not None and pushed:
+                    p = scheduler.stats(packet.index)
+                    metrics.set("video", "lag_seconds", p["lag_s"])
+                    pacing_placeholder.markdown(
+                        f"**⏱️ Pacing**: {p['achieved_fps']:.1f} / {p['source_fps']:.0f} FPS, "
+                        f"dropping {p['drop_rate']:.0%}, lag {p['lag_s']:.2f}s")
+
+            # The whole clip went through: keep its raw detections for replays
+            if recorder is not None and len(recorder.boxes) == len(processed_frames):
+                indices, skipped = zip(*processed_frames) if processed_frames else ((), ())
+                detection_cache.put(clip_key, ClipDetections(indices, skipped, recorder.boxes))
+
+            # Make sure the final frame and counts are on screen
+            renderer.flush()
+            counts_panel.flush()
+            count_store.flush()
+            refresh_performance(force=True)
+
+            if exporter is not None:
+                export_stats = exporter.close(total_frames=pipe.frames_read)
+                # Read from disk only when clicked, not held in memory for the whole session
+                st.download_button("🎬 Download Annotated Video", file_reader(export_path),
+                                   mime="video/mp4",
+                                   file_name=f"annotated_{os.path.splitext(uploaded_video.name)[0]}.mp4")
+                codec_note = "" if export_stats["fourcc"] == "avc1" else \
+                    f" Encoded as {export_stats['fourcc']} (no H.264 encoder here): plays in desktop players, not in most browsers."
+                st.caption(f"Exported {export_stats['written']} frames ({export_stats['held']} held over skipped "
+                           f"frames), {export_stats['encode_ms']:.1f} ms/frame on the encoder thread.{codec_note}")
+
+            # Per-stage throughput of the run
+            with st.sidebar.expander("⏱️ Pipeline Stats"):
+                for stage, s in pipe.report().items():
+                    st.write(f"**{stage}**: {s['throughput_fps']:.1f} FPS "
+                             f"(stage capacity {s['capacity_fps']:.1f} FPS, {s['frames']} frames)")
+                if roi_detector is not None:
+                    st.write(f"**detector**: {roi_detector.mode}, {roi_detector.last_crops:.0f} model inputs per frame")
+                if gate is not None:
+                    g = gate.stats()
+                    metrics.set("video", "motion_gate_saved", g["saved"])
+                    st.write(f"**motion gate**: model skipped on {g['saved']:.0%} of {g['frames']} frames "
+                             f"({g['gate_ms']:.1f} ms/frame to check)")
+                if exporter is not None:
+                    st.write(f"**export**: {export_stats['encode_ms']:.1f} ms/frame encoding, "
+                             f"processing waited {export_stats['stall_s']:.2f}s on the encoder")
 
 with tab3:
     st.header("🔴 Live Camera Analysis")
     st.write("Click the checkbox to start the webcam feed.")
     st.info("Note: To stop the camera, uncheck the box.")
 
+    camera_source = st.text_input(
+        "Camera Source", "0",
+        help="Webcam index (0, 1, ...), or the path of a video file / image folder to use as a stand-in camera.")
+
+    # Unticking the checkbox reruns the script, which interrupts the loop below;
+    # release a capture left over from the previous run before anything else
+    previous_capture = st.session_state.pop("camera_capture", None)
+    if previous_capture is not None:
+        previous_capture.stop()
+
     run_camera = st.checkbox("Start Camera")
 
     if run_camera:
         cam_placeholder = st.empty()
-        cap = cv2.VideoCapture(0)
+        live_placeholder = st.empty()
 
-        if not cap.isOpened():
-            st.error("Could not open webcam.")
-
-        # Counter state
-        class_counts = {}
+        # Counter state (stale track IDs expire, so memory stays flat on 24/7 feeds)
+        track_counter = new_counter()
         
         # Stats placeholder
         stats_placeholder = st.sidebar.empty()
+        renderer = FrameRenderer(cam_placeholder, max_fps=display_fps, width=display_width)
+        counts_panel = CountsPanel(stats_placeholder, display_counts)
+        camera_tracker = new_tracker()
+        if motion_gating:
+            camera_tracker = MotionGate(camera_tracker, gate_threshold, gate_refresh)
+        count_recorder = CountRecorder(count_store, f"camera:{camera_source.strip()}")
+
+        # Capture runs on its own thread and only keeps the newest frame
+        try:
+            capture = LatestFrameCapture(camera_source.strip()).start()
+        except IOError:
+            st.error("Could not open webcam.")
+            capture = None
+        st.session_state["camera_capture"] = capture
 
         # Loop to capture frames
-        while run_camera:
-            ret, frame = cap.read()
-            if not ret:
-                st.error("Failed to capture image from camera.")
-                break
-
-            # Run tracking
-            results = model.track(frame, conf=confidence, persist=True)
-            res_plotted = results[0].plot()
-
-            # Count logic
-            if results[0].boxes.id is not None:
-                boxes = results[0].boxes
-                track_ids = boxes.id.int().cpu().tolist()
-                cls_ids = boxes.cls.int().cpu().tolist()
-                
-                for track_id, cls_id in zip(track_ids, cls_ids):
-                    name = model.names[cls_id]
-                    if name not in class_counts:
-                        class_counts[name] = set()
-                    class_counts[name].add(track_id)
-            
-            # Display frame
-            cam_placeholder.image(res_plotted, channels="BGR", use_column_width=True)
-
-            # Sidebar live update
-            display_data = {k: len(v) for k, v in class_counts.items()}
-            with stats_placeholder.container():
-                 display_counts(display_data)
+        latency_ms, last_index = None, 0
+        t_start, processed = time.perf_counter(), 0
+        try:
+            while capture is not None:
+                with metrics.time("camera", "capture_wait"):
+                    item = capture.read()
+                if item is None:
+                    if capture.live or capture.error is not None or not capture.finished:
+                        st.error("Failed to capture image from camera.")
+                    break
+                frame, captured_at, index = item
+
+                # Run tracking (frames dropped since the last one still age the tracks)
+                dropped = index - last_index - 1
+                with metrics.time("camera", "inference"):
+                    results = camera_tracker(frame, skipped=dropped)
+                if dropped > 0:
+                    metrics.inc("camera", "frames_dropped", dropped)
+                last_index = index
+                with metrics.time("camera", "plot"):
+                    res_plotted = plot_results(results)
 
-        cap.release()
+                # Count logic
+                with metrics.time("camera", "count"):
+                    track_counter.update_from_results(results, skipped=dropped)
+                    if isinstance(track_counter, CrossingCounter):
+                        track_counter.draw(res_plotted)
+                
+                # Display frame (throttled, downscaled JPEG)
+                pushed = renderer.push(res_plotted)
+                if pushed:
+                    metrics.observe("camera", "render", renderer.last_push_s)
+
+                # Sidebar live update (only re-rendered when the counts change)
+                display_data = track_counter.counts(model.names)
+                counts_panel.update(display_data)
+                count_recorder.update(display_data)
+
+                # Capture -> on screen latency and processing rate
+                processed += 1
+                latency = (time.perf_counter() - captured_at) * 1000
+                latency_ms = latency if latency_ms is None else 0.8 * latency_ms + 0.2 * latency
+                metrics.observe("camera", "glass_to_glass", latency / 1000)
+                metrics.inc("camera", "frames")
+                refresh_performance()
+                if pushed:
+                    fps = processed / (time.perf_counter() - t_start)
+                    gated = ""
+                    if motion_gating:
+                        saved = camera_tracker.stats()["saved"]
+                        metrics.set("camera", "motion_gate_saved", saved)
+                        gated = f"  |  **Model skipped**: {saved:.0%}"
+                    live_placeholder.markdown(
+                        f"**Latency**: {latency_ms:.0f} ms  |  **Processing**: {fps:.1f} FPS  |  "
+                        f"**Dropped**: {capture.dropped()} of {capture.frames_captured} frames{gated}")
+            renderer.flush()
+            counts_panel.flush()
+            refresh_performance(force=True)
+        finally:
+            count_store.flush()
+            if capture is not None:
+                capture.stop()
+                st.session_state.pop("camera_capture", None)
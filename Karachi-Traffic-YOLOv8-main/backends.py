@@ -0,0 +1,282 @@
+import argparse
+import glob
+import json
+import logging
+import os
+import shutil
+import tempfile
+import threading
+import time
+
+import cv2
+import numpy as np
+from ultralytics import YOLO
+from ultralytics.data.augment import LetterBox
+from ultralytics.utils import ASSETS
+from ultralytics.utils.downloads import attempt_download_asset
+
+# Exported inference backends for CPU-only servers.
+#
+#   pytorch    the .pt weights, eager PyTorch
+#   onnx       FP32 ONNX run by ONNX Runtime
+#   onnx-int8  the ONNX model statically quantized to INT8 (QDQ, per-channel)
+#
+# Exports are made the first time a backend is asked for and cached next to
+# the weights (yolov8n.onnx, yolov8n.int8.onnx). They are remade when the .pt
+# file is newer. Each export is checked once against the .pt model on sample
+# images; the result and the measured latencies are cached in a .json file
+# beside it.
+#
+#   python backends.py yolov8n.pt   # export, check and time every backend
+
+BACKENDS = ("pytorch", "onnx", "onnx-int8")
+SUFFIXES = {"onnx": ".onnx", "onnx-int8": ".int8.onnx"}
+
+# Minimum share of detections that must agree with the .pt model
+MIN_AGREEMENT = {"onnx": 0.98, "onnx-int8": 0.85}
+MATCH_IOU = 0.5
+
+# Images used to calibrate INT8 activations and to check the exports
+SAMPLE_DIRS = [os.environ.get("TRAFFIC_CALIB_DIR", ""), "dataset/val/images", "dataset/train/images"]
+SAMPLE_LIMIT = 32
+IMAGE_EXTS = (".jpg", ".jpeg", ".png", ".bmp")
+
+# One lock per output file: an INT8 quantization of one model doesn't hold up
+# exports of other models or backends, only other requests for the same file
+_export_locks = {}
+_export_locks_lock = threading.Lock()
+logger = logging.getLogger(__name__)
+
+
+def _path_lock(path):
+    with _export_locks_lock:
+        return _export_locks.setdefault(os.path.abspath(path), threading.Lock())
+
+
+def export_path(weights, backend):
+    if backend == "pytorch":
+        return weights
+    return os.path.splitext(weights)[0] + SUFFIXES[backend]
+
+
+def _up_to_date(path, weights):
+    return os.path.exists(path) and os.path.getmtime(path) >= os.path.getmtime(weights)
+
+
+def sample_images(limit=SAMPLE_LIMIT):
+    paths = []
+    for directory in SAMPLE_DIRS:
+        if directory and os.path.isdir(directory):
+            paths += sorted(p for p in glob.glob(os.path.join(directory, "*")) if p.lower().endswith(IMAGE_EXTS))
+    paths += sorted(str(p) for p in ASSETS.glob("*.jpg"))
+    images = [cv2.imread(p) for p in paths[:limit]]
+    return [im for im in images if im is not None]
+
+
+def _resolve_weights(weights):
+    # Names like 'yolov8n.pt' are fetched from the ultralytics release assets on first use
+    if not os.path.exists(weights):
+        weights = str(attempt_download_asset(weights))
+        if not os.path.exists(weights):
+            raise FileNotFoundError(f"Model weights '{weights}' not found")
+    return weights
+
+
+def _export_onnx(weights, path, imgsz):
+    # Export from a copy in a scratch directory, then move the result into
+    # place, so another process never picks up a half-written file
+    with tempfile.TemporaryDirectory() as tmp:
+        src = shutil.copy(weights, tmp)
+        out = YOLO(src).export(format="onnx", imgsz=imgsz, dynamic=True, simplify=True, verbose=False)
+        os.replace(out, path)
+
+
+class _CalibrationReader:
+    """Feeds letterboxed sample images to the ONNX Runtime calibrator."""
+
+    def __init__(self, images, imgsz, input_name):
+        letterbox = LetterBox((imgsz, imgsz), auto=True, stride=32)
+        self.batches = []
+        for im in images:
+            x = letterbox(image=im)[..., ::-1].transpose(2, 0, 1)  # BGR HWC -> RGB CHW
+            self.batches.append({input_name: np.ascontiguousarray(x[None], dtype=np.float32) / 255.0})
+        self._it = iter(self.batches)
+
+    def get_next(self):
+        return next(self._it, None)
+
+    def rewind(self):
+        self._it = iter(self.batches)
+
+
+def _head_postprocess_nodes(model):
+    # The Detect head decodes boxes (pixels) and class scores (0-1) and
+    # concatenates them into one output; sharing one INT8 scale wipes out the
+    # scores, so everything in the head after its conv branches stays float
+    output = model.graph.output[0].name
+    producer = next(n for n in model.graph.node if output in n.output)
+    head = "/".join(producer.name.split("/")[:2]) + "/"  # e.g. '/model.22/'
+    branches = (head + "cv2", head + "cv3")
+    return [n.name for n in model.graph.node if n.name.startswith(head) and not n.name.startswith(branches)]
+
+
+def _quantize_int8(fp32_path, path, imgsz):
+    import onnx
+    import onnxruntime as ort
+    from onnxruntime.quantization import QuantFormat, QuantType, quantize_static
+    from onnxruntime.quantization.shape_inference import quant_pre_process
+
+    images = sample_images()
+    if not images:
+        raise RuntimeError("No calibration images found, set TRAFFIC_CALIB_DIR to a folder of frames")
+    input_name = ort.InferenceSession(fp32_path, providers=["CPUExecutionProvider"]).get_inputs()[0].name
+    reader = _CalibrationReader(images, imgsz, input_name)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        prepared = os.path.join(tmp, "prepared.onnx")
+        quantized = os.path.join(tmp, "int8.onnx")
+        # Symbolic shape inference can't follow the dynamic batch / image size
+        quant_pre_process(fp32_path, prepared, skip_symbolic_shape=True)
+        quantize_static(prepared, quantized, reader, quant_format=QuantFormat.QDQ, per_channel=True,
+                        activation_type=QuantType.QUInt8, weight_type=QuantType.QInt8,
+                        nodes_to_exclude=_head_postprocess_nodes(onnx.load(fp32_path)))
+        os.replace(quantized, path)
+
+
+def ensure_exported(weights, backend, imgsz=640):
+    """Path of the model file for backend, exporting it first if needed.
+
+    Progress is logged to the 'backends' logger; callers decide whether and how to show it.
+    """
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown backend '{backend}', choose from {', '.join(BACKENDS)}")
+    weights = _resolve_weights(weights)
+    if backend == "pytorch":
+        return weights
+
+    path = export_path(weights, backend)
+    with _path_lock(path):
+        if _up_to_date(path, weights):
+            return path
+        if backend == "onnx":
+            logger.info(f"📦 Exporting {weights} to ONNX...")
+            _export_onnx(weights, path, imgsz)
+        else:
+            # Takes the FP32 file's lock inside this one, never the other way round
+            fp32 = ensure_exported(weights, "onnx", imgsz)
+            logger.info(f"📦 Quantizing {fp32} to INT8...")
+            _quantize_int8(fp32, path, imgsz)
+    return path
+
+
+def measure_latency(model, images, imgsz=640, runs=1):
+    """Median milliseconds per image, after one warm-up call."""
+    model.predict(images[0], imgsz=imgsz, verbose=False)
+    times = []
+    for _ in range(runs):
+        for im in images:
+            t0 = time.perf_counter()
+            model.predict(im, imgsz=imgsz, verbose=False)
+            times.append(time.perf_counter() - t0)
+    return float(np.median(times)) * 1000
+
+
+def _box_iou(a, b):
+    lt = np.maximum(a[:, None, :2], b[None, :, :2])
+    rb = np.minimum(a[:, None, 2:], b[None, :, 2:])
+    inter = np.clip(rb - lt, 0, None).prod(axis=2)
+    area_a = (a[:, 2:] - a[:, :2]).prod(axis=1)
+    area_b = (b[:, 2:] - b[:, :2]).prod(axis=1)
+    return inter / (area_a[:, None] + area_b[None] - inter + 1e-9)
+
+
+def detection_agreement(reference, candidate, images, conf=0.25, imgsz=640):
+    """Share of detections found by both models (same class, IoU >= MATCH_IOU).
+
+    Matches are greedy by IoU per image; the share is taken over the larger of
+    the two detection counts, so both missed and extra boxes lower it.
+    """
+    matched = total = 0
+    conf_diff = []
+    for im in images:
+        ref = reference.predict(im, conf=conf, imgsz=imgsz, verbose=False)[0].boxes
+        cand = candidate.predict(im, conf=conf, imgsz=imgsz, verbose=False)[0].boxes
+        total += max(len(ref), len(cand))
+        if not len(ref) or not len(cand):
+            continue
+        iou = _box_iou(ref.xyxy.cpu().numpy(), cand.xyxy.cpu().numpy())
+        iou[ref.cls.cpu().numpy()[:, None] != cand.cls.cpu().numpy()[None]] = 0
+        while True:
+            i, j = np.unravel_index(iou.argmax(), iou.shape)
+            if iou[i, j] < MATCH_IOU:
+                break
+            matched += 1
+            conf_diff.append(abs(float(ref.conf[i]) - float(cand.conf[j])))
+            iou[i, :] = 0
+            iou[:, j] = 0
+    return {
+        "agreement": matched / total if total else 1.0,
+        "detections": total,
+        "conf_diff": float(np.mean(conf_diff)) if conf_diff else 0.0,
+    }
+
+
+def cached_check(weights, backend, imgsz=640):
+    """The saved check report of an export, or None if it has to be redone."""
+    if backend == "pytorch":
+        return None
+    path = export_path(weights, backend)
+    cache = path + ".json"
+    if not (os.path.exists(weights) and _up_to_date(path, weights) and _up_to_date(cache, path)):
+        return None
+    with open(cache) as f:
+        report = json.load(f)
+    return report if report.get("imgsz") == imgsz else None
+
+
+def check_backend(weights, backend, imgsz=640, reference=None, candidate=None):
+    """Compare an exported backend with the .pt model; cached per export.
+
+    Returns a dict with agreement, latency_ms, reference_ms and ok.
+    """
+    weights = _resolve_weights(weights)
+    report = cached_check(weights, backend, imgsz)
+    if report is not None:
+        return report
+
+    path = ensure_exported(weights, backend, imgsz)
+    images = sample_images()
+    reference = reference or YOLO(weights)
+    report = {"backend": backend, "imgsz": imgsz, "reference_ms": measure_latency(reference, images, imgsz)}
+    if backend == "pytorch":
+        report.update(agreement=1.0, detections=0, conf_diff=0.0, latency_ms=report["reference_ms"], ok=True)
+        return report
+
+    candidate = candidate or YOLO(path, task="detect")
+    report["latency_ms"] = measure_latency(candidate, images, imgsz)
+    report.update(detection_agreement(reference, candidate, images, imgsz=imgsz))
+    report["ok"] = report["agreement"] >= MIN_AGREEMENT[backend]
+    with open(path + ".json", "w") as f:
+        json.dump(report, f, indent=2)
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Export, check and time each inference backend")
+    parser.add_argument("weights", nargs="?", default="yolov8n.pt")
+    parser.add_argument("--imgsz", type=int, default=640)
+    parser.add_argument("--backends", nargs="+", default=list(BACKENDS), choices=BACKENDS)
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+
+    print(f"{'Backend':<10} {'Size MB':>8} {'ms/img':>8} {'Speedup':>8} {'Agree':>7}")
+    for backend in args.backends:
+        report = check_backend(args.weights, backend, args.imgsz)
+        size = os.path.getsize(ensure_exported(args.weights, backend, args.imgsz)) / 1e6
+        status = "" if report["ok"] else f"  ❌ below {MIN_AGREEMENT[backend]:.0%}"
+        print(f"{backend:<10} {size:>8.1f} {report['latency_ms']:>8.1f} "
+              f"{report['reference_ms'] / report['latency_ms']:>7.2f}x {report['agreement']:>6.1%}{status}")
+
+
+if __name__ == "__main__":
+    main()
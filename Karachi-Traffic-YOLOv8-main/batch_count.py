@@ -0,0 +1,258 @@
+import argparse
+import csv
+import glob
+import json
+import logging
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import cv2
+
+from backends import BACKENDS, check_backend
+from counting import TrackCounter, frame_counts
+
+# Headless vehicle counting over folders / globs of images and videos.
+#
+#   python batch_count.py /data/cams/2024-05-*/ --model yolov8n.pt --workers 4 -o counts.csv
+#
+# Each worker process holds its own model. Results are appended to the output
+# as soon as a file finishes, so an interrupted run can be restarted with the
+# same command and will skip the files that are already in the output.
+#
+# With --export DIR every video is also written to DIR as an annotated MP4
+# (same folder layout as the inputs), encoded on a background thread.
+
+IMAGE_EXTS = (".jpg", ".jpeg", ".png", ".bmp")
+VIDEO_EXTS = (".mp4", ".avi", ".mov", ".mkv")
+
+# Worker-process state, set up once by _init_worker
+_worker = {}
+
+
+def expand_inputs(inputs):
+    files = []
+    for item in inputs:
+        if os.path.isdir(item):
+            for root, _, names in os.walk(item):
+                files.extend(os.path.join(root, n) for n in names)
+        elif any(ch in item for ch in "*?["):
+            files.extend(glob.glob(item, recursive=True))
+        else:
+            files.append(item)
+    files = [os.path.abspath(f) for f in files if f.lower().endswith(IMAGE_EXTS + VIDEO_EXTS)]
+    return sorted(set(files))
+
+
+def _init_worker(model_path, backend, conf, imgsz, frame_skip, batch_size, threads, export=None):
+    import torch
+
+    from model_registry import ModelRegistry
+
+    if threads:
+        torch.set_num_threads(threads)
+    _worker["model"] = ModelRegistry(warmup_imgsz=imgsz).get(model_path, backend)
+    _worker.update(conf=conf, imgsz=imgsz, frame_skip=frame_skip, batch_size=batch_size, export=export or {})
+
+
+def _count_image(path):
+    model = _worker["model"]
+    results = model.predict(path, conf=_worker["conf"], imgsz=_worker["imgsz"], verbose=False)
+    return frame_counts(results, model.names), 1
+
+
+def _count_video(path, export_path=None):
+    from tracking import BatchTracker
+
+    model = _worker["model"]
+    # A fresh tracker per video so IDs don't carry over between files
+    tracker = BatchTracker(model, conf=_worker["conf"], imgsz=_worker["imgsz"])
+    counter = TrackCounter(len(model.names))
+    frames_done = 0
+
+    cap = cv2.VideoCapture(path)
+    exporter = None
+    if export_path:
+        from export import VideoExporter
+
+        os.makedirs(os.path.dirname(export_path), exist_ok=True)
+        fps = cap.get(cv2.CAP_PROP_FPS) or 25.0
+        hold = _worker["export"].get("hold", False)
+        exporter = VideoExporter(export_path, fps if hold else fps / _worker["frame_skip"],
+                                 width=_worker["export"].get("width"), hold=hold)
+
+    def flush(batch, indices):
+        for results, index in zip(tracker(batch), indices):
+            counter.update_from_results(results)
+            if exporter is not None:
+                exporter.write(results[0].plot(), index=index, counts=counter.counts(model.names))
+
+    batch, indices = [], []
+    frame_count = 0
+    try:
+        while True:
+            ret, frame = cap.read()
+            if not ret:
+                break
+            frame_count += 1
+            if frame_count % _worker["frame_skip"] != 0:
+                continue
+            batch.append(frame)
+            indices.append(frame_count)
+            frames_done += 1
+            if len(batch) == _worker["batch_size"]:
+                flush(batch, indices)
+                batch, indices = [], []
+        flush(batch, indices)
+    finally:
+        cap.release()
+        if exporter is not None:
+            exporter.close(total_frames=frame_count)
+    return counter.counts(model.names), frames_done
+
+
+def export_paths(files, export_dir):
+    """Annotated MP4 path for every video, mirroring the inputs' folders under export_dir."""
+    videos = [f for f in files if f.lower().endswith(VIDEO_EXTS)]
+    if not videos:
+        return {}
+    root = os.path.commonpath([os.path.dirname(f) for f in videos])
+    return {f: os.path.join(export_dir, os.path.splitext(os.path.relpath(f, root))[0] + ".mp4") for f in videos}
+
+
+def process_file(path, export_path=None):
+    t0 = time.perf_counter()
+    try:
+        if path.lower().endswith(VIDEO_EXTS):
+            counts, frames = _count_video(path, export_path)
+        else:
+            counts, frames = _count_image(path)
+        error = None
+    except Exception as e:
+        counts, frames, error = {}, 0, str(e)
+    return {"file": path, "frames": frames, "seconds": time.perf_counter() - t0, "counts": counts, "error": error}
+
+
+class ReportWriter:
+    """Appends per-file counts as CSV (same columns as traffic_report.csv plus File) or JSONL."""
+
+    def __init__(self, path):
+        self.path = path
+        self.fmt = "jsonl" if path.endswith((".jsonl", ".json")) else "csv"
+
+    def done_files(self):
+        if not os.path.exists(self.path):
+            return set()
+        done = set()
+        with open(self.path, newline="") as f:
+            if self.fmt == "jsonl":
+                for line in f:
+                    try:
+                        record = json.loads(line)
+                    except ValueError:
+                        continue  # half-written last line from an interrupted run
+                    if not record.get("error"):
+                        done.add(record["file"])
+            else:
+                # The Total row is written last, so its presence means the file is complete
+                for row in csv.DictReader(f):
+                    if row.get("Vehicle Type") == "Total":
+                        done.add(row["File"])
+        return done
+
+    def __enter__(self):
+        new_file = not os.path.exists(self.path) or os.path.getsize(self.path) == 0
+        self.handle = open(self.path, "a", newline="")
+        if self.fmt == "csv":
+            self.writer = csv.writer(self.handle)
+            if new_file:
+                self.writer.writerow(["File", "Vehicle Type", "Count"])
+        return self
+
+    def write(self, record):
+        if self.fmt == "jsonl":
+            out = dict(record, total=sum(record["counts"].values()))
+            self.handle.write(json.dumps(out) + "\n")
+        elif not record["error"]:
+            for name, count in record["counts"].items():
+                self.writer.writerow([record["file"], name, count])
+            self.writer.writerow([record["file"], "Total", sum(record["counts"].values())])
+        self.handle.flush()
+
+    def __exit__(self, *exc):
+        self.handle.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Count vehicles in folders of images and videos")
+    parser.add_argument("inputs", nargs="+", help="Files, directories or glob patterns")
+    parser.add_argument("-o", "--output", default="traffic_report.csv", help="Output .csv or .jsonl")
+    parser.add_argument("--model", default="yolov8n.pt")
+    parser.add_argument("--backend", default="pytorch", choices=BACKENDS, help="onnx-int8 is the fastest on CPU")
+    parser.add_argument("--conf", type=float, default=0.25)
+    parser.add_argument("--imgsz", type=int, default=640)
+    parser.add_argument("--frame-skip", type=int, default=1)
+    parser.add_argument("--batch-size", type=int, default=8, help="Frames per model call for videos")
+    parser.add_argument("--workers", type=int, default=max(1, (os.cpu_count() or 2) // 2))
+    parser.add_argument("--export", metavar="DIR", help="Also write every video, annotated, as an MP4 to DIR")
+    parser.add_argument("--export-width", type=int, help="Downscale exported videos to this width")
+    parser.add_argument("--export-hold", action="store_true",
+                        help="Repeat annotations over skipped frames so exports keep the source frame rate")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format="%(message)s")  # backend export progress
+
+    files = expand_inputs(args.inputs)
+    report = ReportWriter(args.output)
+    done = report.done_files()
+    todo = [f for f in files if f not in done]
+    print(f"📂 {len(files)} files found, {len(files) - len(todo)} already done, {len(todo)} to process")
+    if not todo:
+        return
+
+    # Export and check the backend once here, not in every worker
+    if args.backend != "pytorch":
+        check = check_backend(args.model, args.backend, args.imgsz)
+        print(f"🧪 {args.backend}: {check['latency_ms']:.1f} ms/img vs {check['reference_ms']:.1f} ms/img for PyTorch, "
+              f"{check['agreement']:.1%} of detections match")
+        if not check["ok"]:
+            print(f"❌ {args.backend} detections differ too much from {args.model}, use --backend pytorch", file=sys.stderr)
+            sys.exit(1)
+
+    # Split the cores between workers so they don't fight over torch threads
+    threads = max(1, (os.cpu_count() or 1) // args.workers)
+    export = {"width": args.export_width, "hold": args.export_hold}
+    init_args = (args.model, args.backend, args.conf, args.imgsz, args.frame_skip, args.batch_size, threads, export)
+    exports = export_paths(todo, args.export) if args.export else {}
+
+    t0 = time.perf_counter()
+    files_done = frames_done = failed = 0
+    with report, ProcessPoolExecutor(args.workers, initializer=_init_worker, initargs=init_args) as pool:
+        futures = [pool.submit(process_file, f, exports.get(f)) for f in todo]
+        try:
+            for future in as_completed(futures):
+                record = future.result()
+                report.write(record)
+                files_done += 1
+                frames_done += record["frames"]
+                if record["error"]:
+                    failed += 1
+                    print(f"❌ {record['file']}: {record['error']}", file=sys.stderr)
+                elapsed = time.perf_counter() - t0
+                print(f"   [{files_done}/{len(todo)}] {files_done / elapsed:.2f} files/s, "
+                      f"{frames_done / elapsed:.1f} frames/s", end="\r")
+        except KeyboardInterrupt:
+            print("\n⚠️ Interrupted, finished files are saved. Re-run the same command to resume.")
+            pool.shutdown(wait=False, cancel_futures=True)
+            return
+
+    elapsed = time.perf_counter() - t0
+    print(f"\n✅ {files_done} files ({frames_done} frames) in {elapsed:.1f}s: "
+          f"{files_done / elapsed:.2f} files/s, {frames_done / elapsed:.1f} frames/s, {failed} failed")
+    print(f"   Report written to {args.output}")
+    if exports:
+        print(f"   Annotated videos written to {args.export}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,108 @@
+import argparse
+import os
+import tempfile
+import time
+
+import cv2
+import numpy as np
+from ultralytics import YOLO
+
+from tracking import DEFAULT_TRACKER, BatchTracker
+
+# Frames/sec of the Video Detection path vs. batch size, on whatever device
+# torch picks (CPU on our servers). Batch size 1 is the sequential
+# model.track() path the app used before batch mode existed.
+#
+#   python benchmark_batch.py --video clip.mp4 --batch-sizes 1,4,8,16
+
+
+def make_synthetic_clip(path, frames=120, size=(640, 360)):
+    # A few moving rectangles so the tracker has something to do
+    w, h = size
+    writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*"mp4v"), 25, size)
+    rng = np.random.default_rng(0)
+    boxes = rng.integers(0, min(w, h) // 2, size=(6, 2))
+    for i in range(frames):
+        frame = np.full((h, w, 3), 60, dtype=np.uint8)
+        for j, (x, y) in enumerate(boxes):
+            x0 = int((x + i * (3 + j)) % (w - 80))
+            cv2.rectangle(frame, (x0, int(y)), (x0 + 80, int(y) + 50), (40 * j, 200, 255 - 40 * j), -1)
+        writer.write(frame)
+    writer.release()
+
+
+def read_frames(path, frame_skip):
+    cap = cv2.VideoCapture(path)
+    frames = []
+    index = 0
+    while True:
+        ret, frame = cap.read()
+        if not ret:
+            break
+        index += 1
+        if index % frame_skip == 0:
+            frames.append(frame)
+    cap.release()
+    return frames
+
+
+def count_tracks(model, results_per_frame):
+    class_counts = {}
+    for results in results_per_frame:
+        boxes = results[0].boxes
+        if boxes.id is None:
+            continue
+        for track_id, cls_id in zip(boxes.id.int().cpu().tolist(), boxes.cls.int().cpu().tolist()):
+            class_counts.setdefault(model.names[cls_id], set()).add(track_id)
+    return {k: len(v) for k, v in class_counts.items()}
+
+
+def run(model_path, frames, batch_size, conf, imgsz):
+    # Fresh model per run so tracker state doesn't leak between runs
+    model = YOLO(model_path)
+    model.predict(frames[0], imgsz=imgsz, verbose=False)  # warmup
+
+    t0 = time.perf_counter()
+    if batch_size == 1:
+        outputs = [model.track(f, conf=conf, imgsz=imgsz, persist=True, tracker=DEFAULT_TRACKER, verbose=False)
+                   for f in frames]
+    else:
+        tracker = BatchTracker(model, conf=conf, imgsz=imgsz)
+        outputs = []
+        for i in range(0, len(frames), batch_size):
+            outputs.extend(tracker(frames[i:i + batch_size]))
+    elapsed = time.perf_counter() - t0
+    return len(frames) / elapsed, count_tracks(model, outputs)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark batched video inference")
+    parser.add_argument("--video", help="Video to benchmark (a synthetic clip is generated if omitted)")
+    parser.add_argument("--model", default="yolov8n.pt")
+    parser.add_argument("--batch-sizes", default="1,2,4,8,16")
+    parser.add_argument("--frame-skip", type=int, default=1)
+    parser.add_argument("--conf", type=float, default=0.25)
+    parser.add_argument("--imgsz", type=int, default=640)
+    args = parser.parse_args()
+
+    video = args.video
+    if video is None:
+        video = os.path.join(tempfile.gettempdir(), "traffic_benchmark_clip.mp4")
+        make_synthetic_clip(video)
+
+    frames = read_frames(video, args.frame_skip)
+    print(f"Video: {video} ({len(frames)} frames after skip {args.frame_skip})")
+    print(f"Model: {args.model}, imgsz={args.imgsz}\n")
+    print(f"{'batch':>6} {'frames/sec':>11} {'speedup':>8}  counts match")
+
+    baseline_fps, baseline_counts = None, None
+    for bs in [int(b) for b in args.batch_sizes.split(",")]:
+        fps, counts = run(args.model, frames, bs, args.conf, args.imgsz)
+        if baseline_fps is None:
+            baseline_fps, baseline_counts = fps, counts
+        match = "yes" if counts == baseline_counts else f"NO {counts}"
+        print(f"{bs:>6} {fps:>11.2f} {fps / baseline_fps:>7.2f}x  {match}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,108 @@
+import argparse
+import sys
+import time
+
+import numpy as np
+
+from counting import TrackCounter, class_histogram, histogram_to_counts
+
+# Micro-benchmark of the counting code against the dict/set version the app
+# used before counting.py. Simulates a long-running camera: tracks appear,
+# live for a while and leave, so track IDs keep increasing forever.
+#
+#   python benchmark_counting.py --frames 200000 --tracks 60
+
+
+def simulate(frames, tracks_per_frame, num_classes, seed=0):
+    # Pre-generate every frame's (ids, cls) so only the counting is timed
+    rng = np.random.default_rng(seed)
+    lifetime = 90
+    stream = []
+    for f in range(frames):
+        # Each track lives `lifetime` frames; new IDs start every frame
+        first = f * tracks_per_frame // lifetime
+        ids = np.arange(first, first + tracks_per_frame, dtype=np.int64)
+        cls = (ids * 7919 + seed) % num_classes
+        keep = rng.random(tracks_per_frame) < 0.95  # missed detections
+        stream.append((ids[keep], cls[keep]))
+    return stream
+
+
+def dict_set_counting(stream, names):
+    # The original app.py loop
+    class_counts = {}
+    t0 = time.perf_counter()
+    for ids, cls in stream:
+        for track_id, cls_id in zip(ids.tolist(), cls.tolist()):
+            name = names[cls_id]
+            if name not in class_counts:
+                class_counts[name] = set()
+            class_counts[name].add(track_id)
+        display_data = {k: len(v) for k, v in class_counts.items()}
+    elapsed = time.perf_counter() - t0
+    memory = sum(sys.getsizeof(v) + len(v) * 28 for v in class_counts.values())
+    return elapsed, display_data, memory
+
+
+def track_counter_counting(stream, names):
+    counter = TrackCounter(len(names))
+    t0 = time.perf_counter()
+    for ids, cls in stream:
+        counter.update(ids, cls)
+        display_data = counter.counts(names)
+    elapsed = time.perf_counter() - t0
+    memory = counter.table.ids.nbytes + counter.table.last_seen.nbytes + counter.totals.nbytes
+    return elapsed, display_data, memory
+
+
+def per_frame_histogram(stream, names):
+    # The image tab used to loop over ultralytics Boxes one box at a time
+    import torch
+    from ultralytics.engine.results import Boxes
+
+    frames = []
+    for _, cls in stream[:2000]:
+        data = torch.zeros((len(cls), 6))
+        data[:, 2:4] = 10
+        data[:, 5] = torch.from_numpy(cls)
+        frames.append(Boxes(data, (640, 640)))
+
+    t0 = time.perf_counter()
+    for boxes in frames:
+        counts = {}
+        for box in boxes:
+            name = names[int(box.cls[0])]
+            counts[name] = counts.get(name, 0) + 1
+    loop_s = time.perf_counter() - t0
+    t0 = time.perf_counter()
+    for boxes in frames:
+        histogram_to_counts(class_histogram(boxes.cls, len(names)), names)
+    return loop_s / len(frames), (time.perf_counter() - t0) / len(frames)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark per-frame and cumulative counting")
+    parser.add_argument("--frames", type=int, default=100000)
+    parser.add_argument("--tracks", type=int, default=60, help="Active tracks per frame")
+    parser.add_argument("--classes", type=int, default=19)
+    args = parser.parse_args()
+
+    names = {i: f"class_{i}" for i in range(args.classes)}
+    stream = simulate(args.frames, args.tracks, args.classes)
+    n = len(stream)
+
+    loop_s, hist_s = per_frame_histogram(stream, names)
+    print(f"Per-frame class counts ({args.tracks} boxes/frame)")
+    print(f"   loop over Boxes : {loop_s * 1e6:8.1f} us/frame")
+    print(f"   bincount        : {hist_s * 1e6:8.1f} us/frame\n")
+
+    old_s, old_counts, old_mem = dict_set_counting(stream, names)
+    new_s, new_counts, new_mem = track_counter_counting(stream, names)
+    print(f"Cumulative unique-track counts over {n} frames")
+    print(f"   dict/set     : {old_s / n * 1e6:8.1f} us/frame, ~{old_mem / 1e6:.1f} MB held at the end")
+    print(f"   TrackCounter : {new_s / n * 1e6:8.1f} us/frame, {new_mem / 1e6:.3f} MB held at the end")
+    print(f"   counts match : {'yes' if old_counts == new_counts else 'NO'}")
+
+
+if __name__ == "__main__":
+    main()
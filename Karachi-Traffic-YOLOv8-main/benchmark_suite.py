@@ -0,0 +1,334 @@
+import argparse
+import json
+import os
+import platform
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from multiprocessing import get_context
+
+import cv2
+import numpy as np
+
+# Reproducible CPU benchmark of the detection, tracking and counting paths.
+#
+# Synthetic traffic (moving vehicles of several sizes on a road, seeded so
+# every run draws the same pixels) is generated once per setting and reused.
+# Each (model, backend, imgsz) case runs in a fresh process, so its peak RSS
+# is its own. Results go to a JSON file that later runs can be compared with:
+#
+#   python benchmark_suite.py --models yolov8n.pt,yolov8m.pt --imgsz 320,640 -o before.json
+#   ... change something ...
+#   python benchmark_suite.py --models yolov8n.pt,yolov8m.pt --imgsz 320,640 -o after.json --compare before.json
+#   python benchmark_suite.py --compare before.json after.json   # compare only
+#
+# Weights that are not on disk are not downloaded: the model is built from
+# its .yaml with random weights instead (timings only, marked in the results).
+
+DATA_DIR = os.path.join("benchmarks", "data")
+
+# name, class id in yolov8n's COCO classes, size as a fraction of the frame width, speed in widths/second
+VEHICLE_TYPES = [
+    ("motorcycle", 3, (0.04, 0.03), 0.20),
+    ("car", 2, (0.09, 0.05), 0.15),
+    ("truck", 7, (0.16, 0.08), 0.10),
+    ("bus", 5, (0.20, 0.09), 0.08),
+]
+
+
+class SyntheticTraffic:
+    """Deterministic road scene with vehicles driving along lanes.
+
+    Vehicles that leave the frame come back in on the other side with a new
+    track ID, so IDs keep growing like on a real camera. truth(i) gives the
+    ground-truth (ids, cls, xyxy) of frame i.
+    """
+
+    def __init__(self, width=1280, height=720, vehicles=12, fps=25, seed=0):
+        self.width, self.height, self.fps = width, height, fps
+        rng = np.random.default_rng(seed)
+        self.n = vehicles
+        kinds = rng.integers(0, len(VEHICLE_TYPES), vehicles)
+        lanes = 6
+        lane_h = height * 0.7 / lanes
+        self.lane = rng.integers(0, lanes, vehicles)
+        self.direction = np.where(self.lane < lanes // 2, 1.0, -1.0)
+        self.cls = np.array([VEHICLE_TYPES[k][1] for k in kinds], dtype=np.int64)
+        self.size = np.array([VEHICLE_TYPES[k][2] for k in kinds]) * width * rng.uniform(0.8, 1.2, (vehicles, 1))
+        self.speed = np.array([VEHICLE_TYPES[k][3] for k in kinds]) * width / fps * rng.uniform(0.7, 1.3, vehicles)
+        self.start = rng.uniform(0, width, vehicles)
+        self.y = height * 0.2 + (self.lane + 0.5) * lane_h - self.size[:, 1] / 2
+        self.color = rng.integers(30, 256, (vehicles, 3))
+
+        self.background = np.full((height, width, 3), 70, dtype=np.uint8)
+        self.background[: int(height * 0.2)] = (150, 120, 90)  # buildings / sky band
+        for k in range(1, lanes):
+            y = int(height * 0.2 + k * lane_h)
+            for x in range(0, width, 60):
+                cv2.line(self.background, (x, y), (x + 30, y), (200, 200, 200), 2)
+        noise = rng.integers(0, 12, self.background.shape, dtype=np.uint8)
+        self.background = cv2.add(self.background, noise)
+
+    def truth(self, i):
+        span = self.width + self.size[:, 0]
+        travelled = self.start + self.speed * i
+        lap = (travelled // span).astype(np.int64)
+        x = travelled % span - self.size[:, 0]
+        x = np.where(self.direction > 0, x, self.width - x - self.size[:, 0])
+        xyxy = np.stack([x, self.y, x + self.size[:, 0], self.y + self.size[:, 1]], axis=1)
+        visible = (xyxy[:, 2] > 0) & (xyxy[:, 0] < self.width)
+        ids = np.arange(self.n) + lap * self.n + 1
+        xyxy[:, [0, 2]] = xyxy[:, [0, 2]].clip(0, self.width - 1)
+        return ids[visible], self.cls[visible], xyxy[visible]
+
+    def frame(self, i):
+        image = self.background.copy()
+        ids, _, xyxy = self.truth(i)
+        for track_id, (x0, y0, x1, y1) in zip(ids.tolist(), xyxy.astype(int).tolist()):
+            color = self.color[(track_id - 1) % self.n].tolist()
+            cv2.rectangle(image, (x0, y0), (x1, y1), color, -1)
+            cv2.rectangle(image, (x0, y0), (x1, y1), (20, 20, 20), 2)
+        return image
+
+
+def make_clip(path, traffic, frames):
+    writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*"mp4v"), traffic.fps, (traffic.width, traffic.height))
+    for i in range(frames):
+        writer.write(traffic.frame(i))
+    writer.release()
+
+
+def make_images(directory, traffic, count):
+    os.makedirs(directory, exist_ok=True)
+    step = max(1, traffic.fps // 2)  # half a second apart, so the images differ
+    for i in range(count):
+        cv2.imwrite(os.path.join(directory, f"{i:05d}.jpg"), traffic.frame(i * step))
+
+
+def prepare_data(args):
+    """Clip and image set for these settings, generated only if missing."""
+    tag = f"{args.width}x{args.height}_v{args.vehicles}_s{args.seed}"
+    clip = os.path.join(DATA_DIR, f"clip_{tag}_f{args.frames}.mp4")
+    images = os.path.join(DATA_DIR, f"images_{tag}_n{args.images}")
+    traffic = SyntheticTraffic(args.width, args.height, args.vehicles, seed=args.seed)
+    os.makedirs(DATA_DIR, exist_ok=True)
+    if not os.path.exists(clip):
+        print(f"🎬 Generating {clip}")
+        make_clip(clip + ".tmp.mp4", traffic, args.frames)
+        os.replace(clip + ".tmp.mp4", clip)
+    if not os.path.isdir(images) or len(os.listdir(images)) < args.images:
+        print(f"🖼️ Generating {images}")
+        make_images(images, traffic, args.images)
+    return traffic, clip, images
+
+
+def peak_rss_mb():
+    try:
+        import resource
+
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak / 1e6 if sys.platform == "darwin" else peak / 1e3  # bytes on macOS, KB on Linux
+    except ImportError:
+        try:
+            import psutil
+
+            return psutil.Process().memory_info().peak_wset / 1e6  # Windows
+        except (ImportError, AttributeError):
+            return None
+
+
+def summarize(latencies, wall):
+    ms = np.asarray(latencies) * 1000
+    return {
+        "frames": len(ms),
+        "fps": len(ms) / wall if wall > 0 else 0.0,
+        "p50_ms": float(np.percentile(ms, 50)) if len(ms) else 0.0,
+        "p95_ms": float(np.percentile(ms, 95)) if len(ms) else 0.0,
+    }
+
+
+def load_model(weights, backend, imgsz):
+    from ultralytics import YOLO
+
+    if os.path.exists(weights):
+        if backend != "pytorch":
+            from backends import ensure_exported
+
+            return YOLO(ensure_exported(weights, backend, imgsz), task="detect"), "pretrained"
+        return YOLO(weights), "pretrained"
+    if backend != "pytorch":
+        raise FileNotFoundError(f"{weights} is needed to export the {backend} backend")
+    return YOLO(os.path.splitext(weights)[0] + ".yaml"), "random"
+
+
+def run_case(weights, backend, imgsz, clip, images, conf, threads):
+    """One (model, backend, imgsz) case; runs in its own process."""
+    import torch
+
+    from tracking import SequentialTracker
+
+    if threads:
+        torch.set_num_threads(threads)
+    model, kind = load_model(weights, backend, imgsz)
+    dummy = np.zeros((imgsz, imgsz, 3), dtype=np.uint8)
+    model.predict(dummy, imgsz=imgsz, verbose=False)  # warmup
+    base = {"model": os.path.basename(weights), "backend": backend, "imgsz": imgsz, "weights": kind}
+    results = []
+
+    # Image path: predict() on decoded images, as in the Image Detection tab
+    paths = sorted(os.path.join(images, f) for f in os.listdir(images))
+    latencies = []
+    t_wall = time.perf_counter()
+    for path in paths:
+        image = cv2.imread(path)
+        t0 = time.perf_counter()
+        model.predict(image, conf=conf, imgsz=imgsz, verbose=False)
+        latencies.append(time.perf_counter() - t0)
+    results.append(dict(base, path="image", **summarize(latencies, time.perf_counter() - t_wall)))
+
+    # Video path: decode + sequential track() per frame; latency is the track call
+    tracker = SequentialTracker(model, conf=conf, imgsz=imgsz)
+    cap = cv2.VideoCapture(clip)
+    latencies = []
+    t_wall = time.perf_counter()
+    while True:
+        ret, frame = cap.read()
+        if not ret:
+            break
+        t0 = time.perf_counter()
+        tracker(frame)
+        latencies.append(time.perf_counter() - t0)
+    cap.release()
+    results.append(dict(base, path="track", **summarize(latencies, time.perf_counter() - t_wall)))
+
+    rss = peak_rss_mb()
+    for r in results:
+        r["peak_rss_mb"] = rss
+    return results
+
+
+def run_counting(traffic, frames, repeats=5):
+    """Counting on ground-truth tracks, so it doesn't depend on the model."""
+    from counting import TrackCounter
+    from crossing import CrossingCounter
+
+    truth = [traffic.truth(i) for i in range(frames)]
+    shape = (traffic.height, traffic.width)
+    results = []
+    for name, make in [
+        ("count_unique", lambda: TrackCounter(80)),
+        ("count_crossing", lambda: CrossingCounter(lines=[[(0.5, 0), (0.5, 1)]], zones=[[(0.1, 0.3), (0.4, 0.3), (0.4, 0.9), (0.1, 0.9)]], num_classes=80)),
+    ]:
+        latencies = []
+        t_wall = time.perf_counter()
+        for _ in range(repeats):
+            counter = make()
+            for ids, cls, xyxy in truth:
+                t0 = time.perf_counter()
+                if isinstance(counter, CrossingCounter):
+                    counter.update(ids, cls, xyxy, shape)
+                else:
+                    counter.update(ids, cls)
+                latencies.append(time.perf_counter() - t0)
+        results.append({"model": None, "backend": None, "imgsz": None, "path": name,
+                        **summarize(latencies, time.perf_counter() - t_wall), "peak_rss_mb": None})
+    return results
+
+
+def case_key(r):
+    return (r["path"], r["model"], r["backend"], r["imgsz"])
+
+
+def compare(old, new, tolerance):
+    """Print old vs new per case; returns the number of regressions."""
+    old_cases = {case_key(r): r for r in old["results"]}
+    print(f"\n{'path':<15} {'model':<12} {'backend':<10} {'imgsz':>5} {'fps old':>9} {'fps new':>9} "
+          f"{'change':>7} {'p95 old':>8} {'p95 new':>8}")
+    regressions = 0
+    for r in new["results"]:
+        o = old_cases.get(case_key(r))
+        if o is None:
+            continue
+        change = r["fps"] / o["fps"] - 1 if o["fps"] else 0.0
+        # p95 must also be over a millisecond worse, so timer noise on the microsecond counting paths doesn't count
+        slower = change < -tolerance or (r["p95_ms"] > o["p95_ms"] * (1 + tolerance) and r["p95_ms"] - o["p95_ms"] > 1.0)
+        regressions += slower
+        print(f"{r['path']:<15} {str(r['model']):<12} {str(r['backend']):<10} {str(r['imgsz']):>5} "
+              f"{o['fps']:>9.2f} {r['fps']:>9.2f} {change:>+6.0%} {o['p95_ms']:>8.2f} {r['p95_ms']:>8.2f}"
+              f"{'  ❌ slower' if slower else ''}")
+    return regressions
+
+
+def environment():
+    import torch
+    import ultralytics
+
+    return {
+        "date": datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "processor": platform.processor(),
+        "cpu_count": os.cpu_count(),
+        "torch": torch.__version__,
+        "ultralytics": ultralytics.__version__,
+        "opencv": cv2.__version__,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the image, tracking and counting paths on synthetic traffic")
+    parser.add_argument("--models", default="yolov8n.pt", help="Comma-separated, e.g. yolov8n.pt,yolov8m.pt,yolov8l.pt,yolov8x.pt")
+    parser.add_argument("--backends", default="pytorch", help="Comma-separated: pytorch, onnx, onnx-int8")
+    parser.add_argument("--imgsz", default="640", help="Comma-separated, e.g. 320,480,640")
+    parser.add_argument("--width", type=int, default=1280)
+    parser.add_argument("--height", type=int, default=720)
+    parser.add_argument("--frames", type=int, default=150, help="Length of the synthetic clip")
+    parser.add_argument("--images", type=int, default=30, help="Size of the synthetic image set")
+    parser.add_argument("--vehicles", type=int, default=12)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--conf", type=float, default=0.25)
+    parser.add_argument("--threads", type=int, default=0, help="torch threads per case (0 = torch default)")
+    parser.add_argument("-o", "--output", default=os.path.join("benchmarks", "results.json"))
+    parser.add_argument("--compare", nargs="+", metavar="JSON",
+                        help="Baseline results to compare against; with two files, only compare them")
+    parser.add_argument("--tolerance", type=float, default=0.10, help="Slowdown counted as a regression")
+    args = parser.parse_args()
+
+    if args.compare and len(args.compare) == 2:
+        with open(args.compare[0]) as f, open(args.compare[1]) as g:
+            sys.exit(1 if compare(json.load(f), json.load(g), args.tolerance) else 0)
+
+    traffic, clip, images = prepare_data(args)
+    report = {"environment": environment(), "settings": vars(args), "results": []}
+
+    print(f"{'path':<15} {'model':<12} {'backend':<10} {'imgsz':>5} {'fps':>9} {'p50 ms':>8} {'p95 ms':>8} {'peak MB':>8}")
+
+    def show(rows):
+        for r in rows:
+            rss = f"{r['peak_rss_mb']:>8.0f}" if r["peak_rss_mb"] else f"{'-':>8}"
+            print(f"{r['path']:<15} {str(r['model']):<12} {str(r['backend']):<10} {str(r['imgsz']):>5} "
+                  f"{r['fps']:>9.2f} {r['p50_ms']:>8.2f} {r['p95_ms']:>8.2f} {rss}"
+                  f"{'  (random weights)' if r.get('weights') == 'random' else ''}")
+        report["results"].extend(rows)
+
+    show(run_counting(traffic, args.frames))
+    for weights in args.models.split(","):
+        for backend in args.backends.split(","):
+            for imgsz in [int(s) for s in args.imgsz.split(",")]:
+                # A fresh process per case: isolated peak RSS, no warm caches from the previous case
+                with ProcessPoolExecutor(1, mp_context=get_context("spawn")) as pool:
+                    show(pool.submit(run_case, weights, backend, imgsz, clip, images, args.conf, args.threads).result())
+
+    os.makedirs(os.path.dirname(args.output) or ".", exist_ok=True)
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"\n✅ Results written to {args.output}")
+
+    if args.compare:
+        with open(args.compare[0]) as f:
+            sys.exit(1 if compare(json.load(f), report, args.tolerance) else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,161 @@
+import os
+import threading
+import time
+
+import cv2
+
+# Low-latency frame source for the Live Camera tab.
+#
+# A background thread reads frames as fast as the source delivers them and
+# keeps only the newest one. Whoever processes frames always gets the most
+# recent one, and frames that arrived while the model was busy are dropped
+# instead of queueing up in the OpenCV / V4L buffer.
+#
+# Besides a webcam index, the source can be a video file or a folder of
+# images. Those are played back at their own frame rate, like a camera, so
+# the tab can be tested without hardware.
+
+IMAGE_EXTS = (".jpg", ".jpeg", ".png", ".bmp")
+
+
+class _ImageSequence:
+    """cv2.VideoCapture-like reader over a folder of images."""
+
+    def __init__(self, directory, fps):
+        self.paths = sorted(os.path.join(directory, f) for f in os.listdir(directory)
+                            if f.lower().endswith(IMAGE_EXTS))
+        self.fps = fps
+        self.pos = 0
+
+    def isOpened(self):
+        return bool(self.paths)
+
+    def read(self):
+        if self.pos >= len(self.paths):
+            return False, None
+        frame = cv2.imread(self.paths[self.pos])
+        self.pos += 1
+        return frame is not None, frame
+
+    def get(self, prop):
+        return self.fps if prop == cv2.CAP_PROP_FPS else 0
+
+    def release(self):
+        self.paths = []
+
+
+def open_source(source, fps=None):
+    """Returns (capture, is_live). Ints and digit strings are camera indices, URLs are network cameras."""
+    if isinstance(source, int) or (isinstance(source, str) and source.isdigit()):
+        cap = cv2.VideoCapture(int(source))
+        cap.set(cv2.CAP_PROP_BUFFERSIZE, 1)  # ask the driver not to queue frames either
+        return cap, True
+    if os.path.isdir(source):
+        return _ImageSequence(source, fps or 10.0), False
+    if "://" in source:
+        # rtsp:// / http:// network camera, delivers frames at its own pace
+        cap = cv2.VideoCapture(source)
+        cap.set(cv2.CAP_PROP_BUFFERSIZE, 1)
+        return cap, True
+    return cv2.VideoCapture(source), False
+
+
+class LatestFrameCapture:
+    """Always hands out the newest frame of a camera (or stand-in source).
+
+        capture = LatestFrameCapture(0).start()
+        try:
+            while True:
+                frame, captured_at, index = capture.read()
+                ...
+        finally:
+            capture.stop()  # really releases the device
+    """
+
+    def __init__(self, source=0, fps=None, loop=False):
+        self.source = source
+        self.fps = fps
+        self.loop = loop
+        self.cap = None
+        self.live = True
+        self.error = None
+
+        self.frames_captured = 0
+        self.frames_read = 0
+        self._latest = None  # (frame, perf_counter at capture, capture index)
+        self._last_index = 0
+        self._cond = threading.Condition()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        self.cap, self.live = open_source(self.source, self.fps)
+        if not self.cap.isOpened():
+            self.cap.release()
+            raise IOError(f"Could not open video source {self.source!r}")
+        if not self.live:
+            # Play stand-in sources at their own rate, the way a camera would deliver them
+            self.fps = self.fps or self.cap.get(cv2.CAP_PROP_FPS) or 25.0
+        self._thread = threading.Thread(target=self._run, name="camera-capture", daemon=True)
+        self._thread.start()
+        return self
+
+    def _run(self):
+        next_due = time.perf_counter()
+        try:
+            while not self._stop.is_set():
+                ret, frame = self.cap.read()
+                if not ret:
+                    if self.loop and not self.live:
+                        self.cap.release()
+                        self.cap, _ = open_source(self.source, self.fps)
+                        continue
+                    break
+                if not self.live:
+                    next_due += 1.0 / self.fps
+                    delay = next_due - time.perf_counter()
+                    if delay > 0:
+                        self._stop.wait(delay)
+                with self._cond:
+                    self.frames_captured += 1
+                    self._latest = (frame, time.perf_counter(), self.frames_captured)
+                    self._cond.notify_all()
+        except Exception as e:
+            self.error = e
+        finally:
+            self.cap.release()
+            with self._cond:
+                self._stop.set()
+                self._cond.notify_all()
+
+    def read(self, timeout=2.0):
+        """Newest frame not handed out yet, waiting up to timeout for one.
+
+        Returns (frame, captured_at, index) or None if the source ended or
+        nothing arrived in time. index counts captured frames, so a jump
+        between calls is the number of frames dropped.
+        """
+        with self._cond:
+            deadline = time.perf_counter() + timeout
+            while self._latest is None or self._latest[2] == self._last_index:
+                remaining = deadline - time.perf_counter()
+                if self._stop.is_set() or remaining <= 0:
+                    return None
+                self._cond.wait(remaining)
+            self._last_index = self._latest[2]
+            self.frames_read += 1
+            return self._latest
+
+    @property
+    def finished(self):
+        return self._stop.is_set()
+
+    def dropped(self):
+        return self.frames_captured - self.frames_read
+
+    def stop(self, timeout=2.0):
+        self._stop.set()
+        with self._cond:
+            self._cond.notify_all()
+        if self._thread is not None:
+            self._thread.join(timeout)
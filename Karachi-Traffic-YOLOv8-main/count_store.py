@@ -0,0 +1,267 @@
+import argparse
+import csv
+import io
+import logging
+import os
+import sqlite3
+import threading
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+
+# Persistent per-source, per-class vehicle counts.
+#
+# The video / camera loops and the stream service hand their running totals
+# to a CountRecorder, which turns them into increments and queues them in
+# memory; nothing touches the disk on the hot path. A writer thread flushes
+# the queue every few seconds in one transaction into SQLite (WAL mode, so
+# reports can read while it writes):
+#
+#   counts_raw     RAW_INTERVAL-second buckets, kept for TRAFFIC_COUNTS_RAW_DAYS (default 7)
+#   counts_minute  \
+#   counts_hour     > rollups, updated in the same transaction, kept forever
+#   counts_day     /  (days start at local midnight)
+#
+# Reports and CSV exports read the rollup table of the requested resolution,
+# so a month-long report is a few thousand day/hour rows, never a scan of raw
+# buckets.
+#
+# Buckets are stamped with the time the counts were recorded. For cameras and
+# streams that is capture time; for uploaded videos it is processing time,
+# not the time the footage was shot, so only live sources get time-accurate
+# minute/hour rollups (a clip's show when it was processed). A video source is keyed by the clip's
+# content hash and holds only its latest run (replace_source() before each
+# run), so processing a clip again never adds its vehicles twice.
+#
+#   python count_store.py report --from 2024-05-01 --to 2024-06-01 --resolution day -o may.csv
+
+DEFAULT_DB = os.environ.get("TRAFFIC_COUNTS_DB", "traffic_counts.db")
+RAW_RETENTION_DAYS = float(os.environ.get("TRAFFIC_COUNTS_RAW_DAYS", 7))
+RAW_INTERVAL = 10
+FLUSH_INTERVAL = 2.0
+RESOLUTIONS = ("raw", "minute", "hour", "day")
+
+logger = logging.getLogger(__name__)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS counts_{name} (
+    ts INTEGER NOT NULL,
+    source TEXT NOT NULL,
+    class TEXT NOT NULL,
+    n INTEGER NOT NULL,
+    PRIMARY KEY (ts, source, class)
+) WITHOUT ROWID;
+"""
+
+
+def local_day(ts):
+    # Epoch of local midnight for the day containing ts
+    t = time.localtime(ts)
+    return int(time.mktime((t.tm_year, t.tm_mon, t.tm_mday, 0, 0, 0, 0, 0, -1)))
+
+
+def bucket(ts, resolution):
+    if resolution == "raw":
+        return int(ts // RAW_INTERVAL * RAW_INTERVAL)
+    if resolution == "minute":
+        return int(ts // 60 * 60)
+    if resolution == "hour":
+        ts = int(ts)
+        return ts - (ts + time.localtime(ts).tm_gmtoff) % 3600  # local hours, also in +5:30
+    return local_day(ts)
+
+
+class CountStore:
+    """Batched writer and rollup reader for the counts database.
+
+        store = get_count_store()
+        store.add("camera:0", {"car": 2, "bus": 1})        # increments, queued in memory
+        store.csv(start, end, resolution="hour")           # report from the hourly rollup
+    """
+
+    def __init__(self, path=DEFAULT_DB, flush_interval=FLUSH_INTERVAL, raw_days=RAW_RETENTION_DAYS):
+        self.path = path
+        self.flush_interval = flush_interval
+        self.raw_days = raw_days
+        self._pending = defaultdict(int)  # (raw bucket, source, class) -> n
+        self._lock = threading.Lock()
+        self._write_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._closed = False
+        self._pruned_at = 0.0
+        self.rows_written = 0
+        self.flushes = 0
+
+        with self._connect() as db:
+            db.execute("PRAGMA journal_mode=WAL")
+            for name in RESOLUTIONS:
+                db.execute(_SCHEMA.format(name=name))
+        self._thread = threading.Thread(target=self._run, name="count-store", daemon=True)
+        self._thread.start()
+
+    @contextmanager
+    def _connect(self):
+        # One short-lived connection per flush / query, committed on success and always closed
+        db = sqlite3.connect(self.path, timeout=30)
+        try:
+            db.execute("PRAGMA synchronous=NORMAL")  # safe with WAL, one fsync per checkpoint instead of per commit
+            with db:
+                yield db
+        finally:
+            db.close()
+
+    # --- Writing ---
+
+    def add(self, source, increments, ts=None):
+        """Queue {class: n} increments for source at ts (default now)."""
+        key_ts = bucket(time.time() if ts is None else ts, "raw")
+        with self._lock:
+            for cls, n in increments.items():
+                if n > 0:
+                    self._pending[(key_ts, source, cls)] += n
+
+    def replace_source(self, source):
+        """Drop every count of source (queued or stored), before recording it again."""
+        with self._write_lock:
+            with self._lock:
+                self._pending = defaultdict(int, {k: n for k, n in self._pending.items() if k[1] != source})
+            with self._connect() as db:
+                for name in RESOLUTIONS:
+                    db.execute(f"DELETE FROM counts_{name} WHERE source = ?", (source,))
+
+    def flush(self):
+        with self._write_lock:
+            with self._lock:
+                pending, self._pending = self._pending, defaultdict(int)
+            if not pending:
+                return 0
+            rollups = {name: defaultdict(int) for name in RESOLUTIONS}
+            for (ts, source, cls), n in pending.items():
+                for name in RESOLUTIONS:
+                    rollups[name][(bucket(ts, name), source, cls)] += n
+            with self._connect() as db:
+                for name, rows in rollups.items():
+                    db.executemany(
+                        f"INSERT INTO counts_{name} (ts, source, class, n) VALUES (?, ?, ?, ?) "
+                        f"ON CONFLICT (ts, source, class) DO UPDATE SET n = n + excluded.n",
+                        [(ts, source, cls, n) for (ts, source, cls), n in rows.items()])
+                if time.time() - self._pruned_at > 3600:
+                    db.execute("DELETE FROM counts_raw WHERE ts < ?", (time.time() - self.raw_days * 86400,))
+                    self._pruned_at = time.time()
+            self.rows_written += sum(len(rows) for rows in rollups.values())
+            self.flushes += 1
+            return len(pending)
+
+    def _run(self):
+        while not self._closed:
+            self._wake.wait(self.flush_interval)
+            self._wake.clear()
+            try:
+                self.flush()
+            except sqlite3.Error as e:
+                # The writer thread's stdout is invisible under Streamlit
+                logger.warning(f"⚠️ Count store flush failed, retrying: {e}")
+
+    def close(self):
+        self._closed = True
+        self._wake.set()
+        self._thread.join(5)
+        self.flush()
+
+    # --- Reading ---
+
+    def query(self, start, end, resolution="hour", sources=None):
+        """[(bucket ts, source, class, n)] for start <= ts < end (epoch seconds)."""
+        if resolution not in RESOLUTIONS:
+            raise ValueError(f"Unknown resolution '{resolution}', use one of {RESOLUTIONS}")
+        sql = f"SELECT ts, source, class, n FROM counts_{resolution} WHERE ts >= ? AND ts < ?"
+        args = [int(start), int(end)]
+        if sources:
+            sql += f" AND source IN ({','.join('?' * len(sources))})"
+            args += list(sources)
+        with self._connect() as db:
+            return db.execute(sql + " ORDER BY ts, source, class", args).fetchall()
+
+    def totals(self, start, end, resolution="hour", sources=None):
+        """{class: n} over the range, from the given rollup."""
+        out = defaultdict(int)
+        for _, _, cls, n in self.query(start, end, resolution, sources):
+            out[cls] += n
+        return dict(out)
+
+    def sources(self):
+        with self._connect() as db:
+            return [r[0] for r in db.execute("SELECT DISTINCT source FROM counts_day ORDER BY source")]
+
+    def csv(self, start, end, resolution="hour", sources=None):
+        buf = io.StringIO()
+        writer = csv.writer(buf, lineterminator="\n")
+        writer.writerow(["Time", "Source", "Vehicle Type", "Count"])
+        for ts, source, cls, n in self.query(start, end, resolution, sources):
+            writer.writerow([datetime.fromtimestamp(ts).strftime("%Y-%m-%d %H:%M:%S"), source, cls, n])
+        return buf.getvalue()
+
+
+class CountRecorder:
+    """Feeds a counter's running totals ({class: total}) to the store as increments."""
+
+    def __init__(self, store, source):
+        self.store = store
+        self.source = source
+        self.last = {}
+
+    def update(self, totals, ts=None):
+        if totals == self.last:
+            return
+        increments = {k: v - self.last.get(k, 0) for k, v in totals.items() if v != self.last.get(k, 0)}
+        self.last = dict(totals)
+        self.store.add(self.source, increments, ts)
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_count_store():
+    global _store
+    with _store_lock:
+        if _store is None:
+            _store = CountStore()
+        return _store
+
+
+def _parse_time(text):
+    return datetime.fromisoformat(text).timestamp()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Reports from the vehicle counts database")
+    parser.add_argument("--db", default=DEFAULT_DB)
+    sub = parser.add_subparsers(dest="command", required=True)
+    report = sub.add_parser("report", help="CSV of counts over a time range")
+    report.add_argument("--from", dest="start", help="Start, e.g. 2024-05-01 or 2024-05-01T08:00 (default: 7 days ago)")
+    report.add_argument("--to", dest="end", help="End, exclusive (default: now)")
+    report.add_argument("--resolution", choices=RESOLUTIONS[1:], default="hour")
+    report.add_argument("--source", action="append", help="Only this source (repeatable)")
+    report.add_argument("-o", "--output", help="Write the CSV here instead of stdout")
+    sub.add_parser("sources", help="List the sources that have counts")
+    args = parser.parse_args()
+
+    store = CountStore(args.db)
+    if args.command == "sources":
+        print("\n".join(store.sources()))
+        return
+    end = _parse_time(args.end) if args.end else time.time()
+    start = _parse_time(args.start) if args.start else (datetime.fromtimestamp(end) - timedelta(days=7)).timestamp()
+    text = store.csv(start, end, args.resolution, args.source)
+    if args.output:
+        with open(args.output, "w", newline="") as f:
+            f.write(text)
+        print(f"✅ {text.count(chr(10)) - 1} rows written to {args.output}")
+    else:
+        print(text, end="")
+
+
+if __name__ == "__main__":
+    main()
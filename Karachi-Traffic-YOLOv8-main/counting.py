@@ -0,0 +1,164 @@
+import numpy as np
+
+
+def to_numpy(x, dtype=np.int64):
+    # Accepts torch tensors (cpu or cuda), numpy arrays and lists
+    if x is None:
+        return np.empty(0, dtype=dtype)
+    if hasattr(x, "cpu"):
+        x = x.cpu().numpy()
+    return np.asarray(x, dtype=dtype).reshape(-1)
+
+
+def class_histogram(cls, num_classes):
+    """Per-class detection counts for one frame in a single bincount."""
+    return np.bincount(to_numpy(cls), minlength=num_classes)[:num_classes]
+
+
+def histogram_to_counts(hist, names):
+    # names is model.names ({id: name}); only classes that were seen are kept
+    return {names[i]: c for i, c in enumerate(hist.tolist()) if c}
+
+
+def frame_counts(results, names):
+    """{class name: detections} for one ultralytics result list."""
+    return histogram_to_counts(class_histogram(results[0].boxes.cls, len(names)), names)
+
+
+_NEVER = -(1 << 62)
+
+
+class TrackTable:
+    """Fixed-size array table of track IDs with per-track columns.
+
+    Track IDs live in an open table (slot = id % capacity) together with the
+    frame they were last seen. A track not seen for ttl_frames is stale and
+    its slot can be reused, so memory depends on how many tracks are active
+    at once rather than on how many were ever seen. The table only grows when
+    the IDs of live tracks span more than its capacity.
+
+    Extra per-track state is declared as columns, name -> (dtype, fill,
+    trailing shape), and is kept in step with the slots when the table grows.
+    """
+
+    def __init__(self, capacity=1024, ttl_frames=300, columns=None):
+        self.ttl_frames = ttl_frames
+        self.frame = 0
+        self.columns = columns or {}
+        self._alloc(capacity)
+
+    def _alloc(self, capacity):
+        self.capacity = capacity
+        self.ids = np.full(capacity, -1, dtype=np.int64)
+        self.last_seen = np.full(capacity, _NEVER, dtype=np.int64)
+        self.cols = {name: np.full((capacity,) + tuple(shape), fill, dtype=dtype)
+                     for name, (dtype, fill, shape) in self.columns.items()}
+
+    def _live(self, slots):
+        return (self.ids[slots] >= 0) & (self.frame - self.last_seen[slots] <= self.ttl_frames)
+
+    def _grow(self):
+        live = np.flatnonzero(self._live(np.arange(self.capacity)))
+        ids, last_seen = self.ids[live], self.last_seen[live]
+        cols = {name: col[live] for name, col in self.cols.items()}
+        capacity = self.capacity * 2
+        while len(ids) and ids.max() - ids.min() >= capacity:
+            capacity *= 2
+        self._alloc(capacity)
+        slots = ids % capacity
+        self.ids[slots] = ids
+        self.last_seen[slots] = last_seen
+        for name, col in cols.items():
+            self.cols[name][slots] = col
+
+    def advance(self, frames=1):
+        self.frame += frames
+
+    def update(self, track_ids):
+        """Mark track_ids as seen this frame.
+
+        Returns (slots, is_new, was_live): is_new is True for IDs not in the
+        table, was_live for IDs that were seen within ttl_frames before this
+        frame, i.e. whose columns still hold their previous state. was_live
+        is None for tables without columns.
+        """
+        # IDs closer together than capacity can't share a slot
+        while track_ids.max() - track_ids.min() >= self.capacity:
+            self._grow()
+        slots = track_ids % self.capacity
+        is_new = self.ids[slots] != track_ids
+        if is_new.any():
+            # A new ID landing on a live track's slot would evict it and
+            # count it again when it shows up next frame
+            while self._live(slots[is_new]).any():
+                self._grow()
+                slots = track_ids % self.capacity
+            is_new = self.ids[slots] != track_ids  # stale IDs are dropped by _grow
+        was_live = None
+        if self.columns:
+            was_live = ~is_new & (self.frame - 1 - self.last_seen[slots] <= self.ttl_frames)
+            if is_new.any():
+                for name, (_, fill, _) in self.columns.items():
+                    self.cols[name][slots[is_new]] = fill
+        self.ids[slots] = track_ids
+        self.last_seen[slots] = self.frame
+        return slots, is_new, was_live
+
+    def active_tracks(self):
+        return int(np.count_nonzero(self._live(np.arange(self.capacity))))
+
+    def reset(self):
+        self.frame = 0
+        self._alloc(self.capacity)
+
+
+class TrackCounter:
+    """Cumulative unique-track counts per class with bounded memory.
+
+    Tracks are kept in a TrackTable, so stale IDs expire and memory and
+    per-frame cost stay flat on a camera that runs for days.
+
+        counter = TrackCounter(len(model.names))
+        counter.update(boxes.id, boxes.cls)
+        counter.counts(model.names)  # {'car': 12, 'bus': 3}
+
+    Pass the source frames dropped before each update (skipped), so ttl_frames
+    spans the same video time as the tracker's frame_id and a stale ID
+    expires here before the tracker can hand it out again.
+    """
+
+    def __init__(self, num_classes, capacity=1024, ttl_frames=300):
+        self.num_classes = num_classes
+        self.totals = np.zeros(num_classes, dtype=np.int64)
+        self.table = TrackTable(capacity, ttl_frames)
+        self._counts = None  # cached counts(), dropped whenever totals change
+
+    def update(self, track_ids, cls, skipped=0):
+        self.table.advance(skipped + 1)
+        track_ids = to_numpy(track_ids)
+        if track_ids.size == 0:
+            return
+        _, is_new, _ = self.table.update(track_ids)
+        if is_new.any():
+            self.totals += np.bincount(to_numpy(cls)[is_new], minlength=self.num_classes)[:self.num_classes]
+            self._counts = None
+
+    def update_from_results(self, results, skipped=0):
+        boxes = results[0].boxes
+        if boxes.id is None:
+            self.table.advance(skipped + 1)
+            return
+        self.update(boxes.id, boxes.cls, skipped)
+
+    def active_tracks(self):
+        return self.table.active_tracks()
+
+    def counts(self, names):
+        if self._counts is None:
+            self._counts = histogram_to_counts(self.totals, names)
+        return dict(self._counts)
+
+    def reset(self):
+        self.totals[:] = 0
+        self._counts = None
+        self.table.reset()
@@ -0,0 +1,180 @@
+import cv2
+import numpy as np
+
+from counting import TrackTable, to_numpy
+
+# Directional counts for tracked vehicles crossing virtual lines or entering /
+# leaving polygon zones. Every track's last centroid lives in a TrackTable, so
+# each frame is a handful of NumPy operations over the active tracks, with no
+# Python objects per track.
+#
+# Line direction: for a line drawn from A to B, "in" is a crossing from the
+# left-hand side of A->B to its right-hand side in image coordinates (y down).
+# A line drawn left to right therefore counts top -> bottom as "in".
+
+DIRECTIONS = ("in", "out")
+
+
+def _cross(ax, ay, bx, by):
+    return ax * by - ay * bx
+
+
+def points_in_polygon(px, py, polygon):
+    """Ray-casting point-in-polygon test for N points against one polygon."""
+    x0, y0 = polygon[:, 0], polygon[:, 1]
+    x1, y1 = np.roll(x0, -1), np.roll(y0, -1)
+    px, py = px[:, None], py[:, None]
+    # Edges straddling the horizontal ray through each point
+    straddle = (y0 > py) != (y1 > py)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        x_at = x0 + (py - y0) * (x1 - x0) / (y1 - y0)
+    return np.count_nonzero(straddle & (px < x_at), axis=1) % 2 == 1
+
+
+def parse_regions(text):
+    """Parse 'x1,y1 x2,y2 [...]; ...' into a list of (K, 2) float arrays.
+
+    Two points make a line, three or more a polygon zone.
+    """
+    regions = []
+    for part in text.split(";"):
+        points = [p for p in part.replace("\n", " ").split(" ") if p.strip()]
+        if not points:
+            continue
+        regions.append(np.array([[float(v) for v in p.split(",")] for p in points], dtype=np.float64))
+    return regions
+
+
+class CrossingCounter:
+    """Per-direction, per-class counts of tracks crossing lines and zones.
+
+        counter = CrossingCounter(lines=[[(0, 0.6), (1, 0.6)]], num_classes=len(model.names))
+        counter.update_from_results(results)  # results of a tracking.SequentialTracker
+        counter.counts(model.names)  # {'car (Line 1 in)': 4, 'bus (Line 1 out)': 1}
+
+    With normalized=True, coordinates are fractions of the frame size and are
+    scaled on the first frame.
+    """
+
+    def __init__(self, lines=(), zones=(), num_classes=80, normalized=True,
+                 line_names=None, zone_names=None, capacity=1024, ttl_frames=30):
+        self.lines_src = [np.asarray(l, dtype=np.float64).reshape(2, 2) for l in lines]
+        self.zones_src = [np.asarray(z, dtype=np.float64).reshape(-1, 2) for z in zones]
+        self.normalized = normalized
+        self.num_classes = num_classes
+        self.line_names = line_names or [f"Line {i + 1}" for i in range(len(self.lines_src))]
+        self.zone_names = zone_names or [f"Zone {i + 1}" for i in range(len(self.zones_src))]
+        self.lines = None
+        self.zones = None
+        if not normalized:
+            self._scale(1, 1)
+
+        n_regions = len(self.lines_src) + len(self.zones_src)
+        # counts[region, direction, class]
+        self.totals = np.zeros((n_regions, 2, num_classes), dtype=np.int64)
+        self.table = TrackTable(capacity, ttl_frames, columns={
+            "centroid": (np.float64, np.nan, (2,)),
+            "inside": (bool, False, (max(1, len(self.zones_src)),)),
+        })
+
+    def _scale(self, w, h):
+        scale = np.array([w, h], dtype=np.float64)
+        self.lines = np.stack([l * scale for l in self.lines_src]) if self.lines_src else np.zeros((0, 2, 2))
+        self.zones = [z * scale for z in self.zones_src]
+
+    def update(self, track_ids, cls, xyxy, frame_shape=None, skipped=0):
+        # skipped: source frames dropped since the last update, as for TrackCounter
+        self.table.advance(skipped + 1)
+        if self.lines is None:
+            h, w = frame_shape[:2]
+            self._scale(w, h)
+        track_ids = to_numpy(track_ids)
+        if track_ids.size == 0:
+            return
+        cls = to_numpy(cls)
+        xyxy = to_numpy(xyxy, dtype=np.float64).reshape(-1, 4)
+        cx = (xyxy[:, 0] + xyxy[:, 2]) * 0.5
+        cy = (xyxy[:, 1] + xyxy[:, 3]) * 0.5
+
+        slots, _, was_live = self.table.update(track_ids)
+        centroid = self.table.cols["centroid"]
+        prev = centroid[slots]
+        n_lines = len(self.lines)
+        flat = []  # flattened (region, direction, class) indices of this frame's events
+
+        # Lines: the centroid's step from last frame must cross the line segment
+        moved = np.flatnonzero(was_live)
+        if n_lines and moved.size:
+            px, py = prev[moved, 0][:, None], prev[moved, 1][:, None]
+            qx, qy = cx[moved][:, None], cy[moved][:, None]
+            ax, ay = self.lines[:, 0, 0][None], self.lines[:, 0, 1][None]
+            bx, by = self.lines[:, 1, 0][None], self.lines[:, 1, 1][None]
+            side_p = _cross(bx - ax, by - ay, px - ax, py - ay)
+            side_q = _cross(bx - ax, by - ay, qx - ax, qy - ay)
+            end_a = _cross(qx - px, qy - py, ax - px, ay - py)
+            end_b = _cross(qx - px, qy - py, bx - px, by - py)
+            hit = ((side_p < 0) != (side_q < 0)) & ((end_a < 0) != (end_b < 0))
+            t, l = np.nonzero(hit)
+            direction = (side_p[t, l] >= 0).astype(np.int64)  # 0 = in, 1 = out
+            flat.append((l * 2 + direction) * self.num_classes + cls[moved[t]])
+
+        # Zones: entering / leaving compared with last frame
+        if self.zones:
+            inside_col = self.table.cols["inside"]
+            was_inside = inside_col[slots]
+            for z, polygon in enumerate(self.zones):
+                now = points_in_polygon(cx, cy, polygon)
+                changed = np.flatnonzero(was_live & (now != was_inside[:, z]))
+                direction = (~now[changed]).astype(np.int64)  # 0 = entered, 1 = left
+                flat.append(((n_lines + z) * 2 + direction) * self.num_classes + cls[changed])
+                inside_col[slots, z] = now
+
+        centroid[slots, 0] = cx
+        centroid[slots, 1] = cy
+        if flat:
+            events = np.concatenate(flat)
+            if events.size:
+                self.totals += np.bincount(events, minlength=self.totals.size).reshape(self.totals.shape)
+
+    def update_from_results(self, results, skipped=0):
+        boxes = results[0].boxes
+        if boxes.id is None:
+            self.table.advance(skipped + 1)
+            return
+        self.update(boxes.id, boxes.cls, boxes.xyxy, results[0].orig_shape, skipped)
+
+    def region_names(self):
+        return self.line_names + self.zone_names
+
+    def region_counts(self, names):
+        """{'<region> <direction>': {class name: count}} for every region."""
+        out = {}
+        for r, region in enumerate(self.region_names()):
+            for d, direction in enumerate(DIRECTIONS):
+                row = self.totals[r, d].tolist()
+                out[f"{region} {direction}"] = {names[i]: c for i, c in enumerate(row) if c}
+        return out
+
+    def counts(self, names):
+        # Flat {label: count} like TrackCounter.counts(), for display_counts()
+        flat = {}
+        for key, per_class in self.region_counts(names).items():
+            for name, count in per_class.items():
+                flat[f"{name} ({key})"] = count
+        return flat
+
+    def draw(self, image):
+        if self.lines is None:
+            return image
+        for (a, b), name in zip(self.lines.astype(int), self.line_names):
+            cv2.line(image, tuple(a.tolist()), tuple(b.tolist()), (0, 255, 255), 2)
+            cv2.putText(image, name, tuple((a + [5, -8]).tolist()), cv2.FONT_HERSHEY_SIMPLEX, 0.6, (0, 255, 255), 2)
+        for polygon, name in zip(self.zones, self.zone_names):
+            pts = polygon.astype(np.int32)
+            cv2.polylines(image, [pts], True, (255, 0, 255), 2)
+            cv2.putText(image, name, tuple((pts[0] + [5, -8]).tolist()), cv2.FONT_HERSHEY_SIMPLEX, 0.6, (255, 0, 255), 2)
+        return image
+
+    def reset(self):
+        self.totals[:] = 0
+        self.table.reset()
@@ -0,0 +1,219 @@
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+
+import numpy as np
+import torch
+from ultralytics.engine.results import Results
+
+# Raw detections kept across Streamlit reruns, so moving the confidence
+# slider only filters boxes instead of running the model again.
+#
+# Detection runs once at CONF_FLOOR and the boxes (xyxy, conf, cls) are
+# stored under (content hash, model, imgsz, variant). Any threshold at or
+# above the floor is then a NumPy filter over those boxes. NMS only lets a
+# box be suppressed by higher-scoring ones, so the floor-level boxes at or
+# above `conf`, cut to the MAX_DET strongest, are the boxes predicting at
+# `conf` would give - as long as the floor-level run itself wasn't cut. It
+# runs with max_det=FLOOR_MAX_DET; a frame that still fills it lost its
+# weakest boxes, so it only answers thresholds above the weakest one it
+# kept (`cut`). Lower thresholds predict again at `conf`.
+#
+# Images keep their decoded pixels next to the boxes, so a slider change
+# doesn't decode the upload again either. Clips keep the boxes of every
+# processed frame plus which frames were processed; replaying one feeds the
+# stored boxes to a fresh tracker (ReplayDetector + ReplaySchedule), so
+# tracks and counts at the new threshold come without any inference.
+#
+# Entries are evicted least recently used first once they exceed
+# TRAFFIC_DETECTION_CACHE_MB (default 512). One cache lives per server
+# process, like the model registry.
+
+CONF_FLOOR = 0.05
+MAX_DET = 300  # ultralytics' default max_det
+FLOOR_MAX_DET = 3000  # room for the weak boxes a floor-level run keeps on top
+DEFAULT_MAX_MEMORY_MB = float(os.environ.get("TRAFFIC_DETECTION_CACHE_MB", 512))
+_EMPTY = np.zeros((0, 6), dtype=np.float32)
+
+
+def bytes_hash(data):
+    return hashlib.blake2b(data, digest_size=16).hexdigest()
+
+
+def filter_boxes(boxes, conf, max_det=MAX_DET):
+    boxes = boxes[boxes[:, 4] >= conf]
+    if len(boxes) > max_det:
+        boxes = boxes[np.argsort(-boxes[:, 4], kind="stable")[:max_det]]
+    return boxes
+
+
+def truncation(boxes):
+    """Weakest kept score if a floor-level run hit FLOOR_MAX_DET, else None."""
+    return float(boxes[:, 4].min()) if len(boxes) >= FLOOR_MAX_DET else None
+
+
+def covers(cut, conf):
+    # Boxes at or below the cut may be missing, thresholds above it are exact
+    return conf >= CONF_FLOOR and (cut is None or conf > cut)
+
+
+def make_results(image, boxes, names):
+    # ultralytics Results for boxes in image coordinates, for plot()/counting/tracking
+    return Results(image, path="", names=names,
+                   boxes=torch.from_numpy(np.ascontiguousarray(boxes, dtype=np.float32)))
+
+
+def raw_boxes(result):
+    return result.boxes.data.cpu().numpy()[:, :6].astype(np.float32)
+
+
+class ImageDetections:
+    """Decoded image (BGR) and its boxes at CONF_FLOOR."""
+
+    def __init__(self, image, boxes):
+        self.image = image
+        self.boxes = boxes
+        self.cut = truncation(boxes)
+        self.nbytes = image.nbytes + boxes.nbytes
+
+    def covers(self, conf):
+        return covers(self.cut, conf)
+
+    def results(self, conf, names):
+        return [make_results(self.image, filter_boxes(self.boxes, conf), names)]
+
+
+class ClipDetections:
+    """Boxes at CONF_FLOOR for every processed frame of a clip, in order."""
+
+    def __init__(self, indices, skipped, boxes):
+        self.indices = list(indices)  # source frame numbers that were processed
+        self.skipped = list(skipped)  # frames dropped right before each of them
+        self.boxes = list(boxes)
+        cuts = [c for c in map(truncation, self.boxes) if c is not None]
+        self.cut = max(cuts) if cuts else None
+        self.nbytes = sum(b.nbytes for b in self.boxes) + 16 * len(self.indices)
+
+    def covers(self, conf):
+        return covers(self.cut, conf)
+
+
+class DetectionCache:
+    """LRU of ImageDetections / ClipDetections with a memory cap."""
+
+    def __init__(self, max_memory_mb=DEFAULT_MAX_MEMORY_MB):
+        self.max_bytes = max_memory_mb * 1e6
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.nbytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry
+
+    def put(self, key, entry):
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self.nbytes -= old.nbytes
+            if entry.nbytes > self.max_bytes:
+                return False  # would evict everything else and still not fit
+            self._entries[key] = entry
+            self.nbytes += entry.nbytes
+            while self.nbytes > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self.nbytes -= evicted.nbytes
+                self.evictions += 1
+            return True
+
+    def stats(self):
+        with self._lock:
+            return {"entries": len(self._entries), "size_mb": self.nbytes / 1e6, "hits": self.hits,
+                    "misses": self.misses, "evictions": self.evictions}
+
+
+class RecordingDetector:
+    """Detector for tracking.BatchTracker(detector=...) that keeps the raw boxes.
+
+    Detects at CONF_FLOOR, remembers every frame's boxes in call order and
+    hands the tracker only the boxes at or above the requested conf. A frame
+    whose floor-level run was cut above conf is detected again at conf.
+    """
+
+    def __init__(self, detect, names):
+        self.detect = detect  # model.predict or roi.RoiDetector
+        self.names = names
+        self.boxes = []
+
+    def __call__(self, frames, conf=0.25, **predict_kwargs):
+        results = self.detect(frames, conf=min(conf, CONF_FLOOR), max_det=FLOOR_MAX_DET, **predict_kwargs)
+        out = []
+        for frame, r in zip(frames, results):
+            boxes = raw_boxes(r)
+            self.boxes.append(boxes)
+            if covers(truncation(boxes), conf):
+                out.append(make_results(frame, filter_boxes(boxes, conf), self.names))
+            else:
+                out.append(self.detect([frame], conf=conf, **predict_kwargs)[0])
+        return out
+
+
+class ReplayDetector:
+    """Stands in for the model on a replay: returns the stored boxes in order.
+
+    Only for thresholds the clip covers (ClipDetections.covers).
+    """
+
+    def __init__(self, clip, names):
+        self.clip = clip
+        self.names = names
+        self.position = 0
+
+    def __call__(self, frames, conf=0.25, **predict_kwargs):
+        out = []
+        for frame in frames:
+            boxes = self.clip.boxes[self.position] if self.position < len(self.clip.boxes) else _EMPTY
+            self.position += 1
+            out.append(make_results(frame, filter_boxes(boxes, conf), self.names))
+        return out
+
+
+class ReplaySchedule:
+    """pipeline.VideoPipeline scheduler that picks the frames a cached run processed."""
+
+    def __init__(self, clip):
+        self.skipped_before = dict(zip(clip.indices, clip.skipped))
+        self.source_fps = 0.0
+        self.last_skipped = 0
+
+    def should_process(self, index):
+        skipped = self.skipped_before.get(index)
+        if skipped is None:
+            return False
+        self.last_skipped = skipped
+        return True
+
+    def record(self, seconds):
+        pass
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_detection_cache():
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = DetectionCache()
+        return _cache
@@ -0,0 +1,170 @@
+import queue
+import threading
+import time
+
+import cv2
+
+# Annotated MP4 export for the video tab and batch_count.py.
+#
+# write() only hands the annotated frame to a background thread through a
+# bounded queue; downscaling, the counts overlay and encoding all happen on
+# that thread, off the processing loop. If the encoder ever falls behind,
+# write() waits for a free slot (the wait is reported as stall_s) instead of
+# letting frames pile up in memory.
+#
+# Two timings:
+#   hold=False  only the processed frames are written, at `fps` (the processing rate)
+#   hold=True   each annotation is repeated over the source frames skipped after it,
+#               so the export has the source's frame count and plays at the source fps
+#
+# H.264 (avc1) is used when the OpenCV build can encode it; pip's
+# opencv-python wheels usually can't and fall back to MPEG-4 Part 2 (mp4v),
+# which desktop players handle but most browsers won't play inline.
+
+_END = object()
+FOURCCS = ("avc1", "mp4v")
+
+
+def draw_counts(img, counts):
+    """Counts box ('car: 3', ..., 'Total: N') in the top-left corner, in place."""
+    lines = [f"{name}: {n}" for name, n in counts.items()] + [f"Total: {sum(counts.values())}"]
+    scale = max(0.4, img.shape[1] / 1600)
+    thickness = max(1, round(scale * 2))
+    line_h = int(28 * scale)
+    width = max(cv2.getTextSize(line, cv2.FONT_HERSHEY_SIMPLEX, scale, thickness)[0][0] for line in lines)
+    x1, y1 = min(img.shape[1], width + int(20 * scale)), min(img.shape[0], line_h * len(lines) + int(12 * scale))
+    # Darken the box instead of filling it, the scene stays visible behind the text
+    img[:y1, :x1] = (img[:y1, :x1] * 0.4).astype(img.dtype)
+    for i, line in enumerate(lines):
+        cv2.putText(img, line, (int(10 * scale), line_h * (i + 1)), cv2.FONT_HERSHEY_SIMPLEX, scale,
+                    (255, 255, 255), thickness, cv2.LINE_AA)
+    return img
+
+
+def file_reader(path):
+    """Zero-argument callable returning the file's bytes, for st.download_button's deferred data."""
+    def read():
+        with open(path, "rb") as f:
+            return f.read()
+    return read
+
+
+class VideoExporter:
+    """Writes annotated frames to an MP4 on a background thread.
+
+        exporter = VideoExporter("out.mp4", fps=25, width=1280, hold=True)
+        for packet in pipe:
+            exporter.write(packet.annotated, index=packet.index, counts=counts)
+        exporter.close(total_frames=pipe.frames_read)
+
+    A frame must not be modified after it was passed to write().
+    """
+
+    def __init__(self, path, fps, width=None, hold=False, overlay=True, queue_size=16, fourcc=None):
+        self.path = path
+        self.fps = fps or 25.0
+        self.width = width
+        self.hold = hold
+        self.overlay = overlay
+        self.fourccs = (fourcc,) if fourcc else FOURCCS
+        self.fourcc = None  # the one the file was opened with
+        self.error = None
+        self.frames = 0  # frames handed to write()
+        self.written = 0  # frames in the file, repeats included
+        self.held = 0  # repeats written for skipped frames
+        self.stall_s = 0.0
+        self.encode_s = 0.0
+        self._last_index = 0
+        self._writer = None
+        self._queue = queue.Queue(maxsize=max(1, queue_size))
+        self._thread = threading.Thread(target=self._run, name="video-export", daemon=True)
+        self._thread.start()
+
+    def write(self, frame, index=None, counts=None):
+        """Queue an annotated BGR frame; index is its source frame number (from 1)."""
+        if self.error is not None:
+            raise self.error
+        repeat = 0
+        if index is not None:
+            if self.hold:
+                repeat = max(0, index - self._last_index - 1)
+            self._last_index = index
+        t0 = time.perf_counter()
+        self._queue.put((frame, dict(counts) if counts is not None else None, repeat))
+        self.stall_s += time.perf_counter() - t0
+        self.frames += 1
+
+    def close(self, total_frames=None):
+        """Finish the file; with hold, the last annotation also covers any trailing skipped frames."""
+        if self.hold and total_frames and total_frames > self._last_index:
+            self._queue.put((None, None, total_frames - self._last_index))
+        self._queue.put(_END)
+        self._thread.join()
+        if self.error is not None:
+            raise self.error
+        return self.stats()
+
+    def stats(self):
+        return {
+            "frames": self.frames,
+            "written": self.written,
+            "held": self.held,
+            "stall_s": self.stall_s,
+            "encode_ms": self.encode_s / self.frames * 1000 if self.frames else 0.0,
+            "fourcc": self.fourcc,
+        }
+
+    def _prepare(self, frame, counts):
+        h, w = frame.shape[:2]
+        if self.width and w > self.width:
+            frame = cv2.resize(frame, (self.width, round(h * self.width / w)), interpolation=cv2.INTER_AREA)
+        elif self.overlay and counts is not None:
+            frame = frame.copy()  # the caller may still be showing it
+        if self.overlay and counts is not None:
+            draw_counts(frame, counts)
+        return frame
+
+    def _emit(self, frame, times):
+        if self._writer is None:
+            h, w = frame.shape[:2]
+            for fourcc in self.fourccs:
+                writer = cv2.VideoWriter(self.path, cv2.VideoWriter_fourcc(*fourcc), self.fps, (w, h))
+                if writer.isOpened():
+                    self._writer, self.fourcc = writer, fourcc
+                    break
+            else:
+                raise IOError(f"Can't open {self.path} for writing with any of {', '.join(self.fourccs)}")
+        for _ in range(times):
+            self._writer.write(frame)
+        self.written += times
+
+    def _run(self):
+        last = None
+        try:
+            while True:
+                item = self._queue.get()
+                if item is _END:
+                    break
+                frame, counts, repeat = item
+                t0 = time.perf_counter()
+                if frame is None:  # trailing skipped frames
+                    if last is not None:
+                        self._emit(last, repeat)
+                        self.held += repeat
+                    continue
+                frame = self._prepare(frame, counts)
+                # Skipped frames before this one keep showing the previous annotation
+                if repeat:
+                    self._emit(last if last is not None else frame, repeat)
+                    self.held += repeat
+                self._emit(frame, 1)
+                last = frame
+                self.encode_s += time.perf_counter() - t0
+        except Exception as e:
+            self.error = e
+            # Keep draining so write() never blocks on a dead writer
+            while self._queue.get() is not _END:
+                pass
+        finally:
+            if self._writer is not None:
+                self._writer.release()
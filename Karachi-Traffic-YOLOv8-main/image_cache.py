@@ -0,0 +1,175 @@
+import argparse
+import hashlib
+import json
+import os
+import shutil
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import cv2
+import numpy as np
+import yaml
+
+from label_index import IMAGE_EXTS, labels_dir_for, read_data_yaml
+
+# Pre-resized copy of the dataset for training.
+#
+# Ultralytics decodes every full-resolution JPEG and resizes it to imgsz on
+# every epoch. The cache does that once: each image is resized so its long
+# side is imgsz (aspect ratio kept, so the normalized YOLO labels stay valid
+# and are copied as they are) and also saved as a raw .npy array next to it,
+# which the ultralytics loader reads instead of decoding the image.
+#
+#   dataset/.image_cache/<imgsz>/<subset>/images|labels/...
+#   dataset/.image_cache/<imgsz>/data.yaml    -> pass this to model.train()
+#   dataset/.image_cache/<imgsz>/cache.json   -> source mtime/size/sha1 per file
+#
+# Entries are keyed by the source's content hash and imgsz. A source whose
+# mtime or size changed is re-hashed, and only re-resized if its content did
+# change; sources that disappeared are removed from the cache.
+
+CACHE_DIR = os.path.join("dataset", ".image_cache")
+DEFAULT_WORKERS = min(8, os.cpu_count() or 1)
+JPEG_QUALITY = 95
+
+
+def file_sha1(path):
+    h = hashlib.sha1()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def resize_long_side(img, imgsz):
+    # Same geometry as the ultralytics loader: long side to imgsz. Smaller images
+    # are left alone, the loader upsamples them exactly as it would the original.
+    h, w = img.shape[:2]
+    r = imgsz / max(h, w)
+    if r >= 1:
+        return img
+    return cv2.resize(img, (max(1, round(w * r)), max(1, round(h * r))), interpolation=cv2.INTER_AREA)
+
+
+def _cache_image(src, dst, imgsz):
+    img = cv2.imread(src)
+    if img is None:
+        raise IOError(f"Can't read {src}")
+    img = resize_long_side(img, imgsz)
+    params = [cv2.IMWRITE_JPEG_QUALITY, JPEG_QUALITY] if dst.lower().endswith(('.jpg', '.jpeg')) else []
+    tmp = dst + ".part" + os.path.splitext(dst)[1]
+    cv2.imwrite(tmp, img, params)
+    os.replace(tmp, dst)
+    # Written after the image so its mtime is newer: ultralytics then trusts it
+    npy = os.path.splitext(dst)[0] + ".npy"
+    np.save(npy + ".part.npy", img, allow_pickle=False)
+    os.replace(npy + ".part.npy", npy)
+
+
+class ImageCache:
+    """Resized images for every subset of a data.yaml, at one imgsz.
+
+        cache = ImageCache("data.yaml", imgsz=640)
+        cache.build()
+        model.train(data=cache.data_yaml, imgsz=640)
+    """
+
+    def __init__(self, data="data.yaml", imgsz=640, cache_dir=CACHE_DIR):
+        self.data = data
+        self.imgsz = int(imgsz)
+        self.root = os.path.join(cache_dir, str(self.imgsz))
+        self.data_yaml = os.path.join(self.root, "data.yaml")
+        self.manifest_path = os.path.join(self.root, "cache.json")
+        self.last_build = {}
+
+    def _load_manifest(self):
+        try:
+            with open(self.manifest_path) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def _plan(self, subsets):
+        # (key, source, destination) for every image and label of every subset
+        for subset, images_dir in subsets.items():
+            for kind, src_dir, exts in (("images", images_dir, IMAGE_EXTS),
+                                        ("labels", labels_dir_for(images_dir), (".txt",))):
+                if not os.path.isdir(src_dir):
+                    continue
+                dst_dir = os.path.join(self.root, subset, kind)
+                os.makedirs(dst_dir, exist_ok=True)
+                with os.scandir(src_dir) as entries:
+                    for entry in entries:
+                        if entry.name.lower().endswith(exts) and entry.is_file():
+                            st = entry.stat()
+                            yield (f"{subset}/{kind}/{entry.name}", entry.path,
+                                   os.path.join(dst_dir, entry.name), st.st_mtime_ns, st.st_size)
+
+    def _update(self, item, old):
+        # -> (key, manifest entry, what happened)
+        key, src, dst, mtime, size = item
+        known = old.get(key)
+        if known and known[0] == mtime and known[1] == size and os.path.exists(dst):
+            return key, known, "unchanged"
+        digest = file_sha1(src)
+        if known and known[2] == digest and os.path.exists(dst):
+            return key, [mtime, size, digest], "unchanged"  # touched, same content
+        if key.split("/")[1] == "images":
+            _cache_image(src, dst, self.imgsz)
+        else:
+            shutil.copyfile(src, dst)
+        return key, [mtime, size, digest], "written"
+
+    def build(self, workers=DEFAULT_WORKERS):
+        t0 = time.perf_counter()
+        subsets, names, nc = read_data_yaml(self.data)
+        old = self._load_manifest()
+        if old.get("imgsz") != self.imgsz or old.get("subsets") != subsets:
+            old = {}
+        old_files = old.get("files", {})
+        plan = list(self._plan(subsets))
+
+        # cv2 decode/resize/encode release the GIL, threads are enough
+        with ThreadPoolExecutor(max(1, workers)) as pool:
+            results = list(pool.map(lambda item: self._update(item, old_files), plan))
+        files = {key: entry for key, entry, _ in results}
+        written = sum(1 for _, _, what in results if what == "written")
+
+        removed = 0
+        for key in set(old_files) - set(files):
+            path = os.path.join(self.root, key)
+            for p in (path, os.path.splitext(path)[0] + ".npy"):
+                if os.path.exists(p):
+                    os.remove(p)
+            removed += 1
+
+        cached = {s: os.path.abspath(os.path.join(self.root, s, "images")) for s in subsets}
+        with open(self.data_yaml, "w") as f:
+            yaml.safe_dump({**cached, "nc": nc, "names": names}, f, sort_keys=False)
+        with open(self.manifest_path + ".part", "w") as f:
+            f.write(json.dumps({"imgsz": self.imgsz, "subsets": subsets, "files": files}))
+        os.replace(self.manifest_path + ".part", self.manifest_path)
+
+        self.last_build = {"files": len(files), "written": written, "unchanged": len(files) - written,
+                           "removed": removed, "seconds": time.perf_counter() - t0}
+        return self.data_yaml
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build the pre-resized training image cache")
+    parser.add_argument("--data", default="data.yaml")
+    parser.add_argument("--imgsz", type=int, default=640)
+    parser.add_argument("--cache-dir", default=CACHE_DIR)
+    parser.add_argument("--workers", type=int, default=DEFAULT_WORKERS)
+    args = parser.parse_args()
+
+    cache = ImageCache(args.data, args.imgsz, args.cache_dir)
+    data_yaml = cache.build(args.workers)
+    b = cache.last_build
+    print(f"🗄️ {b['files']} files: {b['written']} written, {b['unchanged']} unchanged, "
+          f"{b['removed']} removed in {b['seconds']:.1f}s")
+    print(f"   Train with: {data_yaml}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,11 +1,37 @@
+import argparse
+import json
 import os
-import zipfile
 import shutil
+import threading
+import time
+import zipfile
+import zlib
+from concurrent.futures import ThreadPoolExecutor
 
 # Configuration
 PROJECT_ROOT = os.getcwd()
 DATASET_DIR = os.path.join(PROJECT_ROOT, "dataset")
-TEMP_EXTRACT_DIR = os.path.join(PROJECT_ROOT, "temp_extracted")
+MANIFEST_NAME = "manifest.json"
+
+# Roboflow export usually has 'train', 'valid', 'test' folders at root or nested
+SUBSETS = {
+    "train": "train", "training": "train",
+    "valid": "val", "val": "val", "validation": "val",
+    "test": "test", "testing": "test",
+}
+IMAGE_EXTS = ('.jpg', '.jpeg', '.png', '.bmp')
+COPY_BUFFER = 1024 * 1024
+DEFAULT_WORKERS = min(8, os.cpu_count() or 1)
+
+# Members are streamed straight from the archive to their final place in
+# dataset/, nothing is extracted to a temporary folder first. Each worker
+# thread opens its own handle on the zip and takes a contiguous run of
+# members, so the archive is read once, front to back, in N parallel pieces.
+# A manifest in dataset/ records what was imported; on the next import,
+# files whose size and CRC already match are skipped. Afterwards every
+# dataset/<subset>/images|labels folder holds exactly the archive's files:
+# anything else there (the dummy data, files an older export had) is
+# deleted, so a train run only ever sees the imported dataset.
 
 def find_zip_file():
     for file in os.listdir(PROJECT_ROOT):
@@ -13,93 +39,203 @@ def find_zip_file():
             return os.path.join(PROJECT_ROOT, file)
     return None
 
-def import_dataset():
+def target_path(member_name):
+    """'<subset>/<images|labels>/<file>' inside dataset/ for an archive member, or None."""
+    parts = [p for p in member_name.split("/") if p]
+    if not parts or parts[0] == "__MACOSX":
+        return None
+    dirs, filename = [p.lower() for p in parts[:-1]], parts[-1]
+
+    # The innermost train/valid/test folder decides the subset
+    subset_at = max((i for i, d in enumerate(dirs) if d in SUBSETS), default=None)
+    if subset_at is None:
+        return None
+    rest = dirs[subset_at + 1:]
+
+    # Case A: 'train/images' & 'train/labels'
+    if rest == ["images"]:
+        kind = "images"
+    elif rest == ["labels"]:
+        kind = "labels"
+    # Case B: Mixed files in the folder (less common for YOLOv8 but possible)
+    elif not rest and filename.lower().endswith(IMAGE_EXTS):
+        kind = "images"
+    elif not rest and filename.lower().endswith('.txt'):
+        kind = "labels"
+    else:
+        return None
+    return f"{SUBSETS[dirs[subset_at]]}/{kind}/{filename}"
+
+def load_manifest(dataset_dir):
+    try:
+        with open(os.path.join(dataset_dir, MANIFEST_NAME)) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {"files": {}}
+
+def file_crc(path):
+    crc = 0
+    with open(path, "rb") as f:
+        while True:
+            chunk = f.read(COPY_BUFFER)
+            if not chunk:
+                return crc
+            crc = zlib.crc32(chunk, crc)
+
+def is_unchanged(info, dest, rel, old_files):
+    if not os.path.exists(dest) or os.path.getsize(dest) != info.file_size:
+        return False
+    known = old_files.get(rel)
+    if known is not None:
+        return known["crc"] == info.CRC
+    # Not imported by us (or no manifest yet): compare the file on disk
+    return file_crc(dest) == info.CRC
+
+def stale_files(dataset_dir, files):
+    """Files in the subset images/labels folders that are not in the new manifest."""
+    for subset in sorted(set(SUBSETS.values())):
+        for kind in ("images", "labels"):
+            folder = os.path.join(dataset_dir, subset, kind)
+            if not os.path.isdir(folder):
+                continue
+            with os.scandir(folder) as entries:
+                for entry in entries:
+                    if entry.is_file() and f"{subset}/{kind}/{entry.name}" not in files:
+                        yield entry.path
+
+def split_runs(members, workers):
+    # Contiguous runs of roughly equal compressed size, in archive order
+    total = sum(info.compress_size for info, _ in members) or 1
+    runs, current, size = [], [], 0
+    for item in members:
+        current.append(item)
+        size += item[0].compress_size
+        if size >= total / workers and len(runs) < workers - 1:
+            runs.append(current)
+            current, size = [], 0
+    if current:
+        runs.append(current)
+    return runs
+
+class ImportProgress:
+    def __init__(self, total):
+        self.total = total
+        self.done = 0
+        self.bytes = 0
+        self.t0 = time.perf_counter()
+        self.lock = threading.Lock()
+
+    def add(self, nbytes):
+        with self.lock:
+            self.done += 1
+            self.bytes += nbytes
+            if self.done % 500 == 0 or self.done == self.total:
+                elapsed = time.perf_counter() - self.t0
+                print(f"   [{self.done}/{self.total}] {self.bytes / 1e6 / elapsed:.1f} MB/s", end="\r")
+
+def extract_run(zip_path, run, progress):
+    # One zip handle per worker: reads are sequential within the run
+    with zipfile.ZipFile(zip_path) as zf:
+        for info, dest in run:
+            tmp = dest + ".part"
+            # zf.open() checks the CRC as it streams, a corrupt member raises here
+            with zf.open(info) as src, open(tmp, "wb") as dst:
+                shutil.copyfileobj(src, dst, COPY_BUFFER)
+            os.replace(tmp, dest)
+            progress.add(info.file_size)
+
+def import_dataset(zip_path=None, dataset_dir=DATASET_DIR, workers=DEFAULT_WORKERS, clean=False):
     # 1. Find Zip
-    zip_path = find_zip_file()
+    zip_path = zip_path or find_zip_file()
     if not zip_path:
         print("❌ No .zip file found in the project folder.")
         print("   Please download the dataset ZIP from Roboflow and drop it here.")
         return
 
     print(f"📦 Found archive: {os.path.basename(zip_path)}")
-    
-    # 2. Extract
-    print("   Extracting...")
-    if os.path.exists(TEMP_EXTRACT_DIR):
-        shutil.rmtree(TEMP_EXTRACT_DIR)
-    os.makedirs(TEMP_EXTRACT_DIR)
-    
-    with zipfile.ZipFile(zip_path, 'r') as zip_ref:
-        zip_ref.extractall(TEMP_EXTRACT_DIR)
-
-    # 3. Clean existing dummy/old data
-    print("   Cleaning old/dummy data in 'dataset/'...")
-    if os.path.exists(DATASET_DIR):
-        shutil.rmtree(DATASET_DIR)
-    os.makedirs(DATASET_DIR)
-
-    # 4. Move Files (Smart Move)
-    # Roboflow export usually has 'train', 'valid', 'test' folders at root or nested
-    found_data = False
-    
-    for root, dirs, files in os.walk(TEMP_EXTRACT_DIR):
-        # Check if this folder looks like a subset (train/valid/test)
-        folder_name = os.path.basename(root).lower()
-        
-        target_subset = None
-        if folder_name in ['train', 'training']:
-            target_subset = 'train'
-        elif folder_name in ['valid', 'val', 'validation']:
-            target_subset = 'val'
-        elif folder_name in ['test', 'testing']:
-            target_subset = 'test'
-            
-        if target_subset:
-            print(f"   PLEASE WAIT: Processing '{target_subset}' set...")
-            
-            # Destination paths
-            dest_images = os.path.join(DATASET_DIR, target_subset, "images")
-            dest_labels = os.path.join(DATASET_DIR, target_subset, "labels")
-            os.makedirs(dest_images, exist_ok=True)
-            os.makedirs(dest_labels, exist_ok=True)
-            
-            # Identify structure: is it 'train/images' & 'train/labels' OR just 'train/' with mixed files?
-            # We look inside the source 'root'
-            
-            # Case A: Subfolders 'images' and 'labels' exist
-            src_images_dir = os.path.join(root, "images")
-            src_labels_dir = os.path.join(root, "labels")
-            
-            if os.path.exists(src_images_dir) and os.path.exists(src_labels_dir):
-                # Copy content of images
-                for f in os.listdir(src_images_dir):
-                    shutil.move(os.path.join(src_images_dir, f), os.path.join(dest_images, f))
-                # Copy content of labels
-                for f in os.listdir(src_labels_dir):
-                    shutil.move(os.path.join(src_labels_dir, f), os.path.join(dest_labels, f))
-                found_data = True
-            
-            # Case B: Mixed files in the folder (less common for YOLOv8 but possible)
-            else:
-                for f in os.listdir(root):
-                    src_file = os.path.join(root, f)
-                    if os.path.isfile(src_file):
-                        if f.endswith(('.jpg', '.jpeg', '.png', '.bmp')):
-                            shutil.move(src_file, os.path.join(dest_images, f))
-                            found_data = True
-                        elif f.endswith('.txt'):
-                            shutil.move(src_file, os.path.join(dest_labels, f))
-
-    # 5. Cleanup
-    shutil.rmtree(TEMP_EXTRACT_DIR)
-    
-    if found_data:
-        print("\n✅ SUCCESS: Dataset imported!")
-        print(f"   Files organized in: {DATASET_DIR}")
-        print("   You can now run: python train.py")
-    else:
-        print("\n⚠️ WARNING: Extracted the zip but couldn't find standard 'train/valid' folders.")
-        print(f"   Please check the extracted contents in {TEMP_EXTRACT_DIR}")
+    t0 = time.perf_counter()
+
+    # 2. Clean existing dummy/old data (only when asked, imports are incremental otherwise)
+    if clean and os.path.exists(dataset_dir):
+        print("   Cleaning old/dummy data in 'dataset/'...")
+        shutil.rmtree(dataset_dir)
+    os.makedirs(dataset_dir, exist_ok=True)
+    old_files = load_manifest(dataset_dir).get("files", {})
+
+    # 3. Plan from the central directory alone, no member data is read yet
+    with zipfile.ZipFile(zip_path) as zf:
+        infos = sorted((i for i in zf.infolist() if not i.is_dir()), key=lambda i: i.header_offset)
+    planned = {}
+    for info in infos:
+        rel = target_path(info.filename)
+        if rel is not None:
+            # Same file name in two folders of one subset: the later member wins, as with the old move
+            planned[rel] = info
+    files, todo = {}, []
+    skipped = 0
+    for rel, info in planned.items():
+        dest = os.path.join(dataset_dir, rel)
+        files[rel] = {"member": info.filename, "size": info.file_size, "crc": info.CRC}
+        if is_unchanged(info, dest, rel, old_files):
+            skipped += 1
+        else:
+            todo.append((info, dest))
+    todo.sort(key=lambda item: item[0].header_offset)
+
+    if not files:
+        print("\n⚠️ WARNING: Couldn't find standard 'train/valid' folders in the zip.")
+        print(f"   Please check the contents of {zip_path}")
+        return
+
+    for dest in {os.path.dirname(d) for _, d in todo}:
+        os.makedirs(dest, exist_ok=True)
+
+    # 4. Stream members to their final place
+    print(f"   {len(files)} files in archive, {skipped} already up to date, {len(todo)} to write")
+    if todo:
+        progress = ImportProgress(len(todo))
+        runs = split_runs(todo, max(1, workers))
+        with ThreadPoolExecutor(len(runs)) as pool:
+            for future in [pool.submit(extract_run, zip_path, run, progress) for run in runs]:
+                future.result()
+        print()
+
+    # 5. Remove everything else from the subset folders: dummy data, files older exports had
+    removed = 0
+    for path in list(stale_files(dataset_dir, files)):
+        os.remove(path)
+        removed += 1
+
+    # 6. Manifest
+    counts = {}
+    for rel in files:
+        subset, kind = rel.split("/")[:2]
+        counts.setdefault(subset, {"images": 0, "labels": 0})[kind] += 1
+    manifest = {
+        "archive": os.path.basename(zip_path),
+        "archive_size": os.path.getsize(zip_path),
+        "imported_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "counts": counts,
+        "files": files,
+    }
+    manifest_path = os.path.join(dataset_dir, MANIFEST_NAME)
+    with open(manifest_path + ".part", "w") as f:
+        json.dump(manifest, f)
+    os.replace(manifest_path + ".part", manifest_path)
+
+    elapsed = time.perf_counter() - t0
+    print("\n✅ SUCCESS: Dataset imported!")
+    print(f"   {len(todo)} written, {skipped} unchanged, {removed} removed in {elapsed:.1f}s")
+    for subset, c in sorted(counts.items()):
+        print(f"   {subset}: {c['images']} images, {c['labels']} labels")
+    print(f"   Files organized in: {dataset_dir}")
+    print("   You can now run: python train.py")
 
 if __name__ == "__main__":
-    import_dataset()
+    parser = argparse.ArgumentParser(description="Import a Roboflow YOLO zip into dataset/")
+    parser.add_argument("zip", nargs="?", help="Archive to import (default: the first .zip in this folder)")
+    parser.add_argument("--dataset", default=DATASET_DIR)
+    parser.add_argument("--workers", type=int, default=DEFAULT_WORKERS)
+    parser.add_argument("--clean", action="store_true", help="Delete dataset/ first instead of updating it")
+    args = parser.parse_args()
+    import_dataset(args.zip, args.dataset, args.workers, args.clean)
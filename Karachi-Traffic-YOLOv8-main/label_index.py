@@ -0,0 +1,305 @@
+import argparse
+import json
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import yaml
+
+# Columnar index of the YOLO label files under dataset/*/labels.
+#
+# All boxes of all label files live in one float32 table (class, x, y, w, h)
+# plus a file id per row, saved as .npy files in dataset/.label_index and
+# memory-mapped on load. Rebuilding only re-reads label files whose mtime or
+# size changed. Validation and statistics are NumPy queries over the table,
+# so re-checking a large dataset doesn't open thousands of files again.
+#
+#   python label_index.py                # index, validate and print stats for data.yaml
+#   python label_index.py --json report.json
+
+INDEX_DIR = os.path.join("dataset", ".label_index")
+IMAGE_EXTS = ('.jpg', '.jpeg', '.png', '.bmp')
+EXAMPLES = 5
+
+
+def labels_dir_for(images_dir):
+    # Same convention as ultralytics: .../images/... -> .../labels/...
+    head, tail = os.path.split(os.path.normpath(images_dir))
+    return os.path.join(head, "labels") if tail == "images" else images_dir
+
+
+def read_data_yaml(path):
+    with open(path) as f:
+        data = yaml.safe_load(f)
+    root = data.get("path") or ""
+    subsets = {s: os.path.join(root, data[s]) for s in ("train", "val", "test") if data.get(s)}
+    names = data.get("names", [])
+    if isinstance(names, dict):
+        names = [names[k] for k in sorted(names)]
+    return subsets, names, int(data.get("nc", len(names)))
+
+
+def _scan(directory, exts, stat=True):
+    # {file name: (mtime_ns, size)} for one folder, one stat per entry (None without stat)
+    out = {}
+    if not os.path.isdir(directory):
+        return out
+    with os.scandir(directory) as entries:
+        for entry in entries:
+            if entry.name.lower().endswith(exts) and entry.is_file():
+                if stat:
+                    st = entry.stat()
+                    out[entry.name] = (st.st_mtime_ns, st.st_size)
+                else:
+                    out[entry.name] = None
+    return out
+
+
+def parse_label_file(path):
+    """(rows float32 (N, 5), malformed line count) of a YOLO label file."""
+    with open(path) as f:
+        lines = [line.split() for line in f.read().splitlines() if line.strip()]
+    good = [line for line in lines if len(line) == 5]
+    bad = len(lines) - len(good)
+    try:
+        rows = np.array(good, dtype=np.float32).reshape(-1, 5)
+    except ValueError:  # non-numeric tokens
+        rows = np.array([r for r in good if _numeric(r)], dtype=np.float32).reshape(-1, 5)
+        bad = len(lines) - len(rows)
+    return rows, bad
+
+
+def _numeric(tokens):
+    try:
+        [float(t) for t in tokens]
+        return True
+    except ValueError:
+        return False
+
+
+class LabelIndex:
+    """All boxes of a dataset as columns.
+
+        index = LabelIndex({"train": "dataset/train/images", "val": "dataset/val/images"}).build()
+        index.rows     # (N, 5) float32: class, x, y, w, h (memory-mapped)
+        index.file_id  # (N,) int32 row -> index.files
+        index.files    # [subset, label file name, mtime_ns, size, malformed lines]
+    """
+
+    def __init__(self, subsets, index_dir=INDEX_DIR):
+        self.subsets = dict(subsets)
+        self.index_dir = index_dir
+        self.files = []
+        self.rows = np.zeros((0, 5), dtype=np.float32)
+        self.file_id = np.zeros(0, dtype=np.int32)
+        self.images = {}  # subset -> set of image stems
+        self.last_build = {}
+
+    # --- Build ---
+
+    def _load(self):
+        try:
+            with open(os.path.join(self.index_dir, "files.json")) as f:
+                meta = json.load(f)
+            rows = np.load(os.path.join(self.index_dir, "rows.npy"), mmap_mode="r")
+            file_id = np.load(os.path.join(self.index_dir, "file_id.npy"), mmap_mode="r")
+        except (OSError, ValueError):
+            return [], np.zeros((0, 5), dtype=np.float32), np.zeros(0, dtype=np.int32)
+        if meta.get("subsets") != self.subsets:
+            return [], np.zeros((0, 5), dtype=np.float32), np.zeros(0, dtype=np.int32)
+        return meta["files"], rows, file_id
+
+    def _save(self):
+        os.makedirs(self.index_dir, exist_ok=True)
+        for name, array in (("rows", self.rows), ("file_id", self.file_id)):
+            tmp = os.path.join(self.index_dir, name + ".tmp.npy")
+            np.save(tmp, np.ascontiguousarray(array))
+            os.replace(tmp, os.path.join(self.index_dir, name + ".npy"))
+        tmp = os.path.join(self.index_dir, "files.json.tmp")
+        with open(tmp, "w") as f:
+            f.write(json.dumps({"subsets": self.subsets, "files": self.files}))
+        os.replace(tmp, os.path.join(self.index_dir, "files.json"))
+
+    def build(self, workers=8, rebuild=False):
+        t0 = time.perf_counter()
+        old_files, old_rows, old_file_id = ([], None, None) if rebuild else self._load()
+        old_by_key = {(f[0], f[1]): i for i, f in enumerate(old_files)}
+
+        files, keep_old, to_parse = [], [], []
+        self.images = {}
+        for subset, images_dir in self.subsets.items():
+            self.images[subset] = {os.path.splitext(n)[0] for n in _scan(images_dir, IMAGE_EXTS, stat=False)}
+            labels_dir = labels_dir_for(images_dir)
+            for name, (mtime, size) in sorted(_scan(labels_dir, (".txt",)).items()):
+                old = old_by_key.get((subset, name))
+                if old is not None and old_files[old][2] == mtime and old_files[old][3] == size:
+                    keep_old.append((len(files), old))
+                    files.append(old_files[old])
+                else:
+                    to_parse.append((len(files), os.path.join(labels_dir, name)))
+                    files.append([subset, name, mtime, size, 0])
+
+        # Unchanged files: copy their rows over with one mask, renumbering file ids
+        parts_rows, parts_ids = [], []
+        if keep_old:
+            remap = np.full(len(old_files), -1, dtype=np.int32)
+            new_ids, old_ids = np.array(keep_old, dtype=np.int32).T
+            remap[old_ids] = new_ids
+            mapped = remap[np.asarray(old_file_id)]
+            keep = mapped >= 0
+            parts_rows.append(np.asarray(old_rows)[keep])
+            parts_ids.append(mapped[keep])
+
+        # New / changed files: parsed on worker threads (mostly waiting on file opens)
+        with ThreadPoolExecutor(max(1, workers)) as pool:
+            parsed = list(pool.map(lambda item: parse_label_file(item[1]), to_parse))
+        for (fid, _), (rows, bad) in zip(to_parse, parsed):
+            files[fid][4] = bad
+            parts_rows.append(rows)
+            parts_ids.append(np.full(len(rows), fid, dtype=np.int32))
+
+        rows = np.concatenate(parts_rows) if parts_rows else np.zeros((0, 5), dtype=np.float32)
+        file_id = np.concatenate(parts_ids) if parts_ids else np.zeros(0, dtype=np.int32)
+        order = np.argsort(file_id, kind="stable")  # rows grouped by file, in file order
+        removed = len(old_by_key.keys() - {(f[0], f[1]) for f in files})
+        if to_parse or removed or len(keep_old) != len(old_files):
+            self.files, self.rows, self.file_id = files, rows[order], file_id[order]
+            self._save()
+            self.rows = np.load(os.path.join(self.index_dir, "rows.npy"), mmap_mode="r")
+            self.file_id = np.load(os.path.join(self.index_dir, "file_id.npy"), mmap_mode="r")
+        else:  # nothing changed, keep the memory-mapped index as it is
+            self.files, self.rows, self.file_id = old_files, old_rows, old_file_id
+        self.last_build = {"files": len(files), "parsed": len(to_parse), "reused": len(keep_old),
+                           "removed": removed, "boxes": len(self.rows),
+                           "seconds": time.perf_counter() - t0}
+        return self
+
+    # --- Queries ---
+
+    def _file_subsets(self):
+        order = list(self.subsets)
+        return np.array([order.index(f[0]) for f in self.files], dtype=np.int8), order
+
+    def _examples(self, file_ids):
+        ids = np.unique(file_ids)[:EXAMPLES]
+        return [f"{self.files[i][0]}/{self.files[i][1]}" for i in ids.tolist()]
+
+    def validate(self, nc):
+        """Problems found, as {check: {"count": n, "examples": [...]}}."""
+        cls, xywh = self.rows[:, 0], self.rows[:, 1:]
+        fid = np.asarray(self.file_id)
+        checks = {
+            "class_out_of_range": (cls < 0) | (cls >= nc),
+            "class_not_integer": cls != np.floor(cls),
+            "coords_out_of_range": ((xywh < 0) | (xywh > 1)).any(axis=1),
+            "zero_size_box": (xywh[:, 2] <= 0) | (xywh[:, 3] <= 0),
+        }
+        report = {name: {"count": int(mask.sum()), "examples": self._examples(fid[mask])}
+                  for name, mask in checks.items()}
+
+        # Exact duplicate boxes within a file
+        if len(fid):
+            table = np.column_stack([fid.astype(np.float64), np.asarray(self.rows, dtype=np.float64)])
+            _, first, counts = np.unique(table, axis=0, return_index=True, return_counts=True)
+            dup = first[counts > 1]
+            report["duplicate_boxes"] = {"count": int((counts[counts > 1] - 1).sum()),
+                                         "examples": self._examples(fid[dup])}
+        else:
+            report["duplicate_boxes"] = {"count": 0, "examples": []}
+
+        malformed = np.array([f[4] for f in self.files], dtype=np.int64)
+        report["malformed_lines"] = {"count": int(malformed.sum()),
+                                     "examples": self._examples(np.flatnonzero(malformed))}
+
+        # Images without a label file and label files without an image
+        missing, orphans = [], []
+        for subset, stems in self.images.items():
+            labelled = {os.path.splitext(f[1])[0] for f in self.files if f[0] == subset}
+            missing += [f"{subset}/{s}" for s in sorted(stems - labelled)]
+            orphans += [f"{subset}/{s}.txt" for s in sorted(labelled - stems)]
+        report["images_without_labels"] = {"count": len(missing), "examples": missing[:EXAMPLES]}
+        report["labels_without_images"] = {"count": len(orphans), "examples": orphans[:EXAMPLES]}
+        return report
+
+    def stats(self, names):
+        """Per subset and class: boxes, images, and box size percentiles (fraction of the image)."""
+        nc = len(names)
+        file_subset, order = self._file_subsets()
+        fid = np.asarray(self.file_id)
+        cls = np.asarray(self.rows[:, 0]).astype(np.int64)
+        valid = (cls >= 0) & (cls < nc)
+        w, h = self.rows[:, 3], self.rows[:, 4]
+        row_subset = file_subset[fid] if len(fid) else np.zeros(0, dtype=np.int8)
+        out = {}
+        for s, subset in enumerate(order):
+            in_subset = valid & (row_subset == s)
+            c, f = cls[in_subset], fid[in_subset]
+            boxes = np.bincount(c, minlength=nc)
+            pairs = np.unique(f.astype(np.int64) * nc + c)  # (file, class) pairs
+            images = np.bincount(pairs % nc, minlength=nc)
+            area = np.sqrt(np.asarray(w[in_subset] * h[in_subset], dtype=np.float64))  # side of a square box
+            # Boxes per label file of this subset, empty files included
+            per_file = np.bincount(fid[row_subset == s], minlength=len(self.files))[file_subset == s]
+            classes = {}
+            for k in np.flatnonzero(boxes).tolist():
+                q = np.percentile(area[c == k], [5, 50, 95])
+                classes[names[k]] = {"boxes": int(boxes[k]), "images": int(images[k]),
+                                     "size_p5": float(q[0]), "size_p50": float(q[1]), "size_p95": float(q[2])}
+            out[subset] = {
+                "label_files": int((file_subset == s).sum()),
+                "images": len(self.images.get(subset, ())),
+                "boxes": int(in_subset.sum()),
+                "boxes_per_image_mean": float(per_file.mean()) if per_file.size else 0.0,
+                "boxes_per_image_max": int(per_file.max()) if per_file.size else 0,
+                "classes": classes,
+                "missing_classes": [names[k] for k in range(nc) if boxes[k] == 0],
+            }
+        return out
+
+
+def print_report(validation, stats, build):
+    print(f"🗂️ {build['files']} label files, {build['boxes']} boxes "
+          f"({build['parsed']} parsed, {build['reused']} unchanged, {build['removed']} removed) in {build['seconds']:.2f}s")
+    print("\n🔍 Validation")
+    for check, result in validation.items():
+        mark = "✅" if result["count"] == 0 else "❌"
+        print(f"   {mark} {check}: {result['count']}")
+        for example in result["examples"]:
+            print(f"        {example}")
+    for subset, s in stats.items():
+        print(f"\n📊 {subset}: {s['images']} images, {s['label_files']} label files, {s['boxes']} boxes, "
+              f"{s['boxes_per_image_mean']:.1f} boxes/image (max {s['boxes_per_image_max']})")
+        print(f"   {'class':<16} {'boxes':>7} {'images':>7} {'size p5':>8} {'p50':>6} {'p95':>6}")
+        for name, c in sorted(s["classes"].items(), key=lambda kv: -kv[1]["boxes"]):
+            print(f"   {name:<16} {c['boxes']:>7} {c['images']:>7} {c['size_p5']:>8.3f} {c['size_p50']:>6.3f} {c['size_p95']:>6.3f}")
+        if s["missing_classes"]:
+            print(f"   ⚠️ no boxes for: {', '.join(s['missing_classes'])}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Index, validate and summarize YOLO labels")
+    parser.add_argument("--data", default="data.yaml")
+    parser.add_argument("--index-dir", default=INDEX_DIR)
+    parser.add_argument("--workers", type=int, default=8)
+    parser.add_argument("--rebuild", action="store_true", help="Re-read every label file")
+    parser.add_argument("--json", help="Also write the validation and stats report here")
+    args = parser.parse_args()
+
+    subsets, names, nc = read_data_yaml(args.data)
+    index = LabelIndex(subsets, args.index_dir).build(args.workers, args.rebuild)
+    validation = index.validate(nc)
+    stats = index.stats(names)
+    print_report(validation, stats, index.last_build)
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({"build": index.last_build, "validation": validation, "stats": stats}, f, indent=2)
+
+    # Non-zero exit on label errors; missing labels alone (background images) are not errors
+    errors = sum(r["count"] for k, r in validation.items() if k not in ("images_without_labels", "labels_without_images"))
+    sys.exit(1 if errors else 0)
+
+
+if __name__ == "__main__":
+    main()
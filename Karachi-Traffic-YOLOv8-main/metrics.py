@@ -0,0 +1,202 @@
+import bisect
+import json
+import os
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import numpy as np
+
+# Hot-path timings for the image, video and camera flows.
+#
+# Every stage (decode, inference, plot, render, ...) gets a timer that keeps
+# the last WINDOW samples for rolling percentiles plus cumulative histogram
+# buckets for Prometheus. Counters (frames, drops) and gauges (latency, model
+# load times) sit next to them. One Metrics object lives per server process,
+# like the model registry, and is shared by all sessions.
+#
+# Export, both optional and set up from the environment:
+#   TRAFFIC_METRICS_LOG=metrics.jsonl   append a snapshot every TRAFFIC_METRICS_INTERVAL seconds (default 10)
+#   TRAFFIC_METRICS_PORT=9108           serve Prometheus text on http://<host>:9108/metrics
+
+BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+WINDOW = 512
+
+
+class StageTimer:
+    def __init__(self, window=WINDOW):
+        self.recent = deque(maxlen=window)
+        self.buckets = [0] * (len(BUCKETS) + 1)  # last one is +Inf
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+
+    def observe(self, seconds, n=1):
+        if n == 1:
+            self.recent.append(seconds)
+        else:
+            self.recent.extend([seconds] * n)
+        self.buckets[bisect.bisect_left(BUCKETS, seconds)] += n
+        self.count += n
+        self.sum += seconds * n
+        self.max = max(self.max, seconds)
+
+    def summary(self):
+        recent = np.fromiter(self.recent, dtype=np.float64, count=len(self.recent)) * 1000
+        p50, p95 = np.percentile(recent, [50, 95]) if recent.size else (0.0, 0.0)
+        return {
+            "count": self.count,
+            "mean_ms": self.sum / self.count * 1000 if self.count else 0.0,
+            "p50_ms": float(p50),
+            "p95_ms": float(p95),
+            "max_ms": self.max * 1000,
+        }
+
+
+def _labels(**labels):
+    return "{" + ",".join(f'{k}="{v}"' for k, v in labels.items()) + "}"
+
+
+class Metrics:
+    """Stage timers, counters and gauges, keyed by (flow, name).
+
+        metrics = get_metrics()
+        with metrics.time("camera", "inference"):
+            results = tracker(frame)
+        metrics.inc("camera", "frames")
+    """
+
+    def __init__(self, window=WINDOW):
+        self.window = window
+        self.t_start = time.time()
+        self._timers = {}
+        self._counters = {}
+        self._gauges = {}
+        self._lock = threading.Lock()
+
+    def observe(self, flow, stage, seconds, n=1):
+        # n > 1 records a batch of n items that took `seconds` each on average
+        with self._lock:
+            timer = self._timers.get((flow, stage))
+            if timer is None:
+                timer = self._timers[(flow, stage)] = StageTimer(self.window)
+            timer.observe(seconds, n)
+
+    @contextmanager
+    def time(self, flow, stage):
+        t0 = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(flow, stage, time.perf_counter() - t0)
+
+    def inc(self, flow, name, n=1):
+        with self._lock:
+            self._counters[(flow, name)] = self._counters.get((flow, name), 0) + n
+
+    def set(self, flow, name, value):
+        with self._lock:
+            self._gauges[(flow, name)] = value
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                "time": time.time(),
+                "uptime_s": time.time() - self.t_start,
+                "stages": {f"{flow}.{stage}": t.summary() for (flow, stage), t in self._timers.items()},
+                "counters": {f"{flow}.{name}": v for (flow, name), v in self._counters.items()},
+                "gauges": {f"{flow}.{name}": v for (flow, name), v in self._gauges.items()},
+            }
+
+    def prometheus(self):
+        """Prometheus text exposition format."""
+        lines = ["# TYPE traffic_stage_seconds histogram"]
+        with self._lock:
+            timers = [(k, t.buckets[:], t.count, t.sum, t.summary()) for k, t in self._timers.items()]
+            counters = list(self._counters.items())
+            gauges = list(self._gauges.items())
+        for (flow, stage), buckets, count, total, _ in timers:
+            cumulative = 0
+            for le, n in zip(BUCKETS + ("+Inf",), buckets):
+                cumulative += n
+                lines.append(f"traffic_stage_seconds_bucket{_labels(flow=flow, stage=stage, le=le)} {cumulative}")
+            lines.append(f"traffic_stage_seconds_sum{_labels(flow=flow, stage=stage)} {total}")
+            lines.append(f"traffic_stage_seconds_count{_labels(flow=flow, stage=stage)} {count}")
+        lines.append("# TYPE traffic_stage_recent_seconds gauge")
+        for (flow, stage), _, _, _, summary in timers:
+            for q, key in (("0.5", "p50_ms"), ("0.95", "p95_ms")):
+                lines.append(f"traffic_stage_recent_seconds{_labels(flow=flow, stage=stage, quantile=q)} "
+                             f"{summary[key] / 1000}")
+        # One TYPE line per metric name, then a sample per flow
+        for kind, suffix, items in (("counter", "_total", counters), ("gauge", "", gauges)):
+            last = None
+            for name, flow, value in sorted((name, flow, value) for (flow, name), value in items):
+                if name != last:
+                    lines.append(f"# TYPE traffic_{name}{suffix} {kind}")
+                    last = name
+                lines.append(f"traffic_{name}{suffix}{_labels(flow=flow)} {value}")
+        return "\n".join(lines) + "\n"
+
+    def write_jsonl(self, path):
+        with open(path, "a") as f:
+            f.write(json.dumps(self.snapshot()) + "\n")
+
+    def reset(self):
+        with self._lock:
+            self._timers.clear()
+            self._counters.clear()
+            self._gauges.clear()
+            self.t_start = time.time()
+
+
+def start_jsonl_log(metrics, path, interval=10.0):
+    def run():
+        while True:
+            time.sleep(interval)
+            try:
+                metrics.write_jsonl(path)
+            except OSError:
+                pass  # disk full / path gone; try again next interval
+
+    threading.Thread(target=run, name="metrics-jsonl", daemon=True).start()
+
+
+def serve_prometheus(metrics, port, host="0.0.0.0"):
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.split("?")[0] != "/metrics":
+                self.send_error(404)
+                return
+            body = metrics.prometheus().encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer((host, port), Handler)
+    threading.Thread(target=server.serve_forever, name="metrics-http", daemon=True).start()
+    return server
+
+
+_metrics = None
+_metrics_lock = threading.Lock()
+
+
+def get_metrics():
+    global _metrics
+    with _metrics_lock:
+        if _metrics is None:
+            _metrics = Metrics()
+            log_path = os.environ.get("TRAFFIC_METRICS_LOG")
+            if log_path:
+                start_jsonl_log(_metrics, log_path, float(os.environ.get("TRAFFIC_METRICS_INTERVAL", 10)))
+            port = os.environ.get("TRAFFIC_METRICS_PORT")
+            if port:
+                serve_prometheus(_metrics, int(port))
+        return _metrics
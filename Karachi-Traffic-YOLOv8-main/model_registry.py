@@ -0,0 +1,201 @@
+import os
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+from ultralytics import YOLO
+
+from backends import BACKENDS, cached_check, check_backend, ensure_exported
+from metrics import get_metrics
+
+# Streamlit re-executes app.py on every widget interaction, but imported
+# modules stay in sys.modules, so a registry living here is loaded once per
+# server process and shared by every session and rerun.
+#
+# A YOLO model keeps its predictor (dataset, batch, args) on the instance, so
+# two sessions predicting on the same model at once would trample each other.
+# get() hands out a SharedModel that runs one predictor call at a time per
+# loaded model; trackers are never stored on it (see tracking.py).
+#
+# The price is that sessions on the same model take turns: a video being
+# processed in one tab and a live camera in another wait for each other's
+# inference calls, so each gets roughly half the throughput on one device.
+# A different weights file or backend is a separate entry with its own lock.
+# For several streams at full rate use stream_service.py, which batches them
+# through one model instead of interleaving sessions.
+
+DEFAULT_MAX_MEMORY_MB = float(os.environ.get("TRAFFIC_MODEL_CACHE_MB", 2048))
+WARMUP_IMGSZ = 640
+
+
+def _model_nbytes(model, weights):
+    try:
+        params = list(model.model.parameters()) + list(model.model.buffers())
+        return sum(p.numel() * p.element_size() for p in params)
+    except AttributeError:
+        # Exported backends don't expose torch parameters, the file is a fair estimate
+        return os.path.getsize(weights) if os.path.exists(weights) else 0
+
+
+class SharedModel:
+    """A registry model: predict(), track() and calls are serialized, everything else is forwarded."""
+
+    def __init__(self, model):
+        self._model = model
+        self._lock = threading.RLock()
+
+    def predict(self, *args, **kwargs):
+        with self._lock:
+            return self._model.predict(*args, **kwargs)
+
+    def track(self, *args, **kwargs):
+        with self._lock:
+            return self._model.track(*args, **kwargs)
+
+    def __call__(self, *args, **kwargs):
+        return self.predict(*args, **kwargs)
+
+    def __getattr__(self, name):
+        return getattr(self._model, name)
+
+
+class ModelEntry:
+    def __init__(self, key, model, nbytes, load_s, warmup_s):
+        self.key = key
+        self.model = SharedModel(model)
+        self.nbytes = nbytes
+        self.load_s = load_s
+        self.warmup_s = warmup_s
+        self.hits = 0
+        self.last_used = time.time()
+        self.check = None  # backends.check_backend() report, once checked
+
+    def info(self):
+        weights, backend, device = self.key
+        return {
+            "weights": weights,
+            "backend": backend,
+            "device": device or "auto",
+            "size_mb": self.nbytes / 1e6,
+            "load_s": self.load_s,
+            "warmup_s": self.warmup_s,
+            "hits": self.hits,
+            "latency_ms": self.check["latency_ms"] if self.check else None,
+            "agreement": self.check["agreement"] if self.check else None,
+        }
+
+
+class ModelRegistry:
+    """Loads each (weights, backend, device) once and keeps it warm.
+
+    Models are evicted least-recently-used first once the estimated memory of
+    all loaded models exceeds max_memory_mb. The most recently requested model
+    is never evicted, even if it alone is over the cap.
+    """
+
+    def __init__(self, max_memory_mb=DEFAULT_MAX_MEMORY_MB, warmup_imgsz=WARMUP_IMGSZ):
+        self.max_bytes = max_memory_mb * 1e6
+        self.warmup_imgsz = warmup_imgsz
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._key_locks = {}
+        self.evictions = 0
+
+    def _load(self, key):
+        weights, backend, device = key
+        if backend not in BACKENDS:
+            raise ValueError(f"Unknown backend '{backend}'")
+
+        # Exported backends are built and cached on first use
+        path = weights if backend == "pytorch" else ensure_exported(weights, backend, self.warmup_imgsz)
+        t0 = time.perf_counter()
+        model = YOLO(path, task="detect")
+        load_s = time.perf_counter() - t0
+
+        # First inference builds the predictor and fuses layers; pay for it now
+        t0 = time.perf_counter()
+        dummy = np.zeros((self.warmup_imgsz, self.warmup_imgsz, 3), dtype=np.uint8)
+        model.predict(dummy, imgsz=self.warmup_imgsz, device=device, verbose=False)
+        warmup_s = time.perf_counter() - t0
+
+        metrics = get_metrics()
+        metrics.observe("model", "load", load_s)
+        metrics.observe("model", "warmup", warmup_s)
+        metrics.inc("model", "loads")
+
+        return ModelEntry(key, model, _model_nbytes(model, path), load_s, warmup_s)
+
+    def get(self, weights, backend="pytorch", device=None):
+        key = (weights, backend, device)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                entry.hits += 1
+                entry.last_used = time.time()
+                return entry.model
+            key_lock = self._key_locks.setdefault(key, threading.Lock())
+
+        # Load outside the registry lock so other sessions can keep using
+        # already-loaded models; the per-key lock stops duplicate loads
+        with key_lock:
+            with self._lock:
+                entry = self._entries.get(key)
+            if entry is None:
+                entry = self._load(key)
+                with self._lock:
+                    self._entries[key] = entry
+                    self._evict()
+            entry.hits += 1
+            return entry.model
+
+    def _evict(self):
+        total = sum(e.nbytes for e in self._entries.values())
+        while total > self.max_bytes and len(self._entries) > 1:
+            key, entry = self._entries.popitem(last=False)
+            self._key_locks.pop(key, None)
+            total -= entry.nbytes
+            self.evictions += 1
+
+    def check(self, weights, backend="pytorch", device=None, candidate=None):
+        """Detection agreement with the .pt model and latency of a backend.
+
+        Uses the loaded models and caches the report on the entry (and on disk
+        next to the export, see backends.check_backend). Pass the model already
+        fetched with get() as candidate, so a rerun counts as a single hit.
+        """
+        if candidate is None:
+            candidate = self.get(weights, backend, device)
+        entry = self.entry(weights, backend, device)
+        if entry.check is None:
+            entry.check = cached_check(weights, backend, self.warmup_imgsz)
+        if entry.check is None:
+            reference = self.get(weights, "pytorch", device) if backend != "pytorch" else candidate
+            entry.check = check_backend(weights, backend, self.warmup_imgsz, reference, candidate)
+        return entry.check
+
+    def entry(self, weights, backend="pytorch", device=None):
+        with self._lock:
+            return self._entries.get((weights, backend, device))
+
+    def stats(self):
+        with self._lock:
+            return [e.info() for e in reversed(self._entries.values())]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._key_locks.clear()
+
+
+_registry = None
+_registry_lock = threading.Lock()
+
+
+def get_registry():
+    global _registry
+    with _registry_lock:
+        if _registry is None:
+            _registry = ModelRegistry()
+        return _registry
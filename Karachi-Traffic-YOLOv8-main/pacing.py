@@ -0,0 +1,120 @@
+import threading
+import time
+
+# Picks which source frames to run through the model so processing keeps up
+# with the video's own clock (or with a target processing rate), instead of a
+# fixed every-Nth-frame filter.
+#
+# Real-time mode follows the playback clock: a frame the clock has already
+# passed is dropped, a frame that is not due yet is waited for. While one
+# frame is being processed the clock moves on by `latency`, so the next
+# frame taken is latency * source_fps frames later and the drops come out
+# evenly spaced.
+#
+# Target FPS mode spreads drops with a stride instead: one credit per source
+# frame, and a frame is processed whenever a stride's worth of credit has
+# built up (a stride of 2.5 processes frames 1, 3.5 -> 4, 6, 8.5 -> 9, ...).
+# The stride is source_fps / target_fps, or more if inference can't keep up.
+
+REALTIME = "realtime"
+TARGET_FPS = "target"
+
+
+class PacingScheduler:
+    """Decides per source frame whether to process it.
+
+        pacer = PacingScheduler(source_fps=25)
+        for index, frame in enumerate(frames, 1):
+            if not pacer.should_process(index):
+                continue
+            t0 = time.perf_counter()
+            tracker(frame, skipped=pacer.last_skipped)
+            pacer.record(time.perf_counter() - t0)
+    """
+
+    def __init__(self, source_fps, mode=REALTIME, target_fps=None, smoothing=0.2):
+        self.source_fps = source_fps if source_fps and source_fps > 0 else 30.0
+        self.mode = mode
+        self.target_fps = target_fps
+        self.smoothing = smoothing
+
+        self.latency = None  # EMA of seconds per processed frame
+        self.samples = 0
+        self.credit = None
+        self.pending = 0  # frames dropped since the last processed one
+        self.last_skipped = 0
+        self.seen = 0
+        self.processed = 0
+        self.last_index = 0
+        self.t_start = None
+        self._lock = threading.Lock()
+
+    def record(self, seconds):
+        with self._lock:
+            self.samples += 1
+            # The first call often includes one-off setup, so the second one seeds the average
+            if self.latency is None or self.samples == 2:
+                self.latency = seconds
+            else:
+                self.latency += self.smoothing * (seconds - self.latency)
+
+    def stride(self):
+        # Source frames per processed frame, never below 1
+        latency = self.latency or 0.0
+        stride = latency * self.source_fps
+        if self.mode == TARGET_FPS and self.target_fps:
+            stride = max(stride, self.source_fps / self.target_fps)
+        return max(1.0, stride)
+
+    def lag(self, index=None, now=None):
+        """Seconds the current frame is behind the source's playback clock."""
+        if self.t_start is None:
+            return 0.0
+        now = time.perf_counter() if now is None else now
+        index = self.last_index if index is None else index
+        return max(0.0, (now - self.t_start) - (index - 1) / self.source_fps)
+
+    def should_process(self, index):
+        now = time.perf_counter()
+        if self.t_start is None:
+            self.t_start = now
+        self.seen += 1
+        self.last_index = index
+
+        if self.mode == REALTIME:
+            late = self.lag(index, now)
+            ahead = (index - 1) / self.source_fps - (now - self.t_start)
+            # Anything more than a frame late has been overtaken by the clock
+            process = late <= 1.0 / self.source_fps
+            if process and ahead > 0:
+                time.sleep(ahead)
+        else:
+            stride = self.stride()
+            if self.credit is None:
+                process = True  # always take the first frame
+                self.credit = stride
+            else:
+                self.credit += 1.0
+                process = self.credit >= stride
+            if process:
+                self.credit = max(0.0, self.credit - stride)
+
+        if process:
+            self.processed += 1
+            self.last_skipped = self.pending
+            self.pending = 0
+        else:
+            self.pending += 1
+        return process
+
+    def stats(self, index=None):
+        # Pass the index of the frame being shown to get the lag the viewer sees
+        elapsed = (time.perf_counter() - self.t_start) if self.t_start else 0.0
+        return {
+            "source_fps": self.source_fps,
+            "achieved_fps": self.processed / elapsed if elapsed > 0 else 0.0,
+            "drop_rate": 1.0 - self.processed / self.seen if self.seen else 0.0,
+            "lag_s": self.lag(index),
+            "stride": self.stride(),
+            "latency_ms": (self.latency or 0.0) * 1000,
+        }
@@ -0,0 +1,315 @@
+import queue
+import threading
+import time
+
+import cv2
+
+# Sentinel pushed through the queues to tell the next stage the stream is over
+_END = object()
+
+
+class FramePacket:
+    """One decoded frame travelling through the pipeline."""
+
+    __slots__ = ("index", "frame", "skipped", "results", "annotated", "t_decoded")
+
+    def __init__(self, index, frame, skipped=0):
+        self.index = index
+        self.frame = frame
+        self.skipped = skipped  # source frames dropped right before this one
+        self.results = None
+        self.annotated = None
+        self.t_decoded = time.perf_counter()
+
+
+class StageStats:
+    """Frame counter and busy time for a single pipeline stage."""
+
+    def __init__(self, name):
+        self.name = name
+        self.frames = 0
+        self.busy = 0.0
+        self.lock = threading.Lock()
+
+    def add(self, seconds, frames=1):
+        with self.lock:
+            self.frames += frames
+            self.busy += seconds
+
+    def snapshot(self, wall):
+        with self.lock:
+            frames, busy = self.frames, self.busy
+        return {
+            "frames": frames,
+            # fps the stage could sustain on its own vs. what it actually delivered
+            "capacity_fps": frames / busy if busy > 0 else 0.0,
+            "throughput_fps": frames / wall if wall > 0 else 0.0,
+            "busy_s": busy,
+        }
+
+
+class VideoPipeline:
+    """Decode -> inference -> annotation running on separate threads.
+
+    Stages are connected by bounded queues, so a slow stage blocks the ones
+    upstream of it instead of letting frames pile up in memory. The consumer
+    (the Streamlit script thread) iterates over the pipeline and only does the
+    UI work, which has to stay on that thread anyway.
+
+        pipe = VideoPipeline("clip.mp4", SequentialTracker(model))
+        for packet in pipe:
+            stframe.image(packet.annotated, channels="BGR")
+
+    With batch_size > 1, infer_fn receives a list of frames and must return
+    one result per frame in the same order (see tracking.BatchTracker).
+
+    The source is a path, a cv2.VideoCapture or a spool.SpooledFile whose
+    upload may still be being written to disk. A SpooledFile is pinned from
+    start() to stop(), so the spool can't evict it while it is being read.
+
+    With a scheduler (pacing.PacingScheduler), the scheduler picks the frames
+    instead of frame_skip, and infer_fn is also passed skipped=<frames dropped
+    before this one> (a list for batches) so the tracker can account for them.
+
+    With metrics (metrics.Metrics), every stage timing and dropped frame is
+    also recorded there under `flow`.
+    """
+
+    def __init__(self, source, infer_fn, annotate_fn=None, frame_skip=1, queue_size=4, batch_size=1,
+                 scheduler=None, metrics=None, flow="video"):
+        self.source = source
+        self.infer_fn = infer_fn
+        self.batch_size = max(1, int(batch_size))
+        self.scheduler = scheduler
+        self.annotate_fn = annotate_fn or (lambda results: results[0].plot())
+        self.frame_skip = max(1, int(frame_skip))
+        self.queue_size = queue_size
+        self.metrics = metrics
+        self.flow = flow
+
+        self.stats = {name: StageStats(name) for name in ("decode", "inference", "annotate", "display")}
+        self.source_fps = 0.0
+        self.frames_read = 0
+        self.error = None
+
+        self._stop = threading.Event()
+        # The decode queue must hold a full batch or batching would stall decode
+        self._queues = [queue.Queue(maxsize=max(queue_size, self.batch_size)) for _ in range(3)]
+        self._threads = []
+        self._pinned = False
+        self._t_start = None
+        self._t_end = None
+
+    # --- Stage bodies ---
+
+    def _record(self, name, seconds, frames=1):
+        self.stats[name].add(seconds, frames)
+        if self.metrics is not None:
+            self.metrics.observe(self.flow, name, seconds / frames, frames)
+
+    def _dropped(self):
+        if self.metrics is not None:
+            self.metrics.inc(self.flow, "frames_dropped")
+
+    def _put(self, q, item):
+        # Blocking put that still notices a stop request (backpressure)
+        while not self._stop.is_set():
+            try:
+                q.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def _get(self, q):
+        while not self._stop.is_set():
+            try:
+                return q.get(timeout=0.1)
+            except queue.Empty:
+                continue
+        return _END
+
+    def _open(self):
+        if isinstance(self.source, cv2.VideoCapture):
+            return self.source
+        return cv2.VideoCapture(getattr(self.source, "path", self.source))
+
+    def _next(self, cap, grab=False):
+        # read() / grab() that waits for a source still being written to disk
+        # (spool.SpooledFile) instead of treating its current end as the end
+        while True:
+            if grab:
+                ret, frame = cap.grab(), None
+            else:
+                ret, frame = cap.read()
+            complete = getattr(self.source, "complete", None)
+            if ret or complete is None or complete.is_set():
+                return ret, frame, cap
+            while not complete.wait(0.1):
+                if self._stop.is_set():
+                    return False, None, cap
+            cap.release()
+            cap = self._open()
+            cap.set(cv2.CAP_PROP_POS_FRAMES, self.frames_read)
+
+    def _decode(self, out_q):
+        cap = self._open()
+        self.source_fps = cap.get(cv2.CAP_PROP_FPS) or 0.0
+        try:
+            if self.scheduler is not None and self.source_fps:
+                self.scheduler.source_fps = self.source_fps
+            while not self._stop.is_set():
+                t0 = time.perf_counter()
+                if self.scheduler is not None:
+                    # grab() without retrieve() skips the colour conversion of dropped frames
+                    if not self.scheduler.should_process(self.frames_read + 1):
+                        ret, _, cap = self._next(cap, grab=True)
+                        if not ret:
+                            break
+                        self.frames_read += 1
+                        self._dropped()
+                        continue
+                    skipped = self.scheduler.last_skipped
+                else:
+                    skipped = 0
+                ret, frame, cap = self._next(cap)
+                if not ret:
+                    break
+                self.frames_read += 1
+                if self.scheduler is None and self.frames_read % self.frame_skip != 0:
+                    self._dropped()
+                    continue
+                self._record("decode", time.perf_counter() - t0)
+                if not self._put(out_q, FramePacket(self.frames_read, frame, skipped)):
+                    break
+        except Exception as e:
+            self.error = e
+        finally:
+            cap.release()
+            self._put(out_q, _END)
+
+    def _run_stage(self, name, fn, in_q, out_q):
+        try:
+            while True:
+                packet = self._get(in_q)
+                if packet is _END:
+                    break
+                t0 = time.perf_counter()
+                fn(packet)
+                self._record(name, time.perf_counter() - t0)
+                if not self._put(out_q, packet):
+                    break
+        except Exception as e:
+            self.error = e
+            self._stop.set()
+        finally:
+            self._put(out_q, _END)
+
+    def _run_batch_stage(self, in_q, out_q):
+        done = False
+        try:
+            while not done:
+                batch = []
+                while len(batch) < self.batch_size:
+                    packet = self._get(in_q)
+                    if packet is _END:
+                        done = True
+                        break
+                    batch.append(packet)
+                if not batch:
+                    break
+                t0 = time.perf_counter()
+                frames = [p.frame for p in batch]
+                if self.scheduler is not None:
+                    results = self.infer_fn(frames, skipped=[p.skipped for p in batch])
+                else:
+                    results = self.infer_fn(frames)
+                elapsed = time.perf_counter() - t0
+                self._record("inference", elapsed, frames=len(batch))
+                if self.scheduler is not None:
+                    self.scheduler.record(elapsed / len(batch))
+                for packet, res in zip(batch, results):
+                    packet.results = res
+                    if not self._put(out_q, packet):
+                        return
+        except Exception as e:
+            self.error = e
+            self._stop.set()
+        finally:
+            self._put(out_q, _END)
+
+    def _infer(self, packet):
+        if self.scheduler is None:
+            packet.results = self.infer_fn(packet.frame)
+            return
+        t0 = time.perf_counter()
+        packet.results = self.infer_fn(packet.frame, skipped=packet.skipped)
+        self.scheduler.record(time.perf_counter() - t0)
+
+    def _annotate(self, packet):
+        packet.annotated = self.annotate_fn(packet.results)
+
+    # --- Lifecycle ---
+
+    def start(self):
+        if self._threads:
+            return self
+        q_decoded, q_inferred, q_annotated = self._queues
+        if hasattr(self.source, "acquire"):
+            self.source.acquire()
+            self._pinned = True
+        self._t_start = time.perf_counter()
+        if self.batch_size == 1:
+            infer_target, infer_args = self._run_stage, ("inference", self._infer, q_decoded, q_inferred)
+        else:
+            infer_target, infer_args = self._run_batch_stage, (q_decoded, q_inferred)
+        self._threads = [
+            threading.Thread(target=self._decode, args=(q_decoded,), name="pipeline-decode", daemon=True),
+            threading.Thread(target=infer_target, args=infer_args, name="pipeline-infer", daemon=True),
+            threading.Thread(target=self._run_stage, args=("annotate", self._annotate, q_inferred, q_annotated),
+                             name="pipeline-annotate", daemon=True),
+        ]
+        for t in self._threads:
+            t.start()
+        return self
+
+    def stop(self, timeout=5.0):
+        self._stop.set()
+        for t in self._threads:
+            t.join(timeout)
+        if self._pinned:
+            self._pinned = False
+            self.source.release()
+        if self._t_start is not None and self._t_end is None:
+            self._t_end = time.perf_counter()
+
+    def __iter__(self):
+        self.start()
+        out_q = self._queues[2]
+        try:
+            while True:
+                packet = self._get(out_q)
+                if packet is _END:
+                    break
+                # Time the consumer spends on a packet is the display stage
+                t0 = time.perf_counter()
+                yield packet
+                self._record("display", time.perf_counter() - t0)
+                if self.metrics is not None:
+                    self.metrics.inc(self.flow, "frames")
+        finally:
+            self.stop()
+        if self.error is not None:
+            raise self.error
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def report(self):
+        if self._t_start is None:
+            return {name: s.snapshot(0.0) for name, s in self.stats.items()}
+        wall = (self._t_end or time.perf_counter()) - self._t_start
+        return {name: s.snapshot(wall) for name, s in self.stats.items()}
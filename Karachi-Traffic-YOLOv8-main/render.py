@@ -0,0 +1,110 @@
+import time
+
+import cv2
+
+# Streamlit UI updates for the video and camera loops, decoupled from the
+# processing rate. Every st.image() / widget rebuild is serialized on the
+# script thread and pushed over the websocket, which for full-resolution
+# frames can cost more than yolov8n inference. These helpers cap how often
+# that happens and shrink what is sent.
+
+
+class FrameRenderer:
+    """Pushes at most max_fps frames per second, downscaled and JPEG-encoded."""
+
+    def __init__(self, placeholder, max_fps=10, width=960, jpeg_quality=80):
+        self.placeholder = placeholder
+        self.interval = 1.0 / max_fps if max_fps else 0.0
+        self.width = width
+        self.jpeg_quality = jpeg_quality
+        self.last_push = 0.0
+        self.pushed = 0
+        self.skipped = 0
+        self.encode_s = 0.0
+        self.last_push_s = 0.0
+        self._pending = None
+
+    def encode(self, frame_bgr):
+        h, w = frame_bgr.shape[:2]
+        if self.width and w > self.width:
+            frame_bgr = cv2.resize(frame_bgr, (self.width, int(h * self.width / w)), interpolation=cv2.INTER_AREA)
+        ok, buf = cv2.imencode(".jpg", frame_bgr, [cv2.IMWRITE_JPEG_QUALITY, self.jpeg_quality])
+        return buf.tobytes() if ok else None
+
+    def push(self, frame_bgr, force=False):
+        now = time.perf_counter()
+        if not force and now - self.last_push < self.interval:
+            self.skipped += 1
+            self._pending = frame_bgr  # shown by flush() if it ends up being the last one
+            return False
+        t0 = time.perf_counter()
+        data = self.encode(frame_bgr)
+        self.encode_s += time.perf_counter() - t0
+        if data is not None:
+            self.placeholder.image(data, use_column_width=True)
+        self.last_push_s = time.perf_counter() - t0  # encode + hand-off to Streamlit
+        self.last_push = now
+        self.pushed += 1
+        self._pending = None
+        return True
+
+    def flush(self):
+        if self._pending is not None:
+            self.push(self._pending, force=True)
+
+    def stats(self):
+        return {
+            "pushed": self.pushed,
+            "skipped": self.skipped,
+            "encode_ms": self.encode_s / self.pushed * 1000 if self.pushed else 0.0,
+        }
+
+
+class CountsPanel:
+    """Re-renders the counts panel only when the counts change (and at most max_fps)."""
+
+    def __init__(self, placeholder, render_fn, max_fps=2):
+        self.placeholder = placeholder
+        self.render_fn = render_fn
+        self.interval = 1.0 / max_fps if max_fps else 0.0
+        self.last_push = 0.0
+        self.shown = None
+        self._pending = None
+
+    def update(self, counts, force=False):
+        if counts == self.shown:
+            self._pending = None
+            return False
+        now = time.perf_counter()
+        if not force and now - self.last_push < self.interval:
+            self._pending = counts
+            return False
+        with self.placeholder.container():
+            self.render_fn(counts)
+        self.shown = dict(counts)
+        self.last_push = now
+        self._pending = None
+        return True
+
+    def flush(self):
+        if self._pending is not None:
+            self.update(self._pending, force=True)
+
+
+class PeriodicPanel:
+    """Re-renders a panel from render_fn() at most once every `interval` seconds."""
+
+    def __init__(self, placeholder, render_fn, interval=1.0):
+        self.placeholder = placeholder
+        self.render_fn = render_fn
+        self.interval = interval
+        self.last_push = 0.0
+
+    def update(self, force=False):
+        now = time.perf_counter()
+        if not force and now - self.last_push < self.interval:
+            return False
+        with self.placeholder.container():
+            self.render_fn()
+        self.last_push = now
+        return True
@@ -0,0 +1,289 @@
+import argparse
+import time
+
+import cv2
+import numpy as np
+import torch
+from ultralytics.engine.results import Results
+
+from crossing import parse_regions, points_in_polygon
+
+# Region-of-interest and tiled inference for high-resolution cameras.
+#
+# A RegionOfInterest is one or more polygons (fractions of the frame, same
+# 'x,y x,y ...; ...' text as the counting lines/zones; two points make a
+# rectangle). Only the bounding crop of the ROI goes to the model, with the
+# pixels outside the polygons blacked out, and detections whose centre falls
+# outside the ROI are dropped.
+#
+# In tiled mode the crop is split into overlapping tile x tile windows that
+# run as one batch at native resolution, so small two-wheelers far from the
+# camera are not shrunk away by the resize to imgsz. An extra pass over the
+# whole crop (full_pass) catches vehicles larger than a tile. Boxes are moved
+# back to frame coordinates and suppressed across tiles (tile_nms): the best
+# box is kept and same-class boxes from other tiles that overlap it (IoU) are
+# dropped. A box cut by an inner tile edge is a fragment of a vehicle another
+# window saw whole, so it is also dropped when it mostly lies inside a kept
+# box (intersection over the smaller box); whole boxes are preferred over
+# fragments. Boxes are never merged into a bigger one.
+#
+# RoiDetector(...) is called like model.predict() and returns ultralytics
+# Results in frame coordinates, so plotting, counting and tracking (through
+# tracking.BatchTracker(detector=...)) work unchanged.
+
+
+def parse_roi(text):
+    """ROI polygons from 'x,y x,y x,y; ...' text; two points are a rectangle's corners."""
+    polygons = []
+    for region in parse_regions(text):
+        if len(region) == 2:
+            (x0, y0), (x1, y1) = region
+            region = np.array([[x0, y0], [x1, y0], [x1, y1], [x0, y1]], dtype=np.float64)
+        polygons.append(region)
+    return polygons
+
+
+class RegionOfInterest:
+    """Mask and bounding crop of ROI polygons, computed once per frame size."""
+
+    def __init__(self, polygons, normalized=True):
+        self.polygons_src = [np.asarray(p, dtype=np.float64).reshape(-1, 2) for p in polygons]
+        self.normalized = normalized
+        if normalized and self.polygons_src:
+            self._check_bounds(np.concatenate(self.polygons_src), 1.0, 1.0)
+        self._shape = None
+        self.polygons = []
+        self.rect = None  # x0, y0, x1, y1 of the crop in the frame
+        self.mask = None  # uint8 0/255 over the crop, None when the polygons fill it
+
+    @staticmethod
+    def _check_bounds(pts, w, h):
+        lo, hi = pts.min(axis=0), pts.max(axis=0)
+        if hi[0] <= 0 or hi[1] <= 0 or lo[0] >= w or lo[1] >= h or (hi - lo).min() <= 0:
+            raise ValueError("ROI lies outside the frame")
+
+    def prepare(self, shape):
+        h, w = shape[:2]
+        if self._shape == (h, w):
+            return self
+        scale = np.array([w, h], dtype=np.float64) if self.normalized else np.ones(2)
+        self.polygons = [p * scale for p in self.polygons_src]
+        if not self.polygons:
+            self.rect, self.mask = (0, 0, w, h), None
+        else:
+            pts = np.concatenate(self.polygons)
+            self._check_bounds(pts, w, h)
+            # Parts outside the frame are clipped off, the crop is never empty
+            x0, y0 = np.floor(pts.min(axis=0)).astype(int).clip(0, [w - 1, h - 1])
+            x1, y1 = np.ceil(pts.max(axis=0)).astype(int).clip(0, [w, h])
+            self.rect = (int(x0), int(y0), max(int(x1), x0 + 1), max(int(y1), y0 + 1))
+            mask = np.zeros((self.rect[3] - y0, self.rect[2] - x0), dtype=np.uint8)
+            cv2.fillPoly(mask, [np.round(p - [x0, y0]).astype(np.int32) for p in self.polygons], 255)
+            self.mask = None if mask.all() else mask  # plain rectangles need no masking
+        self._shape = (h, w)
+        return self
+
+    def crop(self, frame):
+        # The ROI's bounding crop with everything outside the polygons set to black
+        self.prepare(frame.shape)
+        x0, y0, x1, y1 = self.rect
+        crop = frame[y0:y1, x0:x1]
+        if self.mask is not None:
+            crop = cv2.bitwise_and(crop, crop, mask=self.mask)
+        return crop
+
+    def contains(self, x, y):
+        # x, y in frame coordinates (arrays)
+        if not self.polygons:
+            return np.ones(len(x), dtype=bool)
+        inside = np.zeros(len(x), dtype=bool)
+        for polygon in self.polygons:
+            inside |= points_in_polygon(x, y, polygon)
+        return inside
+
+    def draw(self, img, color=(255, 200, 0)):
+        self.prepare(img.shape)
+        for polygon in self.polygons:
+            cv2.polylines(img, [np.round(polygon).astype(np.int32)], True, color, 2)
+        return img
+
+
+def tile_grid(width, height, tile, overlap=0.2):
+    """(x0, y0, x1, y1) windows of at most tile x tile covering width x height."""
+    step = max(1, int(tile * (1 - overlap)))
+
+    def starts(size):
+        if size <= tile:
+            return [0]
+        s = list(range(0, size - tile, step))
+        return s + [size - tile]  # last window flush with the edge
+
+    return [(x, y, min(x + tile, width), min(y + tile, height)) for y in starts(height) for x in starts(width)]
+
+
+def tile_nms(boxes, tile_ids, cut=None, iou_threshold=0.5, ios_threshold=0.6):
+    """Suppress duplicates of the same vehicle found by different tiles.
+
+    boxes is (N, 6) xyxy, conf, cls in frame coordinates, cut marks boxes that
+    touch an inner tile edge. Boxes are visited whole before cut, then by
+    score; a kept box drops same-class boxes from other tiles with IoU above
+    iou_threshold, and cut ones whose intersection is more than ios_threshold
+    of their own area. Kept boxes are returned unchanged.
+    """
+    if len(boxes) < 2:
+        return boxes
+    cut = np.zeros(len(boxes), dtype=bool) if cut is None else np.asarray(cut, dtype=bool)
+    order = np.lexsort((-boxes[:, 4], cut))
+    boxes, tile_ids, cut = boxes[order], tile_ids[order], cut[order]
+    x1, y1, x2, y2 = boxes[:, 0], boxes[:, 1], boxes[:, 2], boxes[:, 3]
+    area = np.maximum(x2 - x1, 0) * np.maximum(y2 - y1, 0)
+    suppressed = np.zeros(len(boxes), dtype=bool)
+    keep = []
+    for i in range(len(boxes)):
+        if suppressed[i]:
+            continue
+        keep.append(i)
+        inter = (np.clip(np.minimum(x2[i], x2) - np.maximum(x1[i], x1), 0, None) *
+                 np.clip(np.minimum(y2[i], y2) - np.maximum(y1[i], y1), 0, None))
+        iou = inter / np.maximum(area[i] + area - inter, 1e-9)
+        ios = inter / np.maximum(area, 1e-9)  # share of the other box inside this one
+        duplicate = (iou > iou_threshold) | (cut & (ios > ios_threshold))
+        suppressed |= (boxes[:, 5] == boxes[i, 5]) & (tile_ids != tile_ids[i]) & duplicate
+    return boxes[keep]
+
+
+class RoiDetector:
+    """model.predict() restricted to a ROI, optionally tiled.
+
+        detector = RoiDetector(model, roi=RegionOfInterest(parse_roi("0,0.4 1,1")), tile=640)
+        results = detector(frame, conf=0.25)  # Results in full-frame coordinates
+    """
+
+    def __init__(self, model, roi=None, tile=None, overlap=0.2, full_pass=True, iou_threshold=0.5,
+                 ios_threshold=0.6, edge_margin=2, **predict_kwargs):
+        self.model = model
+        self.roi = roi or RegionOfInterest([])
+        self.tile = int(tile) if tile else None
+        self.overlap = overlap
+        self.full_pass = full_pass
+        self.iou_threshold = iou_threshold
+        self.ios_threshold = ios_threshold
+        self.edge_margin = edge_margin  # px from an inner tile edge that count as cut
+        self.predict_kwargs = {"verbose": False, **predict_kwargs}
+        self.last_crops = 0  # model inputs used for the last call, per frame
+
+    @property
+    def mode(self):
+        name = "ROI" if self.roi.polygons_src else "full frame"
+        return f"{name}, {self.tile}px tiles" if self.tile else name
+
+    def _windows(self, crop):
+        h, w = crop.shape[:2]
+        if not self.tile or (w <= self.tile and h <= self.tile):
+            return [(0, 0, w, h)]
+        windows = tile_grid(w, h, self.tile, self.overlap)
+        return windows + [(0, 0, w, h)] if self.full_pass else windows
+
+    def split(self, frames):
+        """Model inputs (ROI crops / tiles) for a list of frames, and where each came from."""
+        inputs, owners = [], []
+        for i, frame in enumerate(frames):
+            crop = self.roi.crop(frame)
+            x0, y0 = self.roi.rect[:2]
+            ch, cw = crop.shape[:2]
+            for t, (wx0, wy0, wx1, wy1) in enumerate(self._windows(crop)):
+                inputs.append(crop[wy0:wy1, wx0:wx1])
+                # Window edges inside the crop, where a vehicle can be cut in two
+                inner = (wx0 > 0, wy0 > 0, wx1 < cw, wy1 < ch)
+                owners.append((i, t, x0 + wx0, y0 + wy0, wx1 - wx0, wy1 - wy0, inner))
+        self.last_crops = len(inputs) / max(1, len(frames))
+        return inputs, owners
+
+    def join(self, frames, owners, predictions):
+        """Results in frame coordinates from the predictions for split()'s inputs."""
+        per_frame = [([], [], []) for _ in frames]
+        m = self.edge_margin
+        for (i, t, ox, oy, ww, wh, inner), r in zip(owners, predictions):
+            data = r.boxes.data.cpu().numpy()[:, :6].copy()
+            cut = ((inner[0] & (data[:, 0] <= m)) | (inner[1] & (data[:, 1] <= m)) |
+                   (inner[2] & (data[:, 2] >= ww - m)) | (inner[3] & (data[:, 3] >= wh - m)))
+            data[:, [0, 2]] += ox
+            data[:, [1, 3]] += oy
+            per_frame[i][0].append(data)
+            per_frame[i][1].append(np.full(len(data), t))
+            per_frame[i][2].append(cut)
+
+        results = []
+        for frame, (parts, tiles, cuts) in zip(frames, per_frame):
+            boxes = np.concatenate(parts) if parts else np.zeros((0, 6), dtype=np.float32)
+            tile_ids = np.concatenate(tiles) if tiles else np.zeros(0, dtype=int)
+            if len(parts) > 1:
+                boxes = tile_nms(boxes, tile_ids, np.concatenate(cuts), self.iou_threshold, self.ios_threshold)
+            if len(boxes) and self.roi.polygons:
+                boxes = boxes[self.roi.contains((boxes[:, 0] + boxes[:, 2]) / 2, (boxes[:, 1] + boxes[:, 3]) / 2)]
+            results.append(Results(frame, path="", names=self.model.names,
+                                   boxes=torch.from_numpy(np.ascontiguousarray(boxes, dtype=np.float32))))
+        return results
+
+    def __call__(self, source, **predict_kwargs):
+        frames = source if isinstance(source, (list, tuple)) else [source]
+        frames = [np.asarray(f) for f in frames]
+        # Every window of every frame goes to the model as one batch
+        inputs, owners = self.split(frames)
+        predictions = self.model.predict(inputs, **{**self.predict_kwargs, **predict_kwargs})
+        return self.join(frames, owners, predictions)
+
+
+def compare_modes(model, frames, roi_text, tile, overlap=0.2, conf=0.25, imgsz=640):
+    """ms per frame, model inputs per frame and detections per frame for full-frame, ROI and tiled runs."""
+    roi = RegionOfInterest(parse_roi(roi_text)) if roi_text else None
+    modes = {
+        "full frame": RoiDetector(model, conf=conf, imgsz=imgsz),
+        "roi": RoiDetector(model, roi=roi, conf=conf, imgsz=imgsz),
+        "roi + tiles": RoiDetector(model, roi=roi, tile=tile, overlap=overlap, conf=conf, imgsz=imgsz),
+    }
+    report = {}
+    for name, detector in modes.items():
+        detector(frames[0])  # warm-up
+        t0 = time.perf_counter()
+        boxes = sum(len(detector(f)[0].boxes) for f in frames)
+        report[name] = {"ms_per_frame": (time.perf_counter() - t0) * 1000 / len(frames),
+                        "inputs_per_frame": detector.last_crops, "detections_per_frame": boxes / len(frames)}
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare full-frame, ROI and tiled inference cost")
+    parser.add_argument("video")
+    parser.add_argument("--model", default="yolov8n.pt")
+    parser.add_argument("--roi", default="", help="ROI polygons, e.g. '0,0.4 1,1' (fractions of the frame)")
+    parser.add_argument("--tile", type=int, default=640)
+    parser.add_argument("--overlap", type=float, default=0.2)
+    parser.add_argument("--imgsz", type=int, default=640)
+    parser.add_argument("--conf", type=float, default=0.25)
+    parser.add_argument("--frames", type=int, default=30)
+    args = parser.parse_args()
+
+    from ultralytics import YOLO
+
+    cap = cv2.VideoCapture(args.video)
+    frames = []
+    while len(frames) < args.frames:
+        ret, frame = cap.read()
+        if not ret:
+            break
+        frames.append(frame)
+    cap.release()
+    if not frames:
+        raise SystemExit(f"❌ Could not read frames from {args.video}")
+
+    h, w = frames[0].shape[:2]
+    print(f"🎞️ {len(frames)} frames of {w}x{h}, imgsz {args.imgsz}, tile {args.tile}")
+    report = compare_modes(YOLO(args.model), frames, args.roi, args.tile, args.overlap, args.conf, args.imgsz)
+    print(f"{'mode':<14} {'ms/frame':>9} {'inputs':>7} {'detections':>11}")
+    for name, r in report.items():
+        print(f"{name:<14} {r['ms_per_frame']:>9.1f} {r['inputs_per_frame']:>7.0f} {r['detections_per_frame']:>11.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,229 @@
+import hashlib
+import os
+import tempfile
+import threading
+
+# Spools uploaded videos to disk for cv2.VideoCapture.
+#
+# - Uploads are copied in chunks straight from the upload's buffer, never as
+#   one big bytes object.
+# - Files are named by content hash, so a rerun (or the same clip uploaded
+#   again) reuses the file already on disk instead of rewriting it.
+# - Writing happens on a background thread; for containers whose header
+#   comes first (fast-start MP4/MOV, MKV/WebM, AVI) decoding can start as
+#   soon as the first chunks are on disk.
+#
+# What this does not buy: Streamlit's UploadedFile already holds the whole
+# video in memory, so peak memory still grows with the video (the spool only
+# avoids a second copy of it). And the name needs the hash, so a new upload
+# is hashed end to end before its first byte is written; decoding overlaps
+# the disk write, not the upload or the hashing.
+# - Old spooled files are deleted, least recently used first, once the spool
+#   directory grows past its quota. Files still being written, or pinned by a
+#   reader (SpooledFile.acquire(), e.g. a running VideoPipeline), are never
+#   deleted.
+
+CHUNK_SIZE = 8 * 1024 * 1024
+DEFAULT_SPOOL_DIR = os.path.join(tempfile.gettempdir(), "traffic_spool")
+DEFAULT_QUOTA_MB = float(os.environ.get("TRAFFIC_SPOOL_MB", 4096))
+DONE_SUFFIX = ".done"
+
+
+def _chunks(upload, chunk_size=CHUNK_SIZE):
+    # Streamlit's UploadedFile is a BytesIO; getbuffer() slices are zero-copy
+    if hasattr(upload, "getbuffer"):
+        view = upload.getbuffer()
+        try:
+            for start in range(0, len(view), chunk_size):
+                yield view[start:start + chunk_size]
+        finally:
+            view.release()
+    else:
+        upload.seek(0)
+        while True:
+            chunk = upload.read(chunk_size)
+            if not chunk:
+                break
+            yield chunk
+
+
+def content_hash(upload):
+    h = hashlib.blake2b(digest_size=16)
+    for chunk in _chunks(upload):
+        h.update(chunk)
+    return h.hexdigest()
+
+
+def header_first(head):
+    """True if the container's header precedes the media data.
+
+    For MP4/MOV that means the 'moov' box comes before 'mdat' (fast-start).
+    Matroska/WebM and AVI always start with their header.
+    """
+    if head[:4] == b"\x1a\x45\xdf\xa3" or head[:4] == b"RIFF":
+        return True
+    pos = 0
+    while pos + 8 <= len(head):
+        size = int.from_bytes(head[pos:pos + 4], "big")
+        kind = head[pos + 4:pos + 8]
+        if kind == b"moov":
+            return True
+        if kind == b"mdat":
+            return False
+        if size == 1 and pos + 16 <= len(head):
+            size = int.from_bytes(head[pos + 8:pos + 16], "big")
+        if size < 8:
+            return False
+        pos += size
+    return False
+
+
+class SpooledFile:
+    """A spooled upload. `path` can be opened once `ready` is set; `complete`
+    is set when the whole file is on disk."""
+
+    def __init__(self, path, size, spool=None):
+        self.path = path
+        self.size = size
+        self.spool = spool
+        self.written = 0
+        self.ready = threading.Event()
+        self.complete = threading.Event()
+        self.error = None
+
+    def acquire(self):
+        # Keeps the file out of eviction until the matching release()
+        if self.spool is not None:
+            self.spool.pin(self.path)
+
+    def release(self):
+        if self.spool is not None:
+            self.spool.unpin(self.path)
+
+    def wait_ready(self, timeout=None):
+        self.ready.wait(timeout)
+        if self.error is not None:
+            raise self.error
+        return self
+
+
+class UploadSpool:
+    def __init__(self, directory=DEFAULT_SPOOL_DIR, quota_mb=DEFAULT_QUOTA_MB, ready_bytes=CHUNK_SIZE):
+        self.directory = directory
+        self.quota_bytes = quota_mb * 1e6
+        self.ready_bytes = ready_bytes
+        os.makedirs(directory, exist_ok=True)
+        self._lock = threading.Lock()
+        self._by_upload = {}  # upload file_id -> SpooledFile, skips re-hashing on reruns
+        self._active = {}  # path -> SpooledFile still being written
+        self._pins = {}  # path -> readers using the file
+
+    def add(self, upload):
+        """SpooledFile for an upload; hashes all of it first, then writes it in the background."""
+        upload_key = getattr(upload, "file_id", None) or (getattr(upload, "name", None), getattr(upload, "size", None))
+        with self._lock:
+            spooled = self._by_upload.get(upload_key)
+            if spooled is not None and os.path.exists(spooled.path):
+                os.utime(spooled.path)
+                return spooled
+
+        name = getattr(upload, "name", "") or ""
+        ext = os.path.splitext(name)[1].lower() or ".bin"
+        path = os.path.join(self.directory, content_hash(upload) + ext)
+
+        with self._lock:
+            spooled = self._active.get(path)
+            if spooled is None:
+                if os.path.exists(path + DONE_SUFFIX) and os.path.exists(path):
+                    # Same content spooled before, maybe by another session
+                    os.utime(path)
+                    spooled = SpooledFile(path, os.path.getsize(path), self)
+                    spooled.written = spooled.size
+                    spooled.ready.set()
+                    spooled.complete.set()
+                else:
+                    spooled = SpooledFile(path, getattr(upload, "size", None), self)
+                    self._active[path] = spooled
+                    threading.Thread(target=self._write, args=(upload, spooled), daemon=True).start()
+            self._by_upload[upload_key] = spooled
+        return spooled
+
+    def _write(self, upload, spooled):
+        try:
+            with open(spooled.path, "wb") as f:
+                head = b""
+                for chunk in _chunks(upload):
+                    f.write(chunk)
+                    spooled.written += len(chunk)
+                    if not spooled.ready.is_set():
+                        if len(head) < 64 * 1024:
+                            head += bytes(chunk[:64 * 1024])
+                        if spooled.written >= self.ready_bytes and header_first(head):
+                            f.flush()
+                            spooled.ready.set()
+            open(spooled.path + DONE_SUFFIX, "w").close()
+        except Exception as e:
+            spooled.error = e
+        finally:
+            with self._lock:
+                self._active.pop(spooled.path, None)
+            spooled.complete.set()
+            spooled.ready.set()
+        self.evict(keep=spooled.path)
+
+    def pin(self, path):
+        with self._lock:
+            self._pins[path] = self._pins.get(path, 0) + 1
+
+    def unpin(self, path):
+        with self._lock:
+            n = self._pins.pop(path, 0) - 1
+            if n > 0:
+                self._pins[path] = n
+
+    def evict(self, keep=None):
+        """Delete least recently used spooled files until under quota."""
+        with self._lock:
+            in_use = set(self._active) | set(self._pins)
+        files, total = [], 0
+        for name in os.listdir(self.directory):
+            path = os.path.join(self.directory, name)
+            if name.endswith(DONE_SUFFIX):
+                continue
+            try:
+                st = os.stat(path)
+            except FileNotFoundError:
+                continue
+            total += st.st_size  # files in use still take up the quota
+            if path not in in_use and path != keep:
+                files.append((st.st_mtime, st.st_size, path))
+        for _, size, path in sorted(files):
+            if total <= self.quota_bytes:
+                break
+            try:
+                os.remove(path)
+                if os.path.exists(path + DONE_SUFFIX):
+                    os.remove(path + DONE_SUFFIX)
+            except OSError:
+                continue  # still open by a decoder on Windows, try next time
+            total -= size
+            with self._lock:
+                for key, spooled in list(self._by_upload.items()):
+                    if spooled.path == path:
+                        del self._by_upload[key]
+
+    def usage(self):
+        paths = [os.path.join(self.directory, n) for n in os.listdir(self.directory) if not n.endswith(DONE_SUFFIX)]
+        return len(paths), sum(os.path.getsize(p) for p in paths if os.path.exists(p))
+
+
+_spool = None
+_spool_lock = threading.Lock()
+
+
+def get_spool():
+    global _spool
+    with _spool_lock:
+        if _spool is None:
+            _spool = UploadSpool()
+        return _spool
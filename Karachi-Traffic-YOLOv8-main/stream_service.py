@@ -0,0 +1,371 @@
+import argparse
+import json
+import multiprocessing as mp
+import os
+import queue
+import re
+import signal
+import time
+
+import yaml
+
+from camera import LatestFrameCapture
+from count_store import CountRecorder, CountStore
+from counting import TrackCounter
+from crossing import CrossingCounter, parse_regions
+from metrics import Metrics, serve_prometheus
+from roi import RegionOfInterest, RoiDetector, parse_roi
+from tracking import DEFAULT_TRACKER, advance_tracker, create_tracker, update_tracker
+
+# Headless counting service for many cameras at once.
+#
+#   python stream_service.py streams.yaml
+#
+# streams.yaml:
+#
+#   model: yolov8n.pt
+#   backend: pytorch          # or onnx / onnx-int8
+#   conf: 0.25
+#   imgsz: 640
+#   batch_size: 8             # frames from different streams per model call
+#   workers: 2                # processes, each with its own model and share of the streams
+#   publish:
+#     jsonl: counts.jsonl     # one line per stream every `interval` seconds
+#     port: 9110              # Prometheus text on http://<host>:9110/metrics
+#     db: traffic_counts.db   # counts history with minute/hour/day rollups (count_store.py)
+#     interval: 5
+#   streams:
+#     - name: silk_board
+#       source: rtsp://10.0.0.12/stream1
+#       fps: 5                # processing target; omit for as fast as possible
+#     - name: hebbal
+#       source: recordings/hebbal.mp4   # files and image folders stand in for cameras
+#       loop: true
+#       lines: "0,0.6 1,0.6"  # line / zone crossing counts instead of unique tracks
+#       roi: "0,0.4 1,1"
+#
+# Each stream has its own capture thread (newest frame only, see camera.py),
+# tracker and counter. A worker's loop picks the streams whose next frame is
+# due, earliest deadline first, reads their newest frames and detects them
+# in one batch, then feeds every stream's tracker its own result. When the
+# model can't keep up, deadlines slip for all streams alike instead of the
+# fastest camera starving the others. Network cameras that drop are
+# reconnected.
+
+DEFAULT_BATCH_SIZE = 8
+DEFAULT_INTERVAL = 5.0
+DEFAULT_STATUS_S = 30.0  # console status table
+RECONNECT_S = 5.0
+IDLE_WAIT_S = 0.002
+
+
+def load_config(path):
+    with open(path) as f:
+        config = yaml.safe_load(f)  # JSON is valid YAML too
+    streams = config.get("streams") or []
+    if not streams:
+        raise ValueError(f"No streams in {path}")
+    names = set()
+    for i, s in enumerate(streams):
+        if "source" not in s:
+            raise ValueError(f"Stream {i + 1} has no source")
+        s.setdefault("name", f"stream{i + 1}")
+        if s["name"] in names:
+            raise ValueError(f"Duplicate stream name {s['name']!r}")
+        names.add(s["name"])
+    return config
+
+
+def assign_streams(streams, workers):
+    # Greedy balance on the FPS targets (as-fast-as-possible streams weigh like 30 FPS)
+    loads = [0.0] * workers
+    groups = [[] for _ in range(workers)]
+    for s in sorted(streams, key=lambda s: -(s.get("fps") or 30)):
+        w = loads.index(min(loads))
+        groups[w].append(s)
+        loads[w] += s.get("fps") or 30
+    return [g for g in groups if g]
+
+
+def _slug(name):
+    return re.sub(r"[^a-zA-Z0-9_]", "_", str(name)).lower()
+
+
+class Stream:
+    """Capture, tracker, counter and pacing of one camera."""
+
+    def __init__(self, cfg, model, tracker_cfg=DEFAULT_TRACKER):
+        self.name = cfg["name"]
+        self.source = str(cfg["source"])
+        self.loop = bool(cfg.get("loop", False))
+        self.interval = 1.0 / cfg["fps"] if cfg.get("fps") else 0.0
+        self.detector = RoiDetector(model, roi=RegionOfInterest(parse_roi(cfg["roi"])) if cfg.get("roi") else None,
+                                    tile=cfg.get("tile"), overlap=cfg.get("tile_overlap", 0.2))
+        self.tracker = create_tracker(tracker_cfg)
+        if cfg.get("lines"):
+            regions = parse_regions(cfg["lines"])
+            self.counter = CrossingCounter(lines=[r for r in regions if len(r) == 2],
+                                           zones=[r for r in regions if len(r) >= 3], num_classes=len(model.names))
+        else:
+            self.counter = TrackCounter(len(model.names))
+
+        self.capture = None
+        self.status = "starting"
+        self.retry_at = 0.0
+        self.next_due = 0.0
+        self.last_index = 0
+        self.frames = 0
+        self.skipped = 0
+        self.latency_s = None
+        self.t_start = time.perf_counter()
+
+    def connect(self, now):
+        if self.capture is not None:
+            self.capture.stop()
+        try:
+            self.capture = LatestFrameCapture(self.source, loop=self.loop).start()
+            self.status = "running"
+            self.last_index = 0
+        except IOError:
+            self.capture = None
+            self.status = "unavailable"
+            self.retry_at = now + RECONNECT_S
+
+    def poll(self, now):
+        # Newest unseen frame, or None; restarts network cameras that went away
+        if self.status == "done":
+            return None
+        if self.capture is None:
+            if now >= self.retry_at:
+                self.connect(now)
+            return None
+        item = self.capture.read(timeout=0)
+        if item is None and self.capture.finished:
+            if self.capture.live or self.capture.error is not None:
+                self.status = "reconnecting"
+                self.capture.stop()
+                self.capture, self.retry_at = None, now + RECONNECT_S
+            else:
+                self.status = "done"  # file / folder played to the end
+        return item
+
+    def processed(self, result, index, captured_at, now):
+        skipped = index - self.last_index - 1
+        advance_tracker(self.tracker, skipped)
+        self.last_index = index
+        self.counter.update_from_results([update_tracker(self.tracker, result)], skipped=max(0, skipped))
+        self.frames += 1
+        self.skipped += max(0, skipped)
+        latency = now - captured_at
+        self.latency_s = latency if self.latency_s is None else 0.8 * self.latency_s + 0.2 * latency
+        # Credit for at most one missed frame, a starved stream doesn't burst afterwards
+        self.next_due = max(self.next_due + self.interval, now - self.interval)
+
+    def report(self, names):
+        elapsed = time.perf_counter() - self.t_start
+        return {
+            "stream": self.name,
+            "time": time.time(),
+            "status": self.status,
+            "counts": self.counter.counts(names),
+            "frames": self.frames,
+            "fps": self.frames / elapsed if elapsed > 0 else 0.0,
+            "target_fps": 1.0 / self.interval if self.interval else None,
+            "skipped": self.skipped,
+            "latency_ms": (self.latency_s or 0.0) * 1000,
+        }
+
+    def stop(self):
+        if self.capture is not None:
+            self.capture.stop()
+
+
+def pick_batch(streams, now, batch_size):
+    """Newest frames of the due streams, earliest deadline first, at most batch_size."""
+    batch = []
+    for s in sorted((s for s in streams if s.next_due <= now and s.status != "done"), key=lambda s: s.next_due):
+        item = s.poll(now)
+        if item is not None:
+            batch.append((s, item))
+            if len(batch) == batch_size:
+                break
+    return batch
+
+
+def run_worker(config, stream_cfgs, out_q, stop, threads=0):
+    """One process: one model, the given streams, counts sent to out_q every interval."""
+    import torch
+
+    from model_registry import ModelRegistry
+
+    signal.signal(signal.SIGINT, signal.SIG_IGN)  # the parent decides when to stop
+    if threads:
+        torch.set_num_threads(threads)
+    imgsz = config.get("imgsz", 640)
+    model = ModelRegistry(warmup_imgsz=imgsz).get(config.get("model", "yolov8n.pt"), config.get("backend", "pytorch"))
+    predict_kwargs = {"conf": config.get("conf", 0.25), "imgsz": imgsz, "verbose": False}
+    batch_size = int(config.get("batch_size", DEFAULT_BATCH_SIZE))
+    interval = float(config.get("publish", {}).get("interval", DEFAULT_INTERVAL))
+
+    streams = [Stream(cfg, model, config.get("tracker", DEFAULT_TRACKER)) for cfg in stream_cfgs]
+    now = time.perf_counter()
+    for s in streams:
+        s.connect(now)
+        s.next_due = now
+    batches = frames_in_batches = 0
+    busy = 0.0
+    next_publish = now + interval
+
+    def publish():
+        out_q.put({"worker": os.getpid(), "batches": batches, "mean_batch": frames_in_batches / max(1, batches),
+                   "busy_s": busy, "streams": [s.report(model.names) for s in streams]})
+
+    try:
+        while not stop.is_set() and any(s.status != "done" for s in streams):
+            now = time.perf_counter()
+            batch = pick_batch(streams, now, batch_size)
+            if batch:
+                t0 = time.perf_counter()
+                # Crops / tiles of every picked stream go through the model in one call
+                inputs, spans = [], []
+                for s, (frame, _, _) in batch:
+                    x, owners = s.detector.split([frame])
+                    spans.append((len(inputs), len(x), owners))
+                    inputs.extend(x)
+                predictions = model.predict(inputs, **predict_kwargs)
+                done = time.perf_counter()
+                for (s, (frame, captured_at, index)), (start, n, owners) in zip(batch, spans):
+                    result = s.detector.join([frame], owners, predictions[start:start + n])[0]
+                    s.processed(result, index, captured_at, done)
+                busy += time.perf_counter() - t0
+                batches += 1
+                frames_in_batches += len(batch)
+            else:
+                pending = [s.next_due for s in streams if s.status != "done"]
+                stop.wait(min(max(min(pending) - now, IDLE_WAIT_S), 0.05) if pending else IDLE_WAIT_S)
+            if time.perf_counter() >= next_publish:
+                publish()
+                next_publish += interval
+    finally:
+        for s in streams:
+            s.stop()
+        publish()
+        out_q.put(None)  # this worker is finished
+
+
+class Publisher:
+    """Latest report per stream, appended to JSONL, exposed as Prometheus gauges and stored."""
+
+    def __init__(self, jsonl=None, port=None, db=None):
+        self.jsonl = jsonl
+        self.latest = {}
+        self.workers = {}
+        self.metrics = Metrics()
+        self.server = serve_prometheus(self.metrics, int(port)) if port else None
+        self.store = CountStore(db) if db else None
+        self.recorders = {}
+
+    def publish(self, message):
+        self.workers[message["worker"]] = message
+        lines = []
+        for r in message["streams"]:
+            self.latest[r["stream"]] = r
+            lines.append(json.dumps(r))
+            if self.store is not None:
+                recorder = self.recorders.get(r["stream"])
+                if recorder is None:
+                    recorder = self.recorders[r["stream"]] = CountRecorder(self.store, f"stream:{r['stream']}")
+                recorder.update(r["counts"], ts=r["time"])
+            for name, value in r["counts"].items():
+                self.metrics.set(r["stream"], f"vehicles_{_slug(name)}", value)
+            self.metrics.set(r["stream"], "processing_fps", round(r["fps"], 3))
+            self.metrics.set(r["stream"], "frames", r["frames"])
+            self.metrics.set(r["stream"], "frames_skipped", r["skipped"])
+            self.metrics.set(r["stream"], "latency_seconds", r["latency_ms"] / 1000)
+        if self.jsonl and lines:
+            with open(self.jsonl, "a") as f:
+                f.write("\n".join(lines) + "\n")
+
+    def print_table(self):
+        print(f"\n{'stream':<18} {'status':<12} {'fps':>6} {'target':>7} {'skipped':>8} {'latency':>8}  counts")
+        for name, r in sorted(self.latest.items()):
+            target = f"{r['target_fps']:.0f}" if r["target_fps"] else "max"
+            counts = ", ".join(f"{k}: {v}" for k, v in r["counts"].items()) or "-"
+            print(f"{name:<18} {r['status']:<12} {r['fps']:>6.1f} {target:>7} {r['skipped']:>8} "
+                  f"{r['latency_ms']:>6.0f}ms  {counts}")
+        for pid, w in sorted(self.workers.items()):
+            print(f"   worker {pid}: {w['batches']} batches, {w['mean_batch']:.1f} frames/batch, busy {w['busy_s']:.0f}s")
+
+
+def serve(config, workers=None, duration=None, status_every=DEFAULT_STATUS_S):
+    workers = int(workers or config.get("workers", 1))
+    groups = assign_streams(config["streams"], max(1, workers))
+    threads = max(1, (os.cpu_count() or 1) // len(groups))
+    publish_cfg = config.get("publish", {})
+    publisher = Publisher(publish_cfg.get("jsonl"), publish_cfg.get("port"), publish_cfg.get("db"))
+
+    ctx = mp.get_context("spawn")
+    out_q, stop = ctx.Queue(), ctx.Event()
+    procs = [ctx.Process(target=run_worker, args=(config, group, out_q, stop, threads), daemon=True)
+             for group in groups]
+    for p in procs:
+        p.start()
+    print(f"🚦 {len(config['streams'])} streams on {len(procs)} worker(s), batch size "
+          f"{config.get('batch_size', DEFAULT_BATCH_SIZE)}. Ctrl+C to stop.")
+
+    deadline = time.time() + duration if duration else None
+    # Every worker reports every `interval`, so the table is reprinted on a
+    # clock of its own instead of once per message
+    next_status = time.time() + status_every if status_every else None
+    running = len(procs)
+    try:
+        while running:
+            if deadline and time.time() >= deadline:
+                stop.set()
+            try:
+                message = out_q.get(timeout=1.0)
+            except queue.Empty:
+                if not any(p.is_alive() for p in procs):
+                    break
+                continue
+            if message is None:
+                running -= 1
+                continue
+            publisher.publish(message)
+            if next_status and time.time() >= next_status:
+                publisher.print_table()
+                next_status = time.time() + status_every
+    except KeyboardInterrupt:
+        print("\n🛑 Stopping...")
+        stop.set()
+        # Collect the final reports
+        while running:
+            try:
+                message = out_q.get(timeout=10.0)
+            except queue.Empty:
+                break
+            if message is None:
+                running -= 1
+            else:
+                publisher.publish(message)
+    publisher.print_table()
+    for p in procs:
+        p.join(10)
+    if publisher.store is not None:
+        publisher.store.close()
+    return publisher.latest
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Count vehicles on many camera streams with shared, batched models")
+    parser.add_argument("config", help="YAML / JSON stream config")
+    parser.add_argument("--workers", type=int, help="Worker processes (overrides the config)")
+    parser.add_argument("--duration", type=float, help="Stop after this many seconds")
+    parser.add_argument("--status", type=float, default=DEFAULT_STATUS_S,
+                        help="Print the status table every N seconds (0: only when stopping)")
+    args = parser.parse_args()
+    serve(load_config(args.config), args.workers, args.duration, args.status)
+
+
+if __name__ == "__main__":
+    main()
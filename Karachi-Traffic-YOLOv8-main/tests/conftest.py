@@ -0,0 +1,21 @@
+import cv2
+import numpy as np
+import pytest
+
+FRAMES = 20
+
+
+def frame_number(frame):
+    # Frame i of the synthetic clip is a flat grey of 10 * i
+    return int(round(float(frame.mean()) / 10))
+
+
+@pytest.fixture
+def video(tmp_path):
+    """Path of a small MJPG clip whose frames encode their own number (see frame_number)."""
+    path = str(tmp_path / "clip.avi")
+    writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*"MJPG"), 25, (64, 48))
+    for i in range(1, FRAMES + 1):
+        writer.write(np.full((48, 64, 3), 10 * i, dtype=np.uint8))
+    writer.release()
+    return path
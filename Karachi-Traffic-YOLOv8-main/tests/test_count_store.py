@@ -0,0 +1,63 @@
+import time
+
+import pytest
+
+from count_store import CountRecorder, CountStore, bucket
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = CountStore(str(tmp_path / "counts.db"), flush_interval=3600)  # flushed by the tests only
+    yield store
+    store.close()
+
+
+def hour_start():
+    return bucket(time.time(), "hour") - 86400  # yesterday, clear of the raw retention cut
+
+
+def test_flush_adds_to_existing_rows(store):
+    t = hour_start()
+    store.add("cam", {"car": 2, "bus": 1}, ts=t)
+    store.flush()
+    store.add("cam", {"car": 3, "truck": 0}, ts=t + 5)  # same raw bucket
+    store.flush()
+    assert store.query(t, t + 60, "raw") == [(t, "cam", "bus", 1), (t, "cam", "car", 5)]
+
+
+def test_rollups(store):
+    t = hour_start()
+    store.add("cam", {"car": 1}, ts=t + 10)
+    store.add("cam", {"car": 2}, ts=t + 50)
+    store.add("cam", {"car": 4}, ts=t + 70)
+    store.add("gate", {"bus": 1}, ts=t + 3599)
+    store.flush()
+    assert store.query(t, t + 3600, "minute", ["cam"]) == [(t, "cam", "car", 3), (t + 60, "cam", "car", 4)]
+    assert store.query(t, t + 3600, "hour") == [(t, "cam", "car", 7), (t, "gate", "bus", 1)]
+    day = bucket(t, "day")
+    assert store.totals(day, day + 1, "day") == {"car": 7, "bus": 1}
+    assert store.sources() == ["cam", "gate"]
+    assert store.csv(t, t + 3600, "hour").splitlines()[0] == "Time,Source,Vehicle Type,Count"
+
+
+def test_replace_source(store):
+    t = hour_start()
+    store.add("video:abc", {"car": 5}, ts=t)
+    store.add("cam", {"car": 1}, ts=t)
+    store.flush()
+    store.add("video:abc", {"car": 2}, ts=t)  # still queued
+    store.replace_source("video:abc")
+    store.add("video:abc", {"car": 4}, ts=t)  # the new run
+    store.flush()
+    assert store.totals(t, t + 3600, "hour", ["video:abc"]) == {"car": 4}
+    assert store.totals(t, t + 3600, "hour", ["cam"]) == {"car": 1}
+
+
+def test_recorder_turns_totals_into_increments(store):
+    t = hour_start()
+    recorder = CountRecorder(store, "cam")
+    recorder.update({"car": 1}, ts=t)
+    recorder.update({"car": 1}, ts=t)
+    recorder.update({"car": 3, "bus": 1}, ts=t)
+    store.flush()
+    assert store.totals(t, t + 3600, "hour") == {"car": 3, "bus": 1}
@@ -0,0 +1,71 @@
+import numpy as np
+
+from counting import TrackCounter, TrackTable
+
+NAMES = {0: "car", 1: "bus", 2: "truck"}
+
+
+def test_track_counted_once():
+    counter = TrackCounter(len(NAMES))
+    counter.update([1, 2], [0, 1])
+    counter.update([1, 2, 3], [0, 1, 0])
+    counter.update([3], [0])
+    assert counter.counts(NAMES) == {"car": 2, "bus": 1}
+    assert counter.active_tracks() == 3
+
+
+def test_empty_frame_advances():
+    counter = TrackCounter(len(NAMES), ttl_frames=1)
+    counter.update([1], [2])
+    counter.update([], [])
+    counter.update([], [])
+    assert counter.active_tracks() == 0
+    assert counter.counts(NAMES) == {"truck": 1}
+
+
+def test_reset():
+    counter = TrackCounter(len(NAMES))
+    counter.update([1], [0])
+    counter.reset()
+    assert counter.counts(NAMES) == {}
+    counter.update([1], [0])
+    assert counter.counts(NAMES) == {"car": 1}
+
+
+def test_ttl_expiry_frees_slot():
+    table = TrackTable(capacity=4, ttl_frames=2)
+    table.advance()
+    table.update(np.array([1]))
+    table.advance(3)  # not seen for 3 frames > ttl
+    assert table.active_tracks() == 0
+    # 5 lands on the stale slot of 1 and takes it over without growing
+    slots, is_new, _ = table.update(np.array([5]))
+    assert table.capacity == 4
+    assert slots.tolist() == [1] and is_new.tolist() == [True]
+    assert table.active_tracks() == 1
+
+
+def test_live_slot_collision_grows():
+    table = TrackTable(capacity=4, ttl_frames=2)
+    table.advance()
+    table.update(np.array([1]))
+    table.advance()
+    _, is_new, _ = table.update(np.array([5]))
+    assert table.capacity == 8
+    assert is_new.tolist() == [True]
+    assert table.active_tracks() == 2
+    # 1 kept its slot and is not new when it shows up again
+    table.advance()
+    _, is_new, _ = table.update(np.array([1]))
+    assert is_new.tolist() == [False]
+
+
+
+def test_skipped_frames_count_towards_ttl():
+    # ttl is in source frames: 2 processed frames with 4 skipped before each are 10 frames
+    counter = TrackCounter(len(NAMES), ttl_frames=8)
+    counter.update([1], [0])
+    counter.update([], [], skipped=4)
+    assert counter.active_tracks() == 1
+    counter.update([], [], skipped=4)
+    assert counter.active_tracks() == 0
@@ -0,0 +1,103 @@
+import numpy as np
+
+from counting import TrackTable
+from crossing import CrossingCounter, points_in_polygon
+
+NAMES = {0: "car", 1: "bus"}
+
+
+def box(cx, cy, size=10):
+    return [cx - size / 2, cy - size / 2, cx + size / 2, cy + size / 2]
+
+
+def run(counter, frames):
+    # frames: list of [(track id, class, cx, cy), ...]
+    for tracks in frames:
+        ids = [t[0] for t in tracks]
+        cls = [t[1] for t in tracks]
+        xyxy = [box(t[2], t[3]) for t in tracks]
+        counter.update(ids, cls, xyxy, (100, 200))
+    return counter.counts(NAMES)
+
+
+def test_line_direction_left_to_right():
+    # Drawn left to right: top -> bottom is "in"
+    counter = CrossingCounter(lines=[[(0, 50), (100, 50)]], num_classes=2, normalized=False)
+    counts = run(counter, [
+        [(1, 0, 50, 40), (2, 1, 60, 70)],
+        [(1, 0, 50, 60), (2, 1, 60, 45)],
+    ])
+    assert counts == {"car (Line 1 in)": 1, "bus (Line 1 out)": 1}
+
+
+def test_line_direction_follows_drawing_order():
+    counter = CrossingCounter(lines=[[(100, 50), (0, 50)]], num_classes=2, normalized=False)
+    counts = run(counter, [[(1, 0, 50, 40)], [(1, 0, 50, 60)]])
+    assert counts == {"car (Line 1 out)": 1}
+
+
+def test_line_is_a_segment():
+    # Crossing y=50 beyond the segment's end doesn't count
+    counter = CrossingCounter(lines=[[(0, 50), (100, 50)]], num_classes=2, normalized=False)
+    assert run(counter, [[(1, 0, 150, 40)], [(1, 0, 150, 60)]]) == {}
+
+
+def test_line_needs_previous_centroid():
+    # A track first seen past the line has no step to cross it
+    counter = CrossingCounter(lines=[[(0, 50), (100, 50)]], num_classes=2, normalized=False)
+    assert run(counter, [[(1, 0, 50, 40)], [(2, 0, 50, 60)]]) == {}
+
+
+def test_line_crossing_back_and_forth():
+    counter = CrossingCounter(lines=[[(0, 50), (100, 50)]], num_classes=2, normalized=False)
+    counts = run(counter, [[(1, 0, 50, 40)], [(1, 0, 50, 60)], [(1, 0, 50, 40)]])
+    assert counts == {"car (Line 1 in)": 1, "car (Line 1 out)": 1}
+
+
+def test_normalized_line_scaled_to_frame():
+    counter = CrossingCounter(lines=[[(0, 0.5), (1, 0.5)]], num_classes=2)
+    # frame is 200 wide, 100 high: the line sits at y=50
+    counts = run(counter, [[(1, 0, 150, 40)], [(1, 0, 150, 60)]])
+    assert counts == {"car (Line 1 in)": 1}
+
+
+def test_skipped_frames_expire_the_previous_centroid():
+    # 40 skipped frames exceed the 30-frame ttl: the old centroid is stale, not a step across the line
+    counter = CrossingCounter(lines=[[(0, 50), (100, 50)]], num_classes=2, normalized=False)
+    counter.update([1], [0], [box(50, 40)], (100, 200))
+    counter.update([1], [0], [box(50, 60)], (100, 200), skipped=40)
+    assert counter.counts(NAMES) == {}
+    counter.update([2], [0], [box(50, 40)], (100, 200))
+    counter.update([2], [0], [box(50, 60)], (100, 200), skipped=20)
+    assert counter.counts(NAMES) == {"car (Line 1 in)": 1}
+
+
+def test_zone_enter_and_leave():
+    zone = [(20, 20), (80, 20), (80, 80), (20, 80)]
+    counter = CrossingCounter(zones=[zone], num_classes=2, normalized=False)
+    counts = run(counter, [[(1, 1, 10, 50)], [(1, 1, 50, 50)], [(1, 1, 50, 60)], [(1, 1, 90, 50)]])
+    assert counts == {"bus (Zone 1 in)": 1, "bus (Zone 1 out)": 1}
+
+
+def test_zone_ignores_tracks_first_seen_inside():
+    zone = [(20, 20), (80, 20), (80, 80), (20, 80)]
+    counter = CrossingCounter(zones=[zone], num_classes=2, normalized=False)
+    assert run(counter, [[(1, 0, 50, 50)], [(1, 0, 55, 50)]]) == {}
+
+
+def test_points_in_polygon():
+    triangle = np.array([[0, 0], [10, 0], [0, 10]], dtype=np.float64)
+    inside = points_in_polygon(np.array([1.0, 6.0, -1.0]), np.array([1.0, 6.0, 1.0]), triangle)
+    assert inside.tolist() == [True, False, False]
+
+
+def test_was_live_follows_ttl():
+    table = TrackTable(capacity=8, ttl_frames=1, columns={"x": (np.float64, np.nan, ())})
+    table.advance()
+    table.update(np.array([3]))
+    table.advance()
+    _, _, was_live = table.update(np.array([3]))
+    assert was_live.tolist() == [True]
+    table.advance(3)
+    _, _, was_live = table.update(np.array([3]))
+    assert was_live.tolist() == [False]
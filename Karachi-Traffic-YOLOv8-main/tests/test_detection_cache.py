@@ -0,0 +1,126 @@
+import numpy as np
+
+from detection_cache import (CONF_FLOOR, FLOOR_MAX_DET, MAX_DET, ClipDetections, DetectionCache, ImageDetections,
+                             RecordingDetector, ReplayDetector, ReplaySchedule, filter_boxes, make_results,
+                             truncation)
+
+NAMES = {0: "car", 1: "bus"}
+# x1, y1, x2, y2, conf, cls
+BOXES = np.array([
+    [0, 0, 10, 10, 0.90, 0],
+    [20, 20, 30, 30, 0.40, 1],
+    [40, 40, 50, 50, 0.10, 0],
+    [60, 60, 70, 70, 0.05, 1],
+], dtype=np.float32)
+
+
+def image_entry(side=10):
+    return ImageDetections(np.zeros((side, side, 3), dtype=np.uint8), BOXES[:0])
+
+
+def test_filter_boxes_keeps_floor():
+    assert len(filter_boxes(BOXES, CONF_FLOOR)) == 4
+    assert filter_boxes(BOXES, 0.4)[:, 4].tolist() == [np.float32(0.9), np.float32(0.4)]
+    assert len(filter_boxes(BOXES, 0.95)) == 0
+
+
+def test_filter_boxes_caps_at_max_det():
+    boxes = np.zeros((MAX_DET + 10, 6), dtype=np.float32)
+    boxes[:, 4] = np.linspace(0.1, 0.9, len(boxes))
+    kept = filter_boxes(boxes, 0.1)
+    assert len(kept) == MAX_DET
+    assert kept[:, 4].min() == np.sort(boxes[:, 4])[10]
+
+
+def crowded(n=FLOOR_MAX_DET):
+    boxes = np.zeros((n, 6), dtype=np.float32)
+    boxes[:, 4] = np.linspace(0.3, 0.9, n)
+    return boxes
+
+
+def test_truncated_floor_run_covers_only_above_cut():
+    assert truncation(BOXES) is None
+    entry = ImageDetections(np.zeros((10, 10, 3), dtype=np.uint8), crowded())
+    assert entry.cut == np.float32(0.3)
+    assert entry.covers(0.5) and not entry.covers(0.3) and not entry.covers(0.25)
+    assert not ImageDetections(np.zeros((10, 10, 3), dtype=np.uint8), BOXES).covers(CONF_FLOOR / 2)
+    clip = ClipDetections([1, 2], [0, 0], [BOXES, crowded()])
+    assert clip.covers(0.5) and not clip.covers(0.25)
+
+
+def test_cache_evicts_least_recently_used():
+    entry = image_entry()  # 300 bytes
+    cache = DetectionCache(max_memory_mb=700 / 1e6)
+    cache.put("a", entry)
+    cache.put("b", image_entry())
+    assert cache.get("a") is entry  # a is now the most recent
+    cache.put("c", image_entry())
+    assert cache.get("b") is None
+    assert cache.get("a") is entry and cache.get("c") is not None
+    assert cache.stats()["evictions"] == 1
+    assert cache.nbytes == 600
+
+
+def test_cache_rejects_oversized_entry():
+    cache = DetectionCache(max_memory_mb=700 / 1e6)
+    cache.put("a", image_entry())
+    assert not cache.put("big", image_entry(side=20))
+    assert cache.get("a") is not None and cache.get("big") is None
+
+
+def test_image_results_at_threshold():
+    entry = ImageDetections(np.zeros((100, 100, 3), dtype=np.uint8), BOXES)
+    assert len(entry.results(0.25, NAMES)[0].boxes) == 2
+    assert len(entry.results(CONF_FLOOR, NAMES)[0].boxes) == 4
+
+
+def test_record_then_replay():
+    calls = []
+
+    def detect(frames, conf, **kwargs):
+        calls.append(conf)
+        return [make_results(frame, BOXES, NAMES) for frame in frames]
+
+    frames = [np.zeros((100, 100, 3), dtype=np.uint8) for _ in range(2)]
+    recorder = RecordingDetector(detect, NAMES)
+    recorded = recorder(frames, conf=0.25)
+    # The model runs at the floor, the caller only sees boxes at its own threshold
+    assert calls == [CONF_FLOOR]
+    assert [len(r.boxes) for r in recorded] == [2, 2]
+    assert all(len(b) == 4 for b in recorder.boxes)
+
+    clip = ClipDetections([1, 3], [0, 1], recorder.boxes)
+    replay = ReplayDetector(clip, NAMES)
+    at_floor = replay(frames, conf=CONF_FLOOR)
+    assert [len(r.boxes) for r in at_floor] == [4, 4]
+    # Past the recorded frames there is nothing to replay
+    assert len(replay(frames[:1], conf=CONF_FLOOR)[0].boxes) == 0
+
+    replay = ReplayDetector(clip, NAMES)
+    again = replay(frames, conf=0.25)
+    assert [r.boxes.data.tolist() for r in again] == [r.boxes.data.tolist() for r in recorded]
+
+
+def test_replay_schedule_picks_recorded_frames():
+    schedule = ReplaySchedule(ClipDetections([1, 3, 6], [0, 1, 2], [BOXES] * 3))
+    picked = []
+    for index in range(1, 8):
+        if schedule.should_process(index):
+            picked.append((index, schedule.last_skipped))
+    assert picked == [(1, 0), (3, 1), (6, 2)]
+
+
+def test_recording_detects_truncated_frames_again():
+    calls = []
+
+    def detect(frames, conf, **kwargs):
+        calls.append((conf, kwargs.get("max_det")))
+        boxes = crowded() if conf == CONF_FLOOR else BOXES[:1]
+        return [make_results(frame, boxes, NAMES) for frame in frames]
+
+    recorder = RecordingDetector(detect, NAMES)
+    results = recorder([np.zeros((100, 100, 3), dtype=np.uint8)], conf=0.25)
+    # The floor run filled FLOOR_MAX_DET above 0.25, so 0.25 is predicted directly
+    assert calls == [(CONF_FLOOR, FLOOR_MAX_DET), (0.25, None)]
+    assert len(results[0].boxes) == 1
+    assert len(recorder.boxes[0]) == FLOOR_MAX_DET
@@ -0,0 +1,55 @@
+import cv2
+import numpy as np
+
+from export import VideoExporter, file_reader
+
+
+def frame(value):
+    return np.full((48, 64, 3), value, dtype=np.uint8)
+
+
+def frame_count(path):
+    cap = cv2.VideoCapture(path)
+    n = 0
+    while cap.read()[0]:
+        n += 1
+    cap.release()
+    return n
+
+
+def test_processed_frames_only(tmp_path):
+    path = str(tmp_path / "out.mp4")
+    exporter = VideoExporter(path, fps=10, fourcc="mp4v")
+    for i in (1, 4, 7):
+        exporter.write(frame(10 * i), index=i, counts={"car": i})
+    stats = exporter.close(total_frames=9)
+    assert stats["frames"] == stats["written"] == 3 and stats["held"] == 0
+    assert stats["fourcc"] == "mp4v"
+    assert frame_count(path) == 3
+
+
+def test_hold_repeats_over_skipped_frames(tmp_path):
+    path = str(tmp_path / "out.mp4")
+    exporter = VideoExporter(path, fps=25, hold=True, overlay=False, fourcc="mp4v")
+    for i in (2, 4, 7):
+        exporter.write(frame(10 * i), index=i)
+    stats = exporter.close(total_frames=9)
+    # 1 before frame 2, 3 and 5-6 in between, 8-9 after the last one
+    assert stats["held"] == 6 and stats["written"] == 9
+    assert frame_count(path) == 9
+
+
+def test_falls_back_to_a_codec_that_opens(tmp_path):
+    path = str(tmp_path / "out.mp4")
+    exporter = VideoExporter(path, fps=25)
+    exporter.fourccs = ("????", "mp4v")  # the first can't open
+    exporter.write(frame(0))
+    assert exporter.close()["fourcc"] == "mp4v"
+    assert frame_count(path) == 1
+
+
+def test_file_reader_reads_on_call(tmp_path):
+    path = tmp_path / "out.mp4"
+    read = file_reader(str(path))
+    path.write_bytes(b"mp4 data")  # written after the reader was made
+    assert read() == b"mp4 data"
@@ -0,0 +1,60 @@
+import json
+import os
+import zipfile
+
+from import_dataset import MANIFEST_NAME, import_dataset, target_path
+
+
+def make_zip(path, members):
+    with zipfile.ZipFile(path, "w") as zf:
+        for name, data in members.items():
+            zf.writestr(name, data)
+    return str(path)
+
+
+def read(path):
+    with open(path) as f:
+        return f.read()
+
+
+def test_target_path():
+    assert target_path("export/train/images/a.jpg") == "train/images/a.jpg"
+    assert target_path("valid/labels/a.txt") == "val/labels/a.txt"
+    assert target_path("test/b.PNG") == "test/images/b.PNG"  # mixed folder
+    assert target_path("data.yaml") is None
+    assert target_path("__MACOSX/train/images/a.jpg") is None
+    assert target_path("train/other/a.jpg") is None
+
+
+def test_import_replaces_dummy_data(tmp_path):
+    dataset = tmp_path / "dataset"
+    os.makedirs(dataset / "train" / "images")
+    (dataset / "train" / "images" / "dummy.jpg").write_text("dummy")
+    (dataset / "data.yaml").write_text("names: [car]")
+    archive = make_zip(tmp_path / "a.zip", {
+        "train/images/a.jpg": "A", "train/labels/a.txt": "0 0.5 0.5 0.1 0.1",
+        "valid/images/b.jpg": "B", "README.roboflow.txt": "ignored",
+    })
+    import_dataset(archive, str(dataset), workers=2)
+    assert read(dataset / "train" / "images" / "a.jpg") == "A"
+    assert read(dataset / "val" / "images" / "b.jpg") == "B"
+    assert not (dataset / "train" / "images" / "dummy.jpg").exists()
+    assert (dataset / "data.yaml").exists()  # outside the subset folders, left alone
+    manifest = json.loads(read(dataset / MANIFEST_NAME))
+    assert manifest["counts"] == {"train": {"images": 1, "labels": 1}, "val": {"images": 1, "labels": 0}}
+    assert set(manifest["files"]) == {"train/images/a.jpg", "train/labels/a.txt", "val/images/b.jpg"}
+
+
+def test_reimport_skips_unchanged_and_drops_removed(tmp_path):
+    dataset = tmp_path / "dataset"
+    first = make_zip(tmp_path / "v1.zip", {"train/images/a.jpg": "A", "train/images/b.jpg": "B"})
+    import_dataset(first, str(dataset), workers=1)
+    unchanged = dataset / "train" / "images" / "a.jpg"
+    os.utime(unchanged, (1, 1))
+
+    second = make_zip(tmp_path / "v2.zip", {"train/images/a.jpg": "A", "train/images/c.jpg": "C"})
+    import_dataset(second, str(dataset), workers=1)
+    assert os.stat(unchanged).st_mtime == 1  # not written again
+    assert read(dataset / "train" / "images" / "c.jpg") == "C"
+    assert not (dataset / "train" / "images" / "b.jpg").exists()
+    assert sorted(json.loads(read(dataset / MANIFEST_NAME))["files"]) == ["train/images/a.jpg", "train/images/c.jpg"]
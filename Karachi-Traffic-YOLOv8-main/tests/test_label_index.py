@@ -0,0 +1,68 @@
+import os
+
+import numpy as np
+
+from label_index import LabelIndex, parse_label_file
+
+NAMES = ["car", "bus"]
+
+
+def write(path, text):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "w") as f:
+        f.write(text)
+
+
+def make_dataset(root):
+    write(root / "train" / "images" / "a.jpg", "")
+    write(root / "train" / "images" / "b.jpg", "")
+    write(root / "train" / "images" / "c.jpg", "")  # no label file
+    write(root / "train" / "labels" / "a.txt", "0 0.5 0.5 0.2 0.2\n1 0.5 0.5 0.4 0.4\n")
+    write(root / "train" / "labels" / "b.txt", "0 0.1 0.1 0.1 0.1\n0 0.1 0.1 0.1 0.1\n5 1.5 0.5 0 0.1\nbad line\n")
+    write(root / "train" / "labels" / "orphan.txt", "")
+    return LabelIndex({"train": str(root / "train" / "images")}, index_dir=str(root / ".label_index"))
+
+
+def test_parse_label_file(tmp_path):
+    write(tmp_path / "x.txt", "0 0.5 0.5 0.2 0.2\n\n1 a b c d\n0 0.1 0.1\n")
+    rows, bad = parse_label_file(str(tmp_path / "x.txt"))
+    assert rows.tolist() == [[0, 0.5, 0.5, np.float32(0.2), np.float32(0.2)]]
+    assert bad == 2
+
+
+def test_validate(tmp_path):
+    report = make_dataset(tmp_path).build(workers=2).validate(len(NAMES))
+    counts = {check: r["count"] for check, r in report.items()}
+    assert counts == {
+        "class_out_of_range": 1, "class_not_integer": 0, "coords_out_of_range": 1, "zero_size_box": 1,
+        "duplicate_boxes": 1, "malformed_lines": 1, "images_without_labels": 1, "labels_without_images": 1,
+    }
+    assert report["duplicate_boxes"]["examples"] == ["train/b.txt"]
+    assert report["images_without_labels"]["examples"] == ["train/c"]
+
+
+def test_stats(tmp_path):
+    stats = make_dataset(tmp_path).build()
+    train = stats.stats(NAMES)["train"]
+    assert train["label_files"] == 3 and train["images"] == 3
+    assert train["boxes"] == 4  # class 5 is out of range
+    assert train["classes"]["car"]["boxes"] == 3 and train["classes"]["car"]["images"] == 2
+    assert train["classes"]["bus"]["size_p50"] == np.float32(0.4)
+    assert train["missing_classes"] == []
+
+
+def test_rebuild_reparses_only_changed_files(tmp_path):
+    index = make_dataset(tmp_path).build()
+    assert index.last_build["parsed"] == 3
+
+    index = LabelIndex(index.subsets, index.index_dir).build()
+    assert index.last_build["parsed"] == 0 and index.last_build["reused"] == 3
+    assert len(index.rows) == 5
+
+    write(tmp_path / "train" / "labels" / "a.txt", "1 0.5 0.5 0.2 0.2\n")
+    os.remove(tmp_path / "train" / "labels" / "orphan.txt")
+    index = LabelIndex(index.subsets, index.index_dir).build()
+    assert index.last_build["parsed"] == 1 and index.last_build["removed"] == 1
+    assert len(index.rows) == 4
+    assert [f[1] for f in index.files] == ["a.txt", "b.txt"]
+    assert index.rows[:, 0].tolist() == [1, 0, 0, 5]
@@ -0,0 +1,57 @@
+import numpy as np
+
+from motion import MotionGate
+
+
+class FakeTracker:
+    """Records the frames and skipped counts the gate lets through."""
+
+    def __init__(self):
+        self.calls = []
+
+    def __call__(self, frame, skipped=0):
+        self.calls.append((int(frame.mean()), skipped))
+        return [FakeResult(frame)]
+
+
+class FakeResult:
+    def __init__(self, frame):
+        self.orig_img = frame
+        self.source = int(frame.mean())
+
+
+def frame(value):
+    return np.full((90, 160, 3), value, dtype=np.uint8)
+
+
+def test_static_frames_are_held_and_passed_as_skipped():
+    tracker = FakeTracker()
+    gate = MotionGate(tracker, refresh_every=100)
+    out = [gate(frame(v), skipped=1) for v in (0, 0, 0, 100, 100)]
+    # Frames 2 and 3 reuse frame 1's results; the tracker sees them as skipped, with the 1 dropped before each
+    assert tracker.calls == [(0, 1), (100, 1 + 2 + 2)]
+    assert [r[0].source for r in out] == [0, 0, 0, 100, 100]
+    assert int(out[2][0].orig_img.mean()) == 0 and out[2][0].orig_img is not out[0][0].orig_img
+    stats = gate.stats()
+    assert stats["frames"] == 5 and stats["inferred"] == 2 and stats["saved"] == 1 - 2 / 5
+
+
+def test_refresh_every_runs_the_model_anyway():
+    tracker = FakeTracker()
+    gate = MotionGate(tracker, refresh_every=3)
+    for _ in range(7):
+        gate(frame(50))
+    assert tracker.calls == [(50, 0), (50, 2), (50, 2)]
+
+
+def test_batch_gate_sends_only_moving_frames():
+    batches = []
+
+    def track(frames, skipped):
+        batches.append(([int(f.mean()) for f in frames], list(skipped)))
+        return [[FakeResult(f)] for f in frames]
+
+    gate = MotionGate(track, batch=True, refresh_every=100)
+    out = gate([frame(0), frame(0), frame(200), frame(200)], skipped=[0, 0, 0, 0])
+    assert batches == [([0, 200], [0, 1])]
+    assert [r[0].source for r in out] == [0, 0, 200, 200]
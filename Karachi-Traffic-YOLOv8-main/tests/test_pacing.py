@@ -0,0 +1,62 @@
+import pacing
+from pacing import TARGET_FPS, PacingScheduler
+
+
+class FakeClock:
+    """Stands in for the time module: the clock only moves when told to, sleep() included."""
+
+    def __init__(self):
+        self.now = 0.0
+        self.slept = []
+
+    def perf_counter(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.slept.append(seconds)
+        self.now += seconds
+
+
+def processed(pacer, frames):
+    return [i for i in range(1, frames + 1) if pacer.should_process(i)]
+
+
+def test_target_fps_stride():
+    # 25 -> 10 fps is a stride of 2.5: frames 1, 3.5 -> 4, 6, 8.5 -> 9, 11
+    pacer = PacingScheduler(source_fps=25, mode=TARGET_FPS, target_fps=10)
+    assert processed(pacer, 11) == [1, 4, 6, 9, 11]
+    assert pacer.last_skipped == 1
+    assert pacer.stats()["drop_rate"] == 1 - 5 / 11
+
+
+def test_target_fps_slowed_by_latency():
+    pacer = PacingScheduler(source_fps=25, mode=TARGET_FPS, target_fps=20)
+    pacer.record(1.0)  # setup, replaced by the second sample
+    pacer.record(0.2)
+    assert pacer.latency == 0.2
+    assert pacer.stride() == 0.2 * 25
+    pacer.record(0.4)
+    assert abs(pacer.latency - (0.2 + 0.2 * 0.2)) < 1e-9
+
+
+def test_realtime_drops_frames_the_clock_passed(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(pacing, "time", clock)
+    pacer = PacingScheduler(source_fps=10)
+    assert pacer.should_process(1)
+    clock.now += 0.35  # processing frame 1 took 3.5 frame intervals
+    # 2 and 3 are more than a frame late, 4 is due within a frame
+    assert [pacer.should_process(i) for i in (2, 3, 4)] == [False, False, True]
+    assert pacer.last_skipped == 2
+    assert clock.slept == []
+
+
+def test_realtime_waits_for_frames_not_due(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(pacing, "time", clock)
+    pacer = PacingScheduler(source_fps=10)
+    assert pacer.should_process(1)
+    clock.now += 0.05  # frame 2 is due at 0.1
+    assert pacer.should_process(2)
+    assert len(clock.slept) == 1 and abs(clock.slept[0] - 0.05) < 1e-9
+    assert pacer.lag() == 0.0
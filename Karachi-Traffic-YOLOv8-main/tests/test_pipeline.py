@@ -0,0 +1,48 @@
+import pytest
+
+from conftest import FRAMES, frame_number
+from pipeline import VideoPipeline
+
+
+def test_frames_arrive_in_order(video):
+    pipe = VideoPipeline(video, frame_number, annotate_fn=lambda n: n * 2)
+    packets = list(pipe)
+    assert [p.index for p in packets] == list(range(1, FRAMES + 1))
+    assert [p.results for p in packets] == list(range(1, FRAMES + 1))
+    assert [p.annotated for p in packets] == [2 * n for n in range(1, FRAMES + 1)]
+
+
+def test_frame_skip_keeps_every_nth(video):
+    pipe = VideoPipeline(video, frame_number, annotate_fn=lambda n: n, frame_skip=3, queue_size=1)
+    packets = list(pipe)
+    assert [p.index for p in packets] == [3, 6, 9, 12, 15, 18]
+    assert [p.results for p in packets] == [3, 6, 9, 12, 15, 18]
+    report = pipe.report()
+    assert report["decode"]["frames"] == 6
+    assert report["inference"]["frames"] == report["display"]["frames"] == 6
+
+
+def test_stage_error_reaches_consumer(video):
+    def infer(frame):
+        if frame_number(frame) == 5:
+            raise RuntimeError("boom")
+        return frame_number(frame)
+
+    seen = []
+    with pytest.raises(RuntimeError, match="boom"):
+        for packet in VideoPipeline(video, infer, annotate_fn=lambda n: n):
+            seen.append(packet.index)
+    # The error stops the pipeline, frames still queued behind it may be dropped
+    assert seen == list(range(1, len(seen) + 1)) and len(seen) < 5
+
+
+def test_batches_keep_frame_order(video):
+    sizes = []
+
+    def infer(frames):
+        sizes.append(len(frames))
+        return [frame_number(f) for f in frames]
+
+    packets = list(VideoPipeline(video, infer, annotate_fn=lambda n: n, batch_size=8))
+    assert [p.results for p in packets] == list(range(1, FRAMES + 1))
+    assert sum(sizes) == FRAMES and max(sizes) <= 8
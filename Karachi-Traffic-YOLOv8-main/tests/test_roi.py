@@ -0,0 +1,80 @@
+import numpy as np
+import pytest
+import torch
+from ultralytics.engine.results import Results
+
+from roi import RegionOfInterest, RoiDetector, parse_roi, tile_grid, tile_nms
+
+WHOLE = [90, 0, 150, 40, 0.8, 0]
+FRAGMENT = [100, 0, 120, 40, 0.9, 0]  # the right part of the same car, cut by a tile edge
+
+
+def nms(boxes, tile_ids, cut=None):
+    return tile_nms(np.array(boxes, dtype=np.float32), np.array(tile_ids), cut).tolist()
+
+
+def test_cut_fragment_inside_whole_box_is_dropped():
+    # IoU is only 1/3, the fragment goes because 100% of it lies inside the whole box
+    assert nms([WHOLE, FRAGMENT], [0, 1], [False, True]) == [pytest.approx(WHOLE)]
+
+
+def test_uncut_small_box_inside_is_kept():
+    # Not touching a tile edge: a separate vehicle (a bike next to a bus), not a fragment
+    assert len(nms([WHOLE, FRAGMENT], [0, 1], [False, False])) == 2
+
+
+def test_same_tile_or_other_class_is_kept():
+    assert len(nms([WHOLE, FRAGMENT], [0, 0], [False, True])) == 2
+    assert len(nms([WHOLE, FRAGMENT[:5] + [1]], [0, 1], [False, True])) == 2
+
+
+def test_iou_duplicates_keep_best_score():
+    other = [91, 0, 151, 40, 0.6, 0]
+    assert nms([other, WHOLE], [0, 1]) == [pytest.approx(WHOLE)]
+
+
+def test_tile_grid_covers_frame():
+    assert tile_grid(200, 100, 120, 0.2) == [(0, 0, 120, 100), (80, 0, 200, 100)]
+    assert tile_grid(100, 100, 120) == [(0, 0, 100, 100)]
+
+
+def test_roi_outside_frame_rejected():
+    with pytest.raises(ValueError):
+        RegionOfInterest(parse_roi("1.2,0 1.5,0.5"))
+    roi = RegionOfInterest(parse_roi("300,0 400,50"), normalized=False)
+    with pytest.raises(ValueError):
+        roi.prepare((100, 200))
+
+
+def test_roi_partly_outside_is_clipped():
+    roi = RegionOfInterest(parse_roi("-10,-10 50,30"), normalized=False).prepare((100, 200))
+    assert roi.rect == (0, 0, 50, 30)
+    assert roi.crop(np.zeros((100, 200, 3), dtype=np.uint8)).shape == (30, 50, 3)
+
+
+class FakeModel:
+    """Returns fixed boxes (in input coordinates) for each model input, in call order."""
+
+    names = {0: "car"}
+
+    def __init__(self, boxes):
+        self.boxes = boxes
+        self.inputs = []
+
+    def predict(self, inputs, **kwargs):
+        self.inputs = inputs
+        return [Results(img, path="", names=self.names, boxes=torch.tensor(b, dtype=torch.float32).reshape(-1, 6))
+                for img, b in zip(inputs, self.boxes)]
+
+
+def test_tiles_and_full_pass_give_one_box():
+    # 200x100 frame, 120px tiles at x 0 and 80, then the full frame
+    model = FakeModel([
+        [[100, 0, 120, 40, 0.9, 0]],  # left tile: the car cut by its right edge
+        [[20, 0, 70, 40, 0.7, 0]],  # right tile: the whole car
+        [[100, 0, 150, 40, 0.8, 0]],  # full pass: the whole car
+    ])
+    detector = RoiDetector(model, tile=120)
+    results = detector(np.zeros((100, 200, 3), dtype=np.uint8))
+    assert [img.shape[:2] for img in model.inputs] == [(100, 120), (100, 120), (100, 200)]
+    assert results[0].boxes.data.tolist() == [pytest.approx([100, 0, 150, 40, 0.8, 0])]
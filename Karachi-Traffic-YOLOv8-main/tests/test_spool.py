@@ -0,0 +1,69 @@
+import io
+import os
+
+from spool import DONE_SUFFIX, UploadSpool, header_first
+
+
+class FakeUpload(io.BytesIO):
+    """Stands in for Streamlit's UploadedFile."""
+
+    def __init__(self, data, name="clip.mp4", file_id=None):
+        super().__init__(data)
+        self.name = name
+        self.size = len(data)
+        self.file_id = file_id or name
+
+
+def spooled(spool, data, name):
+    f = spool.add(FakeUpload(data, name))
+    f.complete.wait(5)
+    assert f.error is None
+    return f
+
+
+def box(kind, payload=b""):
+    return (8 + len(payload)).to_bytes(4, "big") + kind + payload
+
+
+def test_header_first():
+    assert header_first(b"RIFF" + b"\0" * 12)
+    assert header_first(box(b"ftyp", b"isom") + box(b"moov") + box(b"mdat"))
+    assert not header_first(box(b"ftyp", b"isom") + box(b"mdat") + box(b"moov"))
+
+
+def test_same_content_spooled_once(tmp_path):
+    spool = UploadSpool(str(tmp_path), ready_bytes=4)
+    a = spooled(spool, b"video bytes", "a.mp4")
+    b = spooled(spool, b"video bytes", "b.mp4")  # another upload, same content
+    assert a.path == b.path
+    with open(a.path, "rb") as f:
+        assert f.read() == b"video bytes"
+    assert os.path.exists(a.path + DONE_SUFFIX)
+    assert spool.usage() == (1, 11)
+
+
+def test_eviction_least_recently_used(tmp_path):
+    spool = UploadSpool(str(tmp_path), ready_bytes=4)
+    old = spooled(spool, b"1" * 100, "old.mp4")
+    new = spooled(spool, b"2" * 100, "new.mp4")
+    os.utime(old.path, (1, 1))  # used long ago
+    spool.quota_bytes = 150
+    spool.evict()
+    assert not os.path.exists(old.path) and not os.path.exists(old.path + DONE_SUFFIX)
+    assert os.path.exists(new.path)
+
+
+def test_eviction_skips_pinned_files(tmp_path):
+    spool = UploadSpool(str(tmp_path), ready_bytes=4)
+    old = spooled(spool, b"1" * 100, "old.mp4")
+    new = spooled(spool, b"2" * 100, "new.mp4")
+    os.utime(old.path, (1, 1))
+    spool.quota_bytes = 150
+    old.acquire()  # a pipeline is reading it
+    spool.evict()
+    assert os.path.exists(old.path)
+    assert not os.path.exists(new.path)
+    old.release()
+    spool.quota_bytes = 50
+    spool.evict()
+    assert not os.path.exists(old.path)
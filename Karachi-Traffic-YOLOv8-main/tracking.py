@@ -0,0 +1,106 @@
+import torch
+from ultralytics.trackers.byte_tracker import BYTETracker
+from ultralytics.trackers.bot_sort import BOTSORT
+from ultralytics.utils import IterableSimpleNamespace
+from ultralytics.utils.checks import check_yaml
+
+try:
+    from ultralytics.utils import YAML
+
+    _yaml_load = YAML.load
+except ImportError:  # older ultralytics releases
+    from ultralytics.utils import yaml_load as _yaml_load
+
+# Tracker used everywhere in the app. The app never calls model.track(): it
+# stores the tracker on the model's predictor, which the registry shares
+# between sessions. SequentialTracker and BatchTracker own theirs instead and
+# give the same track IDs model.track() would.
+DEFAULT_TRACKER = "bytetrack.yaml"
+
+TRACKER_MAP = {"bytetrack": BYTETracker, "botsort": BOTSORT}
+
+
+def create_tracker(tracker=DEFAULT_TRACKER):
+    cfg = IterableSimpleNamespace(**_yaml_load(check_yaml(tracker)))
+    if cfg.tracker_type not in TRACKER_MAP:
+        raise ValueError(f"Unsupported tracker '{cfg.tracker_type}', use one of {list(TRACKER_MAP)}")
+    return TRACKER_MAP[cfg.tracker_type](args=cfg)
+
+
+def update_tracker(tracker, result):
+    # Same steps as ultralytics' on_predict_postprocess_end callback, applied
+    # to a result that came out of model.predict()
+    det = result.boxes.cpu().numpy()
+    tracks = tracker.update(det, result.orig_img)
+    if len(tracks) == 0:
+        if any(not t.is_activated for t in tracker.tracked_stracks):
+            return result[:0]
+        return result
+    tracked = result[tracks[:, -1].astype(int)]
+    tracked.update(boxes=torch.as_tensor(tracks[:, :-1], device=result.boxes.data.device))
+    return tracked
+
+
+def advance_tracker(tracker, frames):
+    # Tell the tracker that `frames` source frames went by unprocessed, so
+    # lost tracks expire after the same amount of video time either way
+    if tracker is not None and frames > 0:
+        tracker.frame_id += frames
+
+
+class SequentialTracker:
+    """One frame at a time through the detector and a tracker of its own.
+
+    model.track(persist=True) keeps its tracker on model.predictor, and the
+    registry shares one model between every run, tab and session, so track IDs
+    and frame_id would carry over from one run to the next. Each
+    SequentialTracker starts from fresh IDs.
+    """
+
+    def __init__(self, model, tracker=DEFAULT_TRACKER, **predict_kwargs):
+        self.batch = BatchTracker(model, tracker, **predict_kwargs)
+
+    def __call__(self, frame, skipped=0):
+        return self.batch([frame], [skipped])[0]
+
+    def reset(self):
+        self.batch.reset()
+
+
+class BatchTracker:
+    """Run N frames through the detector as one batch, then track them in order.
+
+    Detection is the expensive part and batches well; the tracker is cheap and
+    strictly sequential, so it is fed one result at a time in frame order.
+    Track IDs and counts come out the same as calling model.track() per frame.
+
+    detector replaces model.predict (e.g. roi.RoiDetector), it is called with
+    the list of frames and the predict keyword arguments.
+    """
+
+    def __init__(self, model, tracker=DEFAULT_TRACKER, detector=None, **predict_kwargs):
+        self.model = model
+        self.detect = detector or model.predict
+        self.tracker = create_tracker(tracker)
+        self.predict_kwargs = {"verbose": False, **predict_kwargs}
+        # model.track() defaults to a low threshold so the tracker sees weak boxes too
+        self.predict_kwargs.setdefault("conf", 0.1)
+
+    def __call__(self, frames, skipped=None):
+        # skipped[i] is the number of source frames dropped right before frames[i]
+        if not frames:
+            return []
+        results = self.detect(list(frames), **self.predict_kwargs)
+        out = []
+        for i, r in enumerate(results):
+            if skipped:
+                advance_tracker(self.tracker, skipped[i])
+            out.append([update_tracker(self.tracker, r)])
+        return out
+
+    def track(self, frame, skipped=0):
+        # One frame, same call and return value as SequentialTracker
+        return self([frame], [skipped])[0]
+
+    def reset(self):
+        self.tracker.reset()
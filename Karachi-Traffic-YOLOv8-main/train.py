@@ -1,8 +1,38 @@
+import argparse
+import os
+import time
+
 from ultralytics import YOLO
 
-def train_custom_model():
+from image_cache import ImageCache
+
+LOADER_WORKERS = min(8, os.cpu_count() or 1)
+
+def add_epoch_timer(model):
+    # Wall time of each training epoch (data loading + forward/backward, validation excluded)
+    times = []
+    state = {}
+    model.add_callback("on_train_epoch_start", lambda trainer: state.update(t0=time.perf_counter()))
+    def on_epoch_end(trainer):
+        times.append(time.perf_counter() - state["t0"])
+        print(f"⏱️ Epoch {trainer.epoch + 1}: {times[-1]:.1f}s")
+    model.add_callback("on_train_epoch_end", on_epoch_end)
+    return times
+
+def train_custom_model(data="data.yaml", epochs=100, imgsz=640, use_cache=False, workers=LOADER_WORKERS,
+                       evaluate=True, **overrides):
+    # Pre-resized images: the loader skips decoding and resizing the full-size JPEGs every epoch.
+    # Opt-in: the copies are resized (and re-encoded) ahead of time instead of by ultralytics at
+    # load time, so the pixels the model trains on differ slightly from the default path
+    if use_cache:
+        cache = ImageCache(data, imgsz)
+        data = cache.build()
+        b = cache.last_build
+        print(f"🗄️ Image cache: {b['written']} written, {b['unchanged']} unchanged in {b['seconds']:.1f}s")
+
     # Load a model
     model = YOLO("yolov8n.pt")  # load a pretrained model (recommended for training)
+    epoch_times = add_epoch_timer(model)
 
     # Train the model
     # Note: You need a 'data.yaml' file that points to your dataset.
@@ -15,9 +45,10 @@ def train_custom_model():
     print("Starting training with advanced augmentation...")
     # Training with data augmentation to handle different angles/lighting
     results = model.train(
-        data="data.yaml",
-        epochs=100,
-        imgsz=640,
+        data=data,
+        epochs=epochs,
+        imgsz=imgsz,
+        workers=workers,   # parallel data loader processes
         device='0' if 0 else 'cpu', # Let YOLO auto-detect or force CPU if needed. Better: device=0 (gpu) or 'cpu'
         degrees=15.0,      # Rotate images +/- 15 degrees (simulates angles)
         scale=0.5,         # Scale images +/- 50%
@@ -26,8 +57,14 @@ def train_custom_model():
         flipud=0.0,        # No upside down flip
         fliplr=0.5,        # Flip left-right (mirroring)
         mosaic=1.0,        # Mosaic augmentation (mixes 4 images)
-        mixup=0.1          # Mixup augmentation
+        mixup=0.1,         # Mixup augmentation
+        **overrides
     )
+    if epoch_times:
+        print(f"⏱️ Mean epoch time: {sum(epoch_times) / len(epoch_times):.1f}s "
+              f"({'with' if use_cache else 'without'} image cache)")
+    if not evaluate:
+        return epoch_times
     
     # Evaluate performance
     metrics = model.val()
@@ -36,9 +73,34 @@ def train_custom_model():
     # Export the model
     success = model.export(format="onnx")
     print("Model exported successfully.")
+    return epoch_times
+
+def compare_cache(data, epochs, imgsz, workers):
+    # Same short run without and with the cache, first epoch (warm-up) excluded when possible
+    mean = lambda t: sum(t[1:] or t) / len(t[1:] or t)
+    without = train_custom_model(data, epochs, imgsz, use_cache=False, workers=workers, evaluate=False,
+                                 name="cache_off", exist_ok=True, plots=False)
+    with_cache = train_custom_model(data, epochs, imgsz, use_cache=True, workers=workers, evaluate=False,
+                                    name="cache_on", exist_ok=True, plots=False)
+    print(f"\n⏱️ Time per epoch: {mean(without):.1f}s without cache, {mean(with_cache):.1f}s with cache "
+          f"({mean(without) / mean(with_cache):.2f}x)")
 
 if __name__ == '__main__':
-    # dataset is ready (dummy or real), starting training
-    train_custom_model()
+    parser = argparse.ArgumentParser(description="Train a custom YOLOv8 model")
+    parser.add_argument("--data", default="data.yaml")
+    parser.add_argument("--epochs", type=int, default=100)
+    parser.add_argument("--imgsz", type=int, default=640)
+    parser.add_argument("--workers", type=int, default=LOADER_WORKERS, help="Data loader processes")
+    parser.add_argument("--cache", action="store_true",
+                        help="Train from pre-resized copies of the images (image_cache.py) instead of the originals")
+    parser.add_argument("--compare-cache", type=int, metavar="EPOCHS",
+                        help="Only time EPOCHS epochs without and with the image cache")
+    args = parser.parse_args()
+
+    if args.compare_cache:
+        compare_cache(args.data, args.compare_cache, args.imgsz, args.workers)
+    else:
+        # dataset is ready (dummy or real), starting training
+        train_custom_model(args.data, args.epochs, args.imgsz, args.cache, args.workers)
     # print("Please configure 'data.yaml' and your dataset folder before running training.")
     # print("Check the code comments for instructions.")